@@ -4,6 +4,7 @@ import click
 import typer.core
 
 from . import create as cmd_create
+from . import prune as cmd_prune
 from . import raw as cmd_raw
 from . import restore as cmd_restore
 
@@ -21,11 +22,12 @@ app = typer.Typer(
 
 app.command(name="create")(cmd_create.main)
 app.command(name="restore")(cmd_restore.main)
+app.command(name="prune")(cmd_prune.main)
 app.add_typer(cmd_raw.app, name="raw")
 
 
 @app.callback()
 def main():
     """
-    Create, restore, download or list backups.
+    Create, restore, prune, download or list backups.
     """
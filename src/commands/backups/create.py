@@ -3,6 +3,7 @@ import datetime
 import os
 import pathlib
 import re
+import time
 import typing as t
 
 import pydantic
@@ -12,19 +13,44 @@ import rich.panel
 import rich.tree
 import typer
 
+from src.utils.backup import BACKUP_CHUNK_TREE
 from src.utils.backup import BACKUP_CONFIG_JSON
+from src.utils.backup import BACKUP_MANIFEST
 from src.utils.backup import BackupJob
+from src.utils.backup import IncompleteBackup
 from src.utils.backup import LAST_BACKUP_DIR_FILENAME
+from src.utils.backup import load_incomplete_backup
 from src.utils.backup import load_last_backup_directory
+from src.utils.backup import remove_incomplete_backup
+from src.utils.backup import save_incomplete_backup
 from src.utils.backup import save_last_backup_directory
+from src.utils.backup_catalog import add_backup
+from src.utils.backup_manifest import dump_manifest
+from src.utils.backup_manifest import ManifestEntry
+from src.utils.backup_rich import create_snapshots
 from src.utils.backup_rich import create_target_structure
+from src.utils.backup_rich import delete_snapshots
 from src.utils.backup_rich import do_backup_content
 from src.utils.backup_rich import do_backup_job
+from src.utils.backup_rich import do_backup_jobs_combined
+from src.utils.backup_rich import do_backup_jobs_concurrently
+from src.utils.backup_rich import do_backup_projects_concurrently
 from src.utils.backup_rich import format_do_backup
 from src.utils.backup_rich import format_no_backup
+from src.utils.backup_rich import get_link_dest_backup_dirs
+from src.utils.backup_rich import get_manifest_entries
+from src.utils.backup_rich import rich_print_transfer_stats
+from src.utils.backup_rich import TransferStats
+from src.utils.chunk_store import CHUNK_STORE_DIR
+from src.utils.chunk_store import ChunkTreeEntry
+from src.utils.chunk_store import dump_chunk_tree
+from src.utils.chunk_store_rich import do_backup_jobs_chunked
 from src.utils.cli import ALL_PROFILES_OPTION
+from src.utils.cli import NO_CACHE_OPTION
 from src.utils.cli import PROFILES_OPTION
 from src.utils.cli import PROJECTS_ARGUMENT
+from src.utils.cli import RECURSIVE_OPTION
+from src.utils.cli import RUN_JOBS_OPTION
 from src.utils.cli import RUNNING_OPTION
 from src.utils.cli import SERVICES_OPTION
 from src.utils.common import dir_from_path
@@ -34,11 +60,17 @@ from src.utils.compose_rich import ComposeProject
 from src.utils.compose_rich import get_compose_projects
 from src.utils.compose_rich import ProjectSearchOptions
 from src.utils.compose_rich import rich_run_compose
+from src.utils.doco_config import BackupBackend
 from src.utils.exceptions_rich import DocoError
+from src.utils.progress_rich import rsync_progress_display
+from src.utils.progress_rich import RsyncProgressDisplay
 from src.utils.rich import format_not_existing
 from src.utils.rich import Formatted
 from src.utils.rich import rich_print_conditional_cmds
 from src.utils.rsync import RsyncConfig
+from src.utils.rsync import split_bwlimit
+from src.utils.snapshot import Snapshot
+from src.utils.snapshot import SnapshotError
 
 COMPOSE_CONFIG_YAML = "compose.yaml"
 
@@ -53,12 +85,24 @@ class BackupOptions:  # pylint: disable=too-many-instance-attributes
     deep: bool
     show_progress: bool
     rsync_verbose: bool
+    parallel: int
+    single_transfer: bool
+    pre_sync: bool
+    per_service: bool
+    snapshot: bool
+    pause: bool
+    rsync_bwlimit: t.Optional[str]
+    rsync_nice: bool
+    link_dest_count: int
+    backend: t.Optional[BackupBackend]
+    resume: bool
     dry_run: bool
     dry_run_verbose: bool
 
 
 class BackupConfigServiceTask(pydantic.BaseModel):
     name: str
+    stop_during_backup: bool = False
     backup_volumes: list[tuple[str, str]] = []
     exclude_volumes: list[str] = []
 
@@ -72,8 +116,15 @@ class BackupConfigOptions(pydantic.BaseModel):
 
 class BackupConfigTasks(pydantic.BaseModel):
     restart_project: bool = False
+    per_service: bool = False
+    pre_sync: bool = False
+    snapshot: bool = False
+    stop_for_snapshot: bool = False
+    pause_services: bool = False
     create_last_backup_dir_file: t.Union[t.Literal[False], str]
     backup_config: t.Union[t.Literal[False], str]
+    backup_manifest: t.Union[t.Literal[False], str] = False
+    backup_chunk_tree: t.Union[t.Literal[False], str] = False
     backup_compose_config: t.Union[t.Literal[False], str]
     backup_project_dir: t.Union[bool, tuple[str, str]]
     backup_services: list[BackupConfigServiceTask] = []
@@ -86,96 +137,389 @@ class BackupConfig(pydantic.BaseModel):
     timestamp: datetime.datetime
     backup_dir: str
     last_backup_dir: t.Optional[str]
+    backend: BackupBackend = BackupBackend.RSYNC
+    # Backup directories to hard link unchanged files from (see rsync's --link-dest)
+    old_backup_dirs: list[str] = []
     deep: t.Optional[bool]
     rsync: RsyncConfig
     options: BackupConfigOptions
     tasks: BackupConfigTasks
+    # Transfer statistics of the backed up target paths
+    transfer_stats: list[TransferStats] = []
+    # Manifest entries per target path (stored in a separate file, see `backup_manifest`)
+    manifest: dict[str, list[ManifestEntry]] = pydantic.Field(default={}, exclude=True)
+    # Chunk tree entries per target path (stored in a separate file, see `backup_chunk_tree`)
+    chunk_tree: dict[str, list[ChunkTreeEntry]] = pydantic.Field(default={}, exclude=True)
 
 
-def do_backup(
+def backup_volumes(
     project: ComposeProject,
     options: BackupOptions,
     config: BackupConfig,
     jobs: list[BackupJob],
     cmds: list[PrintCmdData],
 ):
-    create_target_structure(
-        rsync_config=project.doco_config.backup.rsync,
-        structure_config=project.doco_config.backup.structure,
-        new_backup_dir=config.backup_dir,
-        jobs=jobs,
-        show_progress=options.show_progress,
-        verbose=options.rsync_verbose,
-        dry_run=options.dry_run,
-        cmds=cmds,
-    )
+    with rsync_progress_display(options.show_progress and not options.dry_run) as progress:
+        _backup_volumes(
+            project=project, options=options, config=config, jobs=jobs, cmds=cmds, progress=progress
+        )
 
-    if config.tasks.restart_project:
-        rich_run_compose(
-            project.dir,
-            project.file,
-            project.selected_profiles,
-            command=["down", *project.selected_services],
-            dry_run=options.dry_run,
-            cmds=cmds,
+
+def _backup_volumes(  # noqa: CFQ002 (max arguments)
+    project: ComposeProject,
+    options: BackupOptions,
+    config: BackupConfig,
+    jobs: list[BackupJob],
+    cmds: list[PrintCmdData],
+    progress: t.Optional[RsyncProgressDisplay],
+):
+    if not options.dry_run and (config.tasks.backup_manifest or config.backend == BackupBackend.CHUNKS):
+        # Listed before the transfer, so files changed meanwhile are at least as new in the backup
+        for job in jobs:
+            config.manifest[job.rsync_target_path] = get_manifest_entries(
+                config.rsync, job, project_for_filter=project.config["name"]
+            )
+
+    if config.backend == BackupBackend.CHUNKS:
+        config.chunk_tree.update(
+            do_backup_jobs_chunked(
+                rsync_config=config.rsync,
+                project_name=os.path.dirname(config.backup_dir),
+                jobs=jobs,
+                manifest=config.manifest,
+                verbose=options.rsync_verbose,
+                dry_run=options.dry_run,
+                cmds=cmds,
+                stats=config.transfer_stats,
+            )
         )
+        return
 
-    if config.tasks.backup_config:
-        do_backup_content(
-            rsync_config=project.doco_config.backup.rsync,
+    if options.single_transfer:
+        jobs = do_backup_jobs_combined(
+            rsync_config=config.rsync,
             structure_config=project.doco_config.backup.structure,
             new_backup_dir=config.backup_dir,
-            old_backup_dir=config.last_backup_dir,
-            content=config.model_dump_json(indent=4),
-            target_file_name=BACKUP_CONFIG_JSON,
+            old_backup_dirs=config.old_backup_dirs,
+            jobs=jobs,
+            project_for_filter=project.config["name"],
             show_progress=options.show_progress,
             verbose=options.rsync_verbose,
             dry_run=options.dry_run,
             cmds=cmds,
+            stats=config.transfer_stats,
+            progress=progress,
         )
 
-    if config.tasks.backup_compose_config:
-        do_backup_content(
-            rsync_config=project.doco_config.backup.rsync,
-            structure_config=project.doco_config.backup.structure,
+    if options.parallel > 1:
+        do_backup_jobs_concurrently(
+            rsync_config=config.rsync,
             new_backup_dir=config.backup_dir,
-            old_backup_dir=config.last_backup_dir,
-            content=project.config_yaml,
-            target_file_name=COMPOSE_CONFIG_YAML,
+            old_backup_dirs=config.old_backup_dirs,
+            jobs=jobs,
+            project_for_filter=project.config["name"],
             show_progress=options.show_progress,
             verbose=options.rsync_verbose,
             dry_run=options.dry_run,
             cmds=cmds,
+            parallel=options.parallel,
+            stats=config.transfer_stats,
+            progress=progress,
         )
+    else:
+        for job in jobs:
+            do_backup_job(
+                rsync_config=config.rsync,
+                new_backup_dir=config.backup_dir,
+                old_backup_dirs=config.old_backup_dirs,
+                job=job,
+                project_for_filter=project.config["name"],
+                show_progress=options.show_progress,
+                verbose=options.rsync_verbose,
+                dry_run=options.dry_run,
+                cmds=cmds,
+                stats=config.transfer_stats,
+                progress=progress,
+            )
+
 
+def group_jobs_by_services(
+    jobs: list[BackupJob], job_services: dict[str, list[str]]
+) -> list[tuple[list[str], list[BackupJob]]]:
+    """Group the jobs by the services using their source paths, keeping the order of the jobs."""
+    groups: dict[tuple[str, ...], list[BackupJob]] = {}
     for job in jobs:
-        do_backup_job(
-            rsync_config=project.doco_config.backup.rsync,
-            new_backup_dir=config.backup_dir,
-            old_backup_dir=config.last_backup_dir,
-            job=job,
-            project_for_filter=project.config["name"],
-            show_progress=options.show_progress,
-            verbose=options.rsync_verbose,
-            dry_run=options.dry_run,
+        groups.setdefault(tuple(job_services.get(job.rsync_source_path, [])), []).append(job)
+    return [(list(services), group_jobs) for services, group_jobs in groups.items()]
+
+
+def stop_services(
+    project: ComposeProject, options: BackupOptions, services: list[str], cmds: list[PrintCmdData]
+):
+    rich_run_compose(
+        project.dir,
+        project.file,
+        project.selected_profiles,
+        command=["pause" if options.pause else "stop", *services],
+        dry_run=options.dry_run,
+        cmds=cmds,
+    )
+
+
+def start_services(
+    project: ComposeProject, options: BackupOptions, services: list[str], cmds: list[PrintCmdData]
+):
+    rich_run_compose(
+        project.dir,
+        project.file,
+        project.selected_profiles,
+        command=["unpause" if options.pause else "start", *services],
+        dry_run=options.dry_run,
+        cmds=cmds,
+    )
+
+
+def stop_project(project: ComposeProject, options: BackupOptions, cmds: list[PrintCmdData]):
+    rich_run_compose(
+        project.dir,
+        project.file,
+        project.selected_profiles,
+        command=["pause" if options.pause else "down", *project.selected_services],
+        dry_run=options.dry_run,
+        cmds=cmds,
+    )
+
+
+def start_project(project: ComposeProject, options: BackupOptions, cmds: list[PrintCmdData]):
+    rich_run_compose(
+        project.dir,
+        project.file,
+        project.selected_profiles,
+        command=["unpause", *project.selected_services]
+        if options.pause
+        else ["up", "-d", *project.selected_services],
+        dry_run=options.dry_run,
+        cmds=cmds,
+    )
+
+
+def print_downtime(project: ComposeProject, downtime_start: float, services: t.Optional[list[str]] = None):
+    services_str = f" [dim]({Formatted(', '.join(services))})[/]" if services else ""
+    rich.print(
+        f"[i]Downtime of[/] [b]{Formatted(project.config['name'])}[/]{services_str}:"
+        f" [b]{time.monotonic() - downtime_start:.1f}s[/]"
+    )
+
+
+def backup_volumes_per_service(
+    project: ComposeProject,
+    options: BackupOptions,
+    config: BackupConfig,
+    jobs: list[BackupJob],
+    job_services: dict[str, list[str]],
+    cmds: list[PrintCmdData],
+):
+    """Back up the jobs, stopping only the services using the sources of the jobs while they are copied."""
+    services_to_stop = [task.name for task in config.tasks.backup_services if task.stop_during_backup]
+    for services, group_jobs in group_jobs_by_services(jobs, job_services):
+        stopped_services = [service for service in services if service in services_to_stop]
+        downtime_start = time.monotonic()
+        if stopped_services:
+            stop_services(project, options, stopped_services, cmds)
+
+        backup_volumes(project=project, options=options, config=config, jobs=group_jobs, cmds=cmds)
+
+        if stopped_services:
+            start_services(project, options, stopped_services, cmds)
+            if not options.dry_run:
+                print_downtime(project, downtime_start, stopped_services)
+
+
+def backup_volumes_from_snapshots(
+    project: ComposeProject,
+    options: BackupOptions,
+    config: BackupConfig,
+    jobs: list[BackupJob],
+    cmds: list[PrintCmdData],
+):
+    """Back up the jobs from filesystem snapshots, stopping the services only while taking the snapshots."""
+    downtime_start = time.monotonic()
+    if config.tasks.stop_for_snapshot:
+        stop_project(project, options, cmds)
+    snapshot_error: t.Optional[SnapshotError] = None
+    snapshot_jobs: list[BackupJob] = []
+    snapshots: list[Snapshot] = []
+    try:
+        snapshot_jobs, snapshots = create_snapshots(jobs, dry_run=options.dry_run, cmds=cmds)
+    except SnapshotError as e:
+        snapshot_error = e
+    finally:
+        if config.tasks.stop_for_snapshot:
+            start_project(project, options, cmds)
+            if not options.dry_run:
+                print_downtime(project, downtime_start)
+    if snapshot_error is not None:
+        raise DocoError(str(snapshot_error))
+
+    try:
+        backup_volumes(project=project, options=options, config=config, jobs=snapshot_jobs, cmds=cmds)
+    finally:
+        delete_snapshots(snapshots, dry_run=options.dry_run, cmds=cmds)
+
+
+def upload_backup_content(
+    project: ComposeProject,
+    options: BackupOptions,
+    config: BackupConfig,
+    content: t.Union[str, bytes],
+    target_file_name: str,
+    cmds: list[PrintCmdData],
+):
+    do_backup_content(
+        rsync_config=config.rsync,
+        structure_config=project.doco_config.backup.structure,
+        new_backup_dir=config.backup_dir,
+        old_backup_dirs=config.old_backup_dirs,
+        content=content,
+        target_file_name=target_file_name,
+        show_progress=options.show_progress,
+        verbose=options.rsync_verbose,
+        dry_run=options.dry_run,
+        cmds=cmds,
+    )
+
+
+def upload_backup_metadata(
+    project: ComposeProject, options: BackupOptions, config: BackupConfig, cmds: list[PrintCmdData]
+):
+    """Upload the chunk tree, the manifest and the backup configuration (after the volumes are backed up)."""
+    if config.tasks.backup_chunk_tree:
+        upload_backup_content(
+            project,
+            options,
+            config,
+            content=dump_chunk_tree(entry for entries in config.chunk_tree.values() for entry in entries),
+            target_file_name=config.tasks.backup_chunk_tree,
             cmds=cmds,
         )
 
-    if config.tasks.restart_project:
-        rich_run_compose(
-            project.dir,
-            project.file,
-            project.selected_profiles,
-            command=["up", "-d", *project.selected_services],
-            dry_run=options.dry_run,
+    if config.tasks.backup_manifest:
+        upload_backup_content(
+            project,
+            options,
+            config,
+            content=dump_manifest(entry for entries in config.manifest.values() for entry in entries),
+            target_file_name=config.tasks.backup_manifest,
+            cmds=cmds,
+        )
+
+    # Uploaded last to include the transfer statistics
+    if config.tasks.backup_config:
+        upload_backup_content(
+            project,
+            options,
+            config,
+            content=config.model_dump_json(indent=4),
+            target_file_name=BACKUP_CONFIG_JSON,
             cmds=cmds,
         )
 
-    if not options.dry_run and config.tasks.create_last_backup_dir_file:
+
+def complete_backup(project: ComposeProject, config: BackupConfig):
+    if len(config.transfer_stats) > 0:
+        rich_print_transfer_stats(config.transfer_stats)
+
+    if config.tasks.create_last_backup_dir_file:
         assert isinstance(config.tasks.create_last_backup_dir_file, str)
         save_last_backup_directory(
             project.dir, config.backup_dir, file_name=config.tasks.create_last_backup_dir_file
         )
+    add_backup(
+        config.rsync,
+        project_name=os.path.dirname(config.backup_dir),
+        backup_name=os.path.basename(config.backup_dir),
+        size=sum(entry.stats.total_file_size for entry in config.transfer_stats)
+        if len(config.transfer_stats) > 0
+        else None,
+    )
+    remove_incomplete_backup(project.dir)
+
+
+def do_backup(  # noqa: CFQ002 (max arguments)
+    project: ComposeProject,
+    options: BackupOptions,
+    config: BackupConfig,
+    jobs: list[BackupJob],
+    job_services: dict[str, list[str]],
+    cmds: list[PrintCmdData],
+):
+    if not options.dry_run:
+        save_incomplete_backup(project.dir, IncompleteBackup(config.backup_dir, config.last_backup_dir))
+
+    create_target_structure(
+        rsync_config=config.rsync,
+        structure_config=project.doco_config.backup.structure,
+        new_backup_dir=config.backup_dir,
+        jobs=jobs,
+        show_progress=options.show_progress,
+        verbose=options.rsync_verbose,
+        dry_run=options.dry_run,
+        cmds=cmds,
+    )
+
+    if config.tasks.pre_sync:
+        # Transfer most of the data while the services are still running,
+        # so only the changes need to be transferred while they are stopped.
+        backup_volumes(project=project, options=options, config=config, jobs=jobs, cmds=cmds)
+
+    downtime_start = time.monotonic()
+    if config.tasks.restart_project:
+        stop_project(project, options, cmds)
+
+    if config.tasks.backup_compose_config:
+        upload_backup_content(
+            project,
+            options,
+            config,
+            content=project.config_yaml,
+            target_file_name=COMPOSE_CONFIG_YAML,
+            cmds=cmds,
+        )
+
+    if config.tasks.snapshot:
+        backup_volumes_from_snapshots(project=project, options=options, config=config, jobs=jobs, cmds=cmds)
+    elif config.tasks.per_service:
+        backup_volumes_per_service(
+            project=project, options=options, config=config, jobs=jobs, job_services=job_services, cmds=cmds
+        )
+    else:
+        backup_volumes(project=project, options=options, config=config, jobs=jobs, cmds=cmds)
+
+    if config.tasks.restart_project:
+        start_project(project, options, cmds)
+        if not options.dry_run:
+            print_downtime(project, downtime_start)
+
+    upload_backup_metadata(project, options, config, cmds)
+
+    if not options.dry_run:
+        complete_backup(project, config)
+
+
+def _add_job_service(job_services: dict[str, list[str]], job: BackupJob, service_name: str) -> None:
+    services = job_services.setdefault(job.rsync_source_path, [])
+    if service_name not in services:
+        services.append(service_name)
+
+
+def get_rsync_config(project: ComposeProject, options: BackupOptions) -> RsyncConfig:
+    rsync_config = project.doco_config.backup.rsync
+    update: dict[str, t.Any] = {}
+    if options.rsync_bwlimit is not None:
+        update["args"] = [*rsync_config.args, f"--bwlimit={options.rsync_bwlimit}"]
+    if options.rsync_nice:
+        update["nice"] = True
+    return rsync_config.model_copy(update=update)
 
 
 def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
@@ -190,11 +534,17 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
     project_id = Formatted(project_id_str, True)
 
     now = datetime.datetime.now()
-    new_backup_dir = os.path.join(
-        project_name,
-        options.backup if options.backup is not None else f"backup-{now.strftime('%Y-%m-%d_%H.%M')}",
-    )
-    old_backup_dir = load_last_backup_directory(project.dir)
+    incomplete_backup = load_incomplete_backup(project.dir) if options.resume else None
+    if incomplete_backup is not None:
+        new_backup_dir = incomplete_backup.backup_dir
+        old_backup_dir = incomplete_backup.last_backup_dir
+    else:
+        new_backup_dir = os.path.join(
+            project_name,
+            options.backup if options.backup is not None else f"backup-{now.strftime('%Y-%m-%d_%H.%M')}",
+        )
+        old_backup_dir = load_last_backup_directory(project.dir)
+    backend = options.backend if options.backend is not None else project.doco_config.backup.backend
 
     config = BackupConfig(
         project_path=os.path.abspath(project.dir),
@@ -202,8 +552,9 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
         timestamp=now,
         backup_dir=new_backup_dir,
         last_backup_dir=old_backup_dir,
+        backend=backend,
         deep=options.deep,
-        rsync=project.doco_config.backup.rsync,
+        rsync=get_rsync_config(project, options),
         options=BackupConfigOptions(
             live=options.live,
             include_project_dir=options.include_project_dir,
@@ -213,18 +564,38 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
         tasks=BackupConfigTasks(
             create_last_backup_dir_file=LAST_BACKUP_DIR_FILENAME,
             backup_config=BACKUP_CONFIG_JSON,
+            backup_manifest=BACKUP_MANIFEST,
+            backup_chunk_tree=BACKUP_CHUNK_TREE if backend == BackupBackend.CHUNKS else False,
             backup_compose_config=COMPOSE_CONFIG_YAML,
             backup_project_dir=options.include_project_dir,
         ),
     )
+    config.old_backup_dirs = get_link_dest_backup_dirs(
+        rsync_config=config.rsync,
+        new_backup_dir=new_backup_dir,
+        last_backup_dir=old_backup_dir,
+        count=options.link_dest_count,
+    )
     jobs: list[BackupJob] = []
 
     tree = rich.tree.Tree(str(project_id))
+    resumed_str = " [i](resumed)[/]" if incomplete_backup is not None else ""
     if old_backup_dir is None:
-        tree.add(f"[i]Backup directory:[/] [b]{Formatted(new_backup_dir)}[/]")
+        tree.add(f"[i]Backup directory:[/] [b]{Formatted(new_backup_dir)}[/]{resumed_str}")
     else:
         tree.add(
-            f"[i]Backup directory:[/] [dim]{Formatted(old_backup_dir)}[/] => [b]{Formatted(new_backup_dir)}[/]"
+            f"[i]Backup directory:[/] [dim]{Formatted(old_backup_dir)}[/]"
+            f" => [b]{Formatted(new_backup_dir)}[/]{resumed_str}"
+        )
+    if backend == BackupBackend.CHUNKS:
+        tree.add(
+            f"[i]Backend:[/] [b]{backend.value}[/]"
+            f" [dim](chunk store {Formatted(os.path.join(project_name, CHUNK_STORE_DIR))})[/]"
+        )
+    elif len(config.old_backup_dirs) > 1:
+        tree.add(
+            "[i]Hard links from:[/] "
+            + ", ".join(f"[dim]{Formatted(backup_dir)}[/]" for backup_dir in config.old_backup_dirs)
         )
     backup_node = tree.add("[i]Backup items[/]")
 
@@ -232,11 +603,19 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
     config_group = rich.console.Group(f"[green]{Formatted(BACKUP_CONFIG_JSON)}[/]")
     backup_node.add(config_group)
 
+    # Schedule manifest.jsonl.gz
+    backup_node.add(f"[green]{Formatted(BACKUP_MANIFEST)}[/]")
+
+    # Schedule chunks.jsonl.gz
+    if config.tasks.backup_chunk_tree:
+        backup_node.add(f"[green]{Formatted(BACKUP_CHUNK_TREE)}[/]")
+
     # Schedule compose.yaml
     backup_node.add(f"[green]{Formatted(COMPOSE_CONFIG_YAML)}[/]")
 
     # Schedule project files
     job = BackupJob(source_path="", target_path="project-files", project_dir=project.dir, is_dir=True)
+    project_files_job = job
     if config.tasks.backup_project_dir:
         jobs.append(job)
         backup_node.add(str(format_do_backup(job)))
@@ -245,6 +624,9 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
         backup_node.add(str(format_no_backup(job, "project dir")))
 
     has_running_or_restarting = False
+    running_services: list[str] = []
+    # Services using the source paths of the jobs (keyed by `rsync_source_path`)
+    job_services: dict[str, list[str]] = {}
 
     # Schedule volumes
     volumes_included: t.Set[str] = set()
@@ -252,6 +634,7 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
         state = next((s["State"] for s in project.ps if s["Service"] == service_name), "exited")
         if state in ("running", "restarting"):
             has_running_or_restarting = True
+            running_services.append(service_name)
 
         s = backup_node.add(f"[b]{Formatted(service_name)}[/] [i]{Formatted(state)}[/]")
         service_task = BackupConfigServiceTask(name=service_name)
@@ -273,11 +656,13 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
             ).startswith(project.dir + "/"):
                 s.add(str(format_no_backup(job, "already included", emphasize=False)))
                 service_task.exclude_volumes.append(job.rsync_source_path)
+                _add_job_service(job_services, project_files_job, service_name)
                 continue
 
             if job.rsync_source_path in volumes_included:
                 s.add(str(format_no_backup(job, "already included", emphasize=False)))
                 service_task.exclude_volumes.append(job.rsync_source_path)
+                _add_job_service(job_services, job, service_name)
                 continue
 
             is_bind_mount = volume["type"] == "bind"
@@ -309,15 +694,40 @@ def backup_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
             s.add(str(format_do_backup(job)))
             service_task.backup_volumes.append((job.relative_source_path, job.relative_target_path))
             volumes_included.add(job.rsync_source_path)
+            _add_job_service(job_services, job, service_name)
 
         if len(volumes) == 0:
             s.add("[dim](no volumes)[/]")
 
     cmds: list[PrintCmdData] = []
 
-    config.tasks.restart_project = not options.live and has_running_or_restarting
+    if options.snapshot:
+        config.tasks.snapshot = True
+        config.tasks.stop_for_snapshot = not options.live and has_running_or_restarting
+    elif options.per_service:
+        for service_task in config.tasks.backup_services:
+            service_task.stop_during_backup = (
+                not options.live
+                and service_task.name in running_services
+                and not project.doco_config.backup.is_live_service(project_name, service_task.name)
+            )
+        config.tasks.per_service = any(task.stop_during_backup for task in config.tasks.backup_services)
+    else:
+        config.tasks.restart_project = not options.live and has_running_or_restarting
+    config.tasks.pre_sync = (config.tasks.restart_project or config.tasks.per_service) and options.pre_sync
+    config.tasks.pause_services = options.pause
 
-    do_backup(project=project, options=options, config=config, jobs=jobs, cmds=cmds)
+    try:
+        do_backup(
+            project=project, options=options, config=config, jobs=jobs, job_services=job_services, cmds=cmds
+        )
+    except typer.Exit:
+        if not options.dry_run:
+            rich.print(
+                f"[i]The backup[/] [b]{Formatted(new_backup_dir)}[/] [i]is incomplete,"
+                " run again with[/] [b]--resume[/] [i]to continue it.[/]"
+            )
+        raise
 
     if options.dry_run:
         if options.dry_run_verbose:
@@ -342,12 +752,25 @@ def volumes_callback(ctx: typer.Context, volumes: list[str]) -> list[str]:
     return volumes
 
 
+def bwlimit_callback(ctx: typer.Context, bwlimit: t.Optional[str]) -> t.Optional[str]:
+    if ctx.resilient_parsing or bwlimit is None:
+        return bwlimit
+    try:
+        split_bwlimit(bwlimit, 1)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    return bwlimit
+
+
 def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
     projects: list[pathlib.Path] = PROJECTS_ARGUMENT,
+    recursive: bool = RECURSIVE_OPTION,
     services: list[str] = SERVICES_OPTION,
     profiles: list[str] = PROFILES_OPTION,
     all_profiles: bool = ALL_PROFILES_OPTION,
     running: bool = RUNNING_OPTION,
+    jobs: int = RUN_JOBS_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
     exclude_project_dir: bool = typer.Option(
         False, "-e", "--exclude-project-dir", help="Exclude project directory."
     ),
@@ -364,12 +787,82 @@ def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
         show_default=False,
     ),
     live: bool = typer.Option(False, "--live", help="Do not stop the services before backup."),
+    per_service: bool = typer.Option(
+        False,
+        "--per-service",
+        help="Stop only the services using a volume while it is copied (instead of the whole project)"
+        " and keep services running which are configured to be backed up live.",
+    ),
+    snapshot: bool = typer.Option(
+        False,
+        "--snapshot",
+        help="Stop the services only to take filesystem snapshots (btrfs snapshots or reflink copies)"
+        " of the backup sources and transfer from the snapshots (--per-service and --pre-sync are ignored).",
+    ),
+    pause: bool = typer.Option(
+        False, "--pause", help="Pause the services instead of stopping them (see docker compose pause)."
+    ),
+    pre_sync: bool = typer.Option(
+        False,
+        "--pre-sync",
+        help="Transfer the volumes once before stopping the services,"
+        " so only the changes need to be transferred while they are stopped.",
+    ),
     backup: t.Optional[str] = typer.Option(None, "--backup", "-b", help="Specify backup name."),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Continue the last incomplete backup of each project (if any) instead of starting a new one"
+        " (already transferred files are not transferred again).",
+    ),
     deep: bool = typer.Option(
         False, "--deep", help="Use deep instead of flat root dir names (e.g. home/john instead of home__john)."
     ),
-    show_progress: bool = typer.Option(False, "--progress", help="Show rsync progress."),
+    show_progress: bool = typer.Option(
+        False, "--progress", help="Show the progress of the volume transfers (per volume and in total)."
+    ),
+    parallel: int = typer.Option(
+        1,
+        "--parallel",
+        min=1,
+        help="Number of volumes to transfer in parallel per project"
+        " (output is shown per volume when finished).",
+    ),
+    bwlimit: t.Optional[str] = typer.Option(
+        None,
+        "--bwlimit",
+        metavar="RATE",
+        callback=bwlimit_callback,
+        help="Total bandwidth limit of all rsync processes running at the same time"
+        " (in KiB/s or with suffix K, M or G; split evenly between --jobs and --parallel transfers).",
+    ),
+    nice: bool = typer.Option(
+        False, "--nice", help="Run rsync with the lowest CPU and IO priority (see nice and ionice)."
+    ),
+    link_dest_count: int = typer.Option(
+        3,
+        "--link-dest-count",
+        min=1,
+        max=20,
+        help="Number of recent complete backups of a project to hard link unchanged files from"
+        " (files changed and changed back since the last backup are not transferred again).",
+    ),
+    backend: t.Optional[BackupBackend] = typer.Option(
+        None,
+        "--backend",
+        case_sensitive=False,
+        help="Store the files with rsync (hard linking unchanged files)"
+        " or as deduplicated chunks (only changed parts of files are stored)."
+        " [d]\\[default: .backup.backend or rsync][/]",
+        show_default=False,
+    ),
     verbose: bool = typer.Option(False, "--verbose", "-V", help="Print more details."),
+    single_transfer: bool = typer.Option(
+        False,
+        "--single-transfer",
+        help="Transfer all directories of a project with a single rsync call (saves connection setups;"
+        " single files and volumes with merge filter rules are transferred separately).",
+    ),
     dry_run: bool = typer.Option(
         False, "--dry-run", "-n", help="Do not actually backup, only show what would be done."
     ),
@@ -381,6 +874,9 @@ def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
     Backup projects.
     """
 
+    if resume and backup is not None:
+        raise typer.BadParameter("Cannot be combined with -b / --backup.", param_hint="'--resume'")
+
     if not skip_root_check and not (dry_run or os.geteuid() == 0):
         raise DocoError(
             "You need to have root privileges to create/download/restore a backup.\n"
@@ -394,28 +890,55 @@ def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
                 "Please see documentation for 'doco.config.toml'."
             )
 
-    for project in get_compose_projects(
+    run_concurrently = jobs > 1 and not dry_run
+    options = BackupOptions(
+        include_project_dir=not exclude_project_dir,
+        include_read_only_volumes=include_ro,
+        volumes=volume,
+        live=live,
+        backup=backup,
+        deep=deep,
+        show_progress=show_progress,
+        rsync_verbose=verbose,
+        parallel=parallel,
+        single_transfer=single_transfer,
+        pre_sync=pre_sync,
+        per_service=per_service,
+        snapshot=snapshot,
+        pause=pause,
+        rsync_bwlimit=split_bwlimit(bwlimit, (jobs if run_concurrently else 1) * parallel)
+        if bwlimit is not None
+        else None,
+        rsync_nice=nice,
+        link_dest_count=link_dest_count,
+        backend=backend,
+        resume=resume,
+        dry_run=dry_run,
+        dry_run_verbose=verbose,
+    )
+
+    compose_projects = get_compose_projects(
         projects,
         services,
         all_profiles or profiles,
         ProjectSearchOptions(
             print_compose_errors=dry_run,
             only_running=running,
+            jobs=jobs,
+            use_cache=not no_cache,
+            recursive=recursive,
         ),
-    ):
-        check_rsync_config(project.doco_config.backup.rsync)
-        backup_project(
-            project=project,
-            options=BackupOptions(
-                include_project_dir=not exclude_project_dir,
-                include_read_only_volumes=include_ro,
-                volumes=volume,
-                live=live,
-                backup=backup,
-                deep=deep,
-                show_progress=show_progress,
-                rsync_verbose=verbose,
-                dry_run=dry_run,
-                dry_run_verbose=verbose,
-            ),
+    )
+
+    if run_concurrently:
+        compose_projects_list = list(compose_projects)
+        for project in compose_projects_list:
+            check_rsync_config(project.doco_config.backup.rsync)
+        do_backup_projects_concurrently(
+            compose_projects_list, jobs=jobs, backup_task=lambda project: backup_project(project, options)
         )
+        return
+
+    for project in compose_projects:
+        check_rsync_config(project.doco_config.backup.rsync)
+        backup_project(project=project, options=options)
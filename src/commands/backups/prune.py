@@ -0,0 +1,219 @@
+import dataclasses
+import datetime
+import os
+import pathlib
+import subprocess
+import tempfile
+import typing as t
+
+import rich.tree
+import typer
+
+from src.utils.backup import load_incomplete_backup
+from src.utils.backup import load_last_backup_directory
+from src.utils.backup_catalog import CatalogEntry
+from src.utils.backup_catalog import list_catalog_backups
+from src.utils.backup_catalog import remove_backups
+from src.utils.backup_catalog import sort_backups
+from src.utils.chunk_store_rich import prune_chunk_store
+from src.utils.cli import JOBS_OPTION
+from src.utils.cli import NO_CACHE_OPTION
+from src.utils.cli import PROJECTS_ARGUMENT
+from src.utils.cli import RECURSIVE_OPTION
+from src.utils.cli import REFRESH_OPTION
+from src.utils.common import PrintCmdData
+from src.utils.compose_rich import ComposeProject
+from src.utils.compose_rich import get_compose_projects
+from src.utils.compose_rich import ProjectSearchOptions
+from src.utils.doco_config import DocoBackupRetentionPolicy
+from src.utils.exceptions_rich import DocoError
+from src.utils.retention import parse_backup_date
+from src.utils.retention import select_backups_to_keep
+from src.utils.rich import Formatted
+from src.utils.rich import rich_print_cmd
+from src.utils.rich import rich_print_conditional_cmds
+from src.utils.rich import rich_print_retry
+from src.utils.rich import RichAbortCmd
+from src.utils.rsync import RsyncConfig
+from src.utils.rsync import run_rsync_delete
+
+
+@dataclasses.dataclass
+class PruneOptions:
+    refresh: bool
+    rsync_verbose: bool
+    dry_run: bool
+    dry_run_verbose: bool
+
+
+def get_protected_backups(project: ComposeProject, project_name: str) -> dict[str, str]:
+    """Get the backups which must not be deleted with the reasons to keep them."""
+    protected: dict[str, str] = {}
+    incomplete_backup = load_incomplete_backup(project.dir)
+    if incomplete_backup is not None and os.path.dirname(incomplete_backup.backup_dir) == project_name:
+        protected[os.path.basename(incomplete_backup.backup_dir)] = "to be resumed"
+    last_backup_dir = load_last_backup_directory(project.dir)
+    if last_backup_dir is not None and os.path.dirname(last_backup_dir) == project_name:
+        protected[os.path.basename(last_backup_dir)] = "last backup"
+    return protected
+
+
+def get_project_name(project: ComposeProject) -> str:
+    # Projects without compose file (see `allow_empty`) are named after their directory
+    if "name" in project.config:
+        return project.config["name"]
+    return os.path.basename(os.path.abspath(project.dir))
+
+
+def get_backup_status(
+    entry: CatalogEntry,
+    backup_date: t.Optional[datetime.datetime],
+    protected: dict[str, str],
+    keep: dict[str, list[str]],
+) -> tuple[str, bool]:
+    """:return: Tuple of the formatted status and whether to delete the backup"""
+    if entry.name in protected:
+        return f"[green]keep[/] [dim]({protected[entry.name]})[/]", False
+    if backup_date is None:
+        return "[dim]keep (not named by doco)[/]", False
+    if not entry.complete:
+        return "[yellow]keep[/] [dim](incomplete)[/]", False
+    if entry.name in keep:
+        return f"[green]keep[/] [dim]({', '.join(keep[entry.name])})[/]", False
+    return "[red]delete[/]", True
+
+
+def plan_prune(
+    entries: list[CatalogEntry], protected: dict[str, str], policy: DocoBackupRetentionPolicy
+) -> list[tuple[CatalogEntry, str, bool]]:
+    """:return: Tuples of backup, formatted status and whether to delete it (most recent backups first)"""
+    backup_dates = {entry.name: parse_backup_date(entry.name) for entry in entries}
+    keep = select_backups_to_keep(
+        [
+            (entry.name, date)
+            for entry in entries
+            if (date := backup_dates[entry.name]) is not None and entry.complete
+        ],
+        policy,
+    )
+    return [
+        (entry, *get_backup_status(entry, backup_dates[entry.name], protected, keep))
+        for entry in sort_backups(entries)
+    ]
+
+
+def delete_backups(
+    rsync_config: RsyncConfig, project_name: str, names: list[str], options: PruneOptions
+) -> None:
+    cmds: list[PrintCmdData] = []
+    with tempfile.TemporaryDirectory() as empty_dir:
+        try:
+            cmd = run_rsync_delete(
+                rsync_config,
+                empty_dir=empty_dir,
+                target=f"{project_name}/",
+                names=names,
+                verbose=options.rsync_verbose,
+                dry_run=options.dry_run,
+                print_cmd_callback=rich_print_cmd,
+                retry_callback=rich_print_retry,
+            )
+        except subprocess.CalledProcessError as e:
+            raise RichAbortCmd(e) from e
+    cmds.append(PrintCmdData(cmd=cmd))
+
+    # Chunks of backups with the chunks backend are shared, they are deleted when no backup uses them anymore
+    pack_ids = prune_chunk_store(
+        rsync_config, project_name, verbose=options.rsync_verbose, dry_run=options.dry_run, cmds=cmds
+    )
+
+    if options.dry_run:
+        if options.dry_run_verbose:
+            rich_print_conditional_cmds(cmds)
+    else:
+        remove_backups(rsync_config, project_name, names)
+        if len(pack_ids) > 0:
+            rich.print(f"[i]Deleted[/] [b]{len(pack_ids)}[/] [i]unused packs of the chunk store[/]")
+
+
+def prune_project(project: ComposeProject, options: PruneOptions):
+    project_name = get_project_name(project)
+    rsync_config = project.doco_config.backup.rsync
+    tree = rich.tree.Tree(
+        f"[b]{Formatted(project_name)}[/] [dim]{Formatted(os.path.join(project.dir, project.file))}[/]"
+    )
+
+    policy = project.doco_config.backup.get_retention_policy(project_name)
+    if policy is None or not policy.keeps_any():
+        tree.add("[dim](no retention policy)[/]")
+        rich.print(tree)
+        return
+
+    try:
+        entries = list_catalog_backups(
+            rsync_config,
+            project_name,
+            verbose=options.rsync_verbose,
+            use_cache=not options.refresh,
+            print_cmd_callback=rich_print_cmd,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RichAbortCmd(e) from e
+
+    to_delete: list[str] = []
+    for entry, status, delete in plan_prune(entries, get_protected_backups(project, project_name), policy):
+        if delete:
+            to_delete.append(entry.name)
+        tree.add(f"{Formatted(entry.name)} {status}")
+    rich.print(tree)
+
+    if len(to_delete) > 0:
+        delete_backups(rsync_config, project_name, to_delete, options)
+
+
+def main(  # noqa: CFQ002 (max arguments)
+    projects: list[pathlib.Path] = PROJECTS_ARGUMENT,
+    recursive: bool = RECURSIVE_OPTION,
+    jobs: int = JOBS_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
+    refresh: bool = REFRESH_OPTION,
+    verbose: bool = typer.Option(False, "--verbose", "-V", help="Print more details."),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", "-n", help="Do not actually delete backups, only show what would be done."
+    ),
+):
+    """
+    Delete old backups according to the retention policies (see `.backup.retention`).
+
+    Only backups named by doco (`backup-YYYY-MM-DD_HH.MM`) are deleted,
+    never the last backup of a project or incomplete backups.
+    Packs of the chunk store no longer used by any backup are deleted, too
+    (do not prune while backups of the same projects are created).
+    """
+
+    options = PruneOptions(
+        refresh=refresh,
+        rsync_verbose=verbose,
+        dry_run=dry_run,
+        dry_run_verbose=verbose,
+    )
+
+    for project in get_compose_projects(
+        projects,
+        [],
+        [],
+        ProjectSearchOptions(
+            print_compose_errors=dry_run,
+            only_running=False,
+            allow_empty=True,
+            jobs=jobs,
+            use_cache=not no_cache,
+            recursive=recursive,
+        ),
+    ):
+        if not project.doco_config.backup.rsync.is_complete():
+            raise DocoError(
+                "You need to configure rsync to work with backups.\n"
+                "Please see documentation for 'doco.config.toml'."
+            )
+        prune_project(project, options)
@@ -18,6 +18,7 @@ from src.utils.backup import BackupJob
 from src.utils.backup import LAST_BACKUP_DIR_FILENAME
 from src.utils.backup import load_last_backup_directory
 from src.utils.backup import save_last_backup_directory
+from src.utils.backup_catalog import invalidate_backups
 from src.utils.backup_rich import create_target_structure
 from src.utils.backup_rich import do_backup_content
 from src.utils.backup_rich import do_backup_job
@@ -94,7 +95,7 @@ def do_backup(
             rsync_config=doco_config.backup.rsync,
             structure_config=doco_config.backup.structure,
             new_backup_dir=config.backup_dir,
-            old_backup_dir=config.last_backup_dir,
+            old_backup_dirs=[config.last_backup_dir] if config.last_backup_dir is not None else [],
             content=config.model_dump_json(indent=4),
             target_file_name=BACKUP_CONFIG_JSON,
             show_progress=options.show_progress,
@@ -107,7 +108,7 @@ def do_backup(
         do_backup_job(
             rsync_config=doco_config.backup.rsync,
             new_backup_dir=config.backup_dir,
-            old_backup_dir=config.last_backup_dir,
+            old_backup_dirs=[config.last_backup_dir] if config.last_backup_dir is not None else [],
             job=job,
             project_for_filter=project_for_filter,
             show_progress=options.show_progress,
@@ -121,6 +122,8 @@ def do_backup(
         save_last_backup_directory(
             options.workdir, config.backup_dir, file_name=config.tasks.create_last_backup_dir_file
         )
+    if not options.dry_run:
+        invalidate_backups(doco_config.backup.rsync, project_for_filter)
 
 
 def do_incremental_backup(
@@ -175,6 +178,8 @@ def do_incremental_backup(
         save_last_backup_directory(
             options.workdir, config.incremental_backup_dir, file_name=config.tasks.create_last_backup_dir_file
         )
+    if not options.dry_run:
+        invalidate_backups(doco_config.backup.rsync, project_for_filter)
 
 
 def backup_files(project_name: str, options: BackupOptions, doco_config: DocoConfig):  # noqa: CFQ001
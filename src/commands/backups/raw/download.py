@@ -7,6 +7,7 @@ import typing as t
 import typer
 
 from src.utils.bbak import BbakContextObject
+from src.utils.cli import REFRESH_OPTION
 from src.utils.common import PrintCmdData
 from src.utils.completers import DirectoryCompleter
 from src.utils.doco_config import DocoConfig
@@ -14,6 +15,7 @@ from src.utils.exceptions_rich import DocoError
 from src.utils.restore import get_backup_directory
 from src.utils.rich import rich_print_cmd
 from src.utils.rich import rich_print_conditional_cmds
+from src.utils.rich import rich_print_retry
 from src.utils.rich import RichAbortCmd
 from src.utils.rsync import run_rsync_download_incremental
 from src.utils.validators import project_name_callback
@@ -28,6 +30,7 @@ class DownloadOptions:  # pylint: disable=too-many-instance-attributes
     with_delete: bool
     show_progress: bool
     rsync_verbose: bool
+    refresh: bool
     dry_run: bool
 
 
@@ -38,6 +41,7 @@ def download_backup(options: DownloadOptions, doco_config: DocoConfig):
         backup_id=options.backup,
         show_progress=options.show_progress,
         verbose=options.rsync_verbose,
+        use_cache=not options.refresh,
         print_cmd_callback=rich_print_cmd,
     )
 
@@ -60,6 +64,7 @@ def download_backup(options: DownloadOptions, doco_config: DocoConfig):
             delete_from_destination=options.with_delete,
             dry_run=options.dry_run,
             print_cmd_callback=rich_print_cmd,
+            retry_callback=rich_print_retry,
         )
     except subprocess.CalledProcessError as e:
         raise RichAbortCmd(e) from e
@@ -91,6 +96,7 @@ def main(  # noqa: CFQ002 (max arguments)
     ),
     show_progress: bool = typer.Option(False, "--progress", help="Show rsync progress."),
     verbose: bool = typer.Option(False, "--verbose", "-V", help="Print more details."),
+    refresh: bool = REFRESH_OPTION,
     dry_run: bool = typer.Option(
         False, "--dry-run", "-n", help="Do not actually download, only show what would be done."
     ),
@@ -130,6 +136,7 @@ def main(  # noqa: CFQ002 (max arguments)
             with_delete=with_delete,
             show_progress=show_progress,
             rsync_verbose=verbose,
+            refresh=refresh,
             dry_run=dry_run,
         ),
         doco_config=obj.doco_config,
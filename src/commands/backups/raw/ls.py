@@ -3,6 +3,7 @@ import typing as t
 import typer
 
 from src.utils.bbak import BbakContextObject
+from src.utils.cli import REFRESH_OPTION
 from src.utils.exceptions_rich import DocoError
 from src.utils.restore_rich import list_backups
 from src.utils.restore_rich import list_projects
@@ -18,6 +19,7 @@ def main(
     ),
     show_progress: bool = typer.Option(False, "--progress", help="Show rsync progress."),
     verbose: bool = typer.Option(False, "--verbose", "-V", help="Print more details."),
+    refresh: bool = REFRESH_OPTION,
 ):
     """
     List backups.
@@ -41,8 +43,14 @@ def main(
         )
 
     if project is None:
-        list_projects(doco_config=obj.doco_config, show_progress=show_progress, verbose=verbose)
+        list_projects(
+            doco_config=obj.doco_config, show_progress=show_progress, verbose=verbose, use_cache=not refresh
+        )
     else:
         list_backups(
-            project_name=project, doco_config=obj.doco_config, show_progress=show_progress, verbose=verbose
+            project_name=project,
+            doco_config=obj.doco_config,
+            show_progress=show_progress,
+            verbose=verbose,
+            use_cache=not refresh,
         )
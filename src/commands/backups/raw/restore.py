@@ -13,6 +13,7 @@ import typer
 
 from src.utils.backup import BACKUP_CONFIG_JSON
 from src.utils.bbak import BbakContextObject
+from src.utils.cli import REFRESH_OPTION
 from src.utils.common import dir_from_path
 from src.utils.common import PrintCmdData
 from src.utils.completers_autocompletion import LegacyPathCompleter
@@ -25,18 +26,20 @@ from src.utils.restore_rich import do_restore_job
 from src.utils.restore_rich import print_details
 from src.utils.rich import Formatted
 from src.utils.rich import rich_print_cmd
+from src.utils.rich import rich_print_retry
 from src.utils.rich import RichAbortCmd
 from src.utils.rsync import run_rsync_download_incremental
 from src.utils.validators import project_name_callback
 
 
 @dataclasses.dataclass
-class RestoreOptions:
+class RestoreOptions:  # pylint: disable=too-many-instance-attributes
     paths: t.Optional[list[pathlib.Path]]
     workdir: str
     backup: str
     show_progress: bool
     rsync_verbose: bool
+    refresh: bool
     dry_run: bool
     dry_run_verbose: bool
 
@@ -77,6 +80,7 @@ def restore_files(  # noqa: C901 CFQ001 (too complex, max allowed length)
         backup_id=options.backup,
         show_progress=options.show_progress,
         verbose=options.rsync_verbose,
+        use_cache=not options.refresh,
         print_cmd_callback=rich_print_cmd,
     )
 
@@ -93,6 +97,7 @@ def restore_files(  # noqa: C901 CFQ001 (too complex, max allowed length)
                 verbose=options.rsync_verbose,
                 dry_run=False,
                 print_cmd_callback=rich_print_cmd,
+                retry_callback=rich_print_retry,
                 extra_args=["--ignore-missing-args"],
             )
         except subprocess.CalledProcessError as e:
@@ -189,6 +194,7 @@ def main(  # noqa: CFQ002 (max arguments)
     backup: str = typer.Option("0", "--backup", "-b", help="Backup index or name."),
     show_progress: bool = typer.Option(False, "--progress", help="Show rsync progress."),
     verbose: bool = typer.Option(False, "--verbose", "-V", help="Print more details."),
+    refresh: bool = REFRESH_OPTION,
     dry_run: bool = typer.Option(
         False, "--dry-run", "-n", help="Do not actually restore a backup, only show what would be done."
     ),
@@ -225,6 +231,7 @@ def main(  # noqa: CFQ002 (max arguments)
             backup=backup,
             show_progress=show_progress,
             rsync_verbose=verbose,
+            refresh=refresh,
             dry_run=dry_run,
             dry_run_verbose=verbose,
         ),
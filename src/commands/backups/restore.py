@@ -13,9 +13,17 @@ import rich.tree
 import typer
 
 from src.utils.backup import BACKUP_CONFIG_JSON
+from src.utils.backup_manifest import load_manifest
+from src.utils.backup_manifest import ManifestEntry
+from src.utils.backup_manifest import summarize_manifest
+from src.utils.chunk_store_rich import do_restore_jobs_chunked
 from src.utils.cli import ALL_PROFILES_OPTION
+from src.utils.cli import JOBS_OPTION
+from src.utils.cli import NO_CACHE_OPTION
 from src.utils.cli import PROFILES_OPTION
 from src.utils.cli import PROJECTS_ARGUMENT
+from src.utils.cli import RECURSIVE_OPTION
+from src.utils.cli import REFRESH_OPTION
 from src.utils.cli import RUNNING_OPTION
 from src.utils.cli import SERVICES_OPTION
 from src.utils.common import PrintCmdData
@@ -30,8 +38,10 @@ from src.utils.restore_rich import create_target_structure
 from src.utils.restore_rich import do_restore_job
 from src.utils.restore_rich import list_backups
 from src.utils.restore_rich import print_details
+from src.utils.rich import format_bytes
 from src.utils.rich import Formatted
 from src.utils.rich import rich_print_cmd
+from src.utils.rich import rich_print_retry
 from src.utils.rich import RichAbortCmd
 from src.utils.rsync import RsyncConfig
 from src.utils.rsync import run_rsync_download_incremental
@@ -44,6 +54,7 @@ class RestoreOptions:
     backup: str
     show_progress: bool
     rsync_verbose: bool
+    refresh: bool
     dry_run: bool
     dry_run_verbose: bool
 
@@ -56,6 +67,10 @@ class RestoreConfigTasks:
 @dataclasses.dataclass
 class RestoreConfig:
     tasks: RestoreConfigTasks
+    # Backup directory relative to the rsync root (including the project)
+    backup_dir: str = ""
+    # File name of the chunk tree if the backup was created with the chunk store backend
+    chunk_tree: t.Optional[str] = None
 
 
 def do_restore(
@@ -82,16 +97,30 @@ def do_restore(
             cmds=cmds,
         )
 
-    for job in jobs:
-        do_restore_job(
+    if config.chunk_tree is not None:
+        do_restore_jobs_chunked(
             rsync_config=project.doco_config.backup.rsync,
-            job=job,
+            backup_dir=config.backup_dir,
+            chunk_tree_file_name=config.chunk_tree,
+            jobs=jobs,
             project_for_filter=project.config["name"],
+            staging_dir_parent=project.dir,
             show_progress=options.show_progress,
             verbose=options.rsync_verbose,
             dry_run=options.dry_run,
             cmds=cmds,
         )
+    else:
+        for job in jobs:
+            do_restore_job(
+                rsync_config=project.doco_config.backup.rsync,
+                job=job,
+                project_for_filter=project.config["name"],
+                show_progress=options.show_progress,
+                verbose=options.rsync_verbose,
+                dry_run=options.dry_run,
+                cmds=cmds,
+            )
 
     if config.tasks.restart_project:
         rich_run_compose(
@@ -104,6 +133,32 @@ def do_restore(
         )
 
 
+def download_backup_file(
+    project: ComposeProject, options: RestoreOptions, backup_dir: str, file_name: str, destination: str
+):
+    try:
+        run_rsync_download_incremental(
+            project.doco_config.backup.rsync,
+            source=f"{options.project_name}/{backup_dir}/{file_name}",
+            destination=destination,
+            project_for_filter=options.project_name,
+            show_progress=options.show_progress,
+            verbose=options.rsync_verbose,
+            dry_run=False,
+            print_cmd_callback=rich_print_cmd,
+            retry_callback=rich_print_retry,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RichAbortCmd(e) from e
+
+
+def format_manifest_summary(manifest: t.Optional[list[ManifestEntry]], path: str) -> str:
+    if manifest is None:
+        return ""
+    files, size = summarize_manifest(manifest, path)
+    return f" [dim]({files} files, {format_bytes(size)})[/]"
+
+
 def restore_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
     project: ComposeProject, options: RestoreOptions
 ):
@@ -114,28 +169,25 @@ def restore_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
         backup_id=options.backup,
         show_progress=options.show_progress,
         verbose=options.rsync_verbose,
+        use_cache=not options.refresh,
         print_cmd_callback=rich_print_cmd,
     )
 
     backup_config: t.Any = {}
+    manifest: t.Optional[list[ManifestEntry]] = None
     with tempfile.TemporaryDirectory() as tmp_dir:
         config_path = os.path.join(tmp_dir, BACKUP_CONFIG_JSON)
-        try:
-            run_rsync_download_incremental(
-                project.doco_config.backup.rsync,
-                source=f"{options.project_name}/{backup_dir}/{BACKUP_CONFIG_JSON}",
-                destination=os.path.join(tmp_dir, BACKUP_CONFIG_JSON),
-                project_for_filter=options.project_name,
-                show_progress=options.show_progress,
-                verbose=options.rsync_verbose,
-                dry_run=False,
-                print_cmd_callback=rich_print_cmd,
-            )
-        except subprocess.CalledProcessError as e:
-            raise RichAbortCmd(e) from e
+        download_backup_file(project, options, backup_dir, BACKUP_CONFIG_JSON, config_path)
         with open(config_path, encoding="utf-8") as f:
             backup_config = json.load(f)
 
+        # Backups created by older versions of doco do not have a manifest
+        manifest_file_name = backup_config.get("tasks", {}).get("backup_manifest", False)
+        if options.dry_run and manifest_file_name:
+            manifest_path = os.path.join(tmp_dir, manifest_file_name)
+            download_backup_file(project, options, backup_dir, manifest_file_name, manifest_path)
+            manifest = load_manifest(manifest_path)
+
     project_name = options.project_name
     project_id_str = f"[b]{Formatted(project_name)}[/]"
     project_id_str += f" [dim]{Formatted(os.path.join(project.dir, project.file))}[/]"
@@ -175,6 +227,11 @@ def restore_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
 
     config = RestoreConfig(
         tasks=RestoreConfigTasks(),
+        backup_dir=backup_config["backup_dir"],
+        # Backups created by older versions of doco do not have a backend
+        chunk_tree=backup_config.get("tasks", {}).get("backup_chunk_tree") or None
+        if backup_config.get("backend", "rsync") == "chunks"
+        else None,
     )
     jobs: list[RestoreJob] = []
 
@@ -206,6 +263,9 @@ def restore_project(  # noqa: C901 CFQ001 (too complex, max allowed length)
             action = "(create)"
         backup_node.add(
             f"{job.display_source_path} [dim]->[/] [dark_orange]{job.display_target_path}[/] {action}"
+            + format_manifest_summary(
+                manifest, os.path.relpath(job.rsync_source_path, backup_config["backup_dir"])
+            )
         )
 
     cmds: list[PrintCmdData] = []
@@ -226,12 +286,15 @@ def get_project_name(project_name: t.Optional[str], project: ComposeProject) ->
     return os.path.basename(os.path.abspath(project.dir))
 
 
-def main(  # noqa: CFQ002 (max arguments)
+def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
     projects: list[pathlib.Path] = PROJECTS_ARGUMENT,
+    recursive: bool = RECURSIVE_OPTION,
     services: list[str] = SERVICES_OPTION,
     profiles: list[str] = PROFILES_OPTION,
     all_profiles: bool = ALL_PROFILES_OPTION,
     running: bool = RUNNING_OPTION,
+    jobs: int = JOBS_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
     name: t.Optional[str] = typer.Option(
         None, callback=project_name_callback, help="Override project name. Using directory name if not given."
     ),
@@ -239,6 +302,7 @@ def main(  # noqa: CFQ002 (max arguments)
     backup: str = typer.Option("0", "--backup", "-b", help="Backup index or name."),
     show_progress: bool = typer.Option(False, "--progress", help="Show rsync progress."),
     verbose: bool = typer.Option(False, "--verbose", "-V", help="Print more details."),
+    refresh: bool = REFRESH_OPTION,
     dry_run: bool = typer.Option(
         False, "--dry-run", "-n", help="Do not actually restore a backup, only show what would be done."
     ),
@@ -265,6 +329,9 @@ def main(  # noqa: CFQ002 (max arguments)
                 print_compose_errors=dry_run,
                 only_running=running,
                 allow_empty=True,
+                jobs=jobs,
+                use_cache=not no_cache,
+                recursive=recursive,
             ),
         )
     )
@@ -291,6 +358,7 @@ def main(  # noqa: CFQ002 (max arguments)
                 doco_config=compose_project.doco_config,
                 show_progress=show_progress,
                 verbose=verbose,
+                use_cache=not refresh,
             )
     else:
         for compose_project in compose_projects:
@@ -302,6 +370,7 @@ def main(  # noqa: CFQ002 (max arguments)
                     backup=backup,
                     show_progress=show_progress,
                     rsync_verbose=verbose,
+                    refresh=refresh,
                     dry_run=dry_run,
                     dry_run_verbose=verbose,
                 ),
@@ -4,8 +4,11 @@ import pathlib
 import typer
 
 from src.utils.cli import ALL_PROFILES_OPTION
+from src.utils.cli import NO_CACHE_OPTION
 from src.utils.cli import PROFILES_OPTION
 from src.utils.cli import PROJECTS_ARGUMENT
+from src.utils.cli import RECURSIVE_OPTION
+from src.utils.cli import RUN_JOBS_OPTION
 from src.utils.cli import RUNNING_OPTION
 from src.utils.cli import SERVICES_OPTION
 from src.utils.compose_rich import ComposeProject
@@ -13,7 +16,11 @@ from src.utils.compose_rich import get_compose_projects
 from src.utils.compose_rich import ProjectSearchOptions
 from src.utils.compose_rich import rich_run_compose
 from src.utils.doco import do_project_cmd
+from src.utils.doco import do_project_cmds_concurrently
 from src.utils.doco import ProjectInfo
+from src.utils.project_dependencies import get_project_dependencies
+from src.utils.project_dependencies import reverse_dependencies
+from src.utils.project_dependencies import sort_projects
 
 
 @dataclasses.dataclass
@@ -45,12 +52,15 @@ def down_project(project: ComposeProject, options: Options, info: ProjectInfo):
         )
 
 
-def main(  # noqa: CFQ002 (max arguments)
+def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
     projects: list[pathlib.Path] = PROJECTS_ARGUMENT,
+    recursive: bool = RECURSIVE_OPTION,
     services: list[str] = SERVICES_OPTION,
     profiles: list[str] = PROFILES_OPTION,
     all_profiles: bool = ALL_PROFILES_OPTION,
     running: bool = RUNNING_OPTION,
+    jobs: int = RUN_JOBS_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
     remove_volumes: bool = typer.Option(
         False, "--remove-volumes", "-v", help="Remove volumes (implies -f / --force)."
     ),
@@ -64,27 +74,45 @@ def main(  # noqa: CFQ002 (max arguments)
     Shutdown projects.
     """
 
-    for project in get_compose_projects(
-        projects,
-        services,
-        all_profiles or profiles,
-        ProjectSearchOptions(
-            print_compose_errors=dry_run,
-            only_running=running,
-        ),
-    ):
+    options = Options(
+        remove_volumes=remove_volumes,
+        no_remove_orphans=no_remove_orphans,
+        force_down=force,
+        dry_run=dry_run,
+    )
+
+    compose_projects = list(
+        get_compose_projects(
+            projects,
+            services,
+            all_profiles or profiles,
+            ProjectSearchOptions(
+                print_compose_errors=dry_run,
+                only_running=running,
+                jobs=jobs,
+                use_cache=not no_cache,
+                recursive=recursive,
+            ),
+        )
+    )
+    # Stop projects before the projects they depend on.
+    dependencies = reverse_dependencies(get_project_dependencies(compose_projects))
+
+    if jobs > 1 and not dry_run:
+        do_project_cmds_concurrently(
+            compose_projects,
+            dependencies,
+            jobs=jobs,
+            plan_task=lambda project, info: down_project(
+                project, options=dataclasses.replace(options, dry_run=True), info=info
+            ),
+        )
+        return
+
+    for project in sort_projects(compose_projects, dependencies):
         do_project_cmd(
-            # pylint: disable=cell-var-from-loop
             project=project,
             dry_run=dry_run,
-            cmd_task=lambda info: down_project(
-                project,
-                options=Options(
-                    remove_volumes=remove_volumes,
-                    no_remove_orphans=no_remove_orphans,
-                    force_down=force,
-                    dry_run=dry_run,
-                ),
-                info=info,
-            ),
+            # pylint: disable=cell-var-from-loop
+            cmd_task=lambda info: down_project(project, options=options, info=info),
         )
@@ -4,8 +4,11 @@ import pathlib
 import typer
 
 from src.utils.cli import ALL_PROFILES_OPTION
+from src.utils.cli import JOBS_OPTION
+from src.utils.cli import NO_CACHE_OPTION
 from src.utils.cli import PROFILES_OPTION
 from src.utils.cli import PROJECTS_ARGUMENT
+from src.utils.cli import RECURSIVE_OPTION
 from src.utils.cli import RUNNING_OPTION
 from src.utils.cli import SERVICES_OPTION
 from src.utils.compose_rich import ComposeProject
@@ -41,10 +44,13 @@ def log_project(project: ComposeProject, options: Options, info: ProjectInfo):
 
 def main(  # noqa: CFQ002 (max arguments)
     projects: list[pathlib.Path] = PROJECTS_ARGUMENT,
+    recursive: bool = RECURSIVE_OPTION,
     services: list[str] = SERVICES_OPTION,
     profiles: list[str] = PROFILES_OPTION,
     all_profiles: bool = ALL_PROFILES_OPTION,
     running: bool = RUNNING_OPTION,
+    jobs: int = JOBS_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
     show_timestamps: bool = typer.Option(False, "--timestamps", "-t", help="Show timestamps."),
     no_follow: bool = typer.Option(False, "--no-follow", "-q", help="Quit right after printing logs."),
 ):
@@ -59,6 +65,9 @@ def main(  # noqa: CFQ002 (max arguments)
         ProjectSearchOptions(
             print_compose_errors=False,
             only_running=running,
+            jobs=jobs,
+            use_cache=not no_cache,
+            recursive=recursive,
         ),
     ):
         do_project_cmd(
@@ -11,8 +11,11 @@ import rich.tree
 import typer
 
 from src.utils.cli import ALL_PROFILES_OPTION
+from src.utils.cli import JOBS_OPTION
+from src.utils.cli import NO_CACHE_OPTION
 from src.utils.cli import PROFILES_OPTION
 from src.utils.cli import PROJECTS_ARGUMENT
+from src.utils.cli import RECURSIVE_OPTION
 from src.utils.cli import RUNNING_OPTION
 from src.utils.cli import SERVICES_OPTION
 from src.utils.common import relative_path_if_below
@@ -331,12 +334,15 @@ DETAILS_GROUP = {"rich_help_panel": "Content detail Options"}
 FORMATTING_GROUP = {"rich_help_panel": "Formatting Options"}
 
 
-def main(  # noqa: CFQ002 (max arguments)
+def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
     projects: list[pathlib.Path] = PROJECTS_ARGUMENT,
+    recursive: bool = RECURSIVE_OPTION,
     services: list[str] = SERVICES_OPTION,
     profiles: list[str] = PROFILES_OPTION,
     all_profiles: bool = ALL_PROFILES_OPTION,
     running: bool = RUNNING_OPTION,
+    jobs: int = JOBS_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
     path: bool = typer.Option(False, "--path", **DETAILS_GROUP, help="Print path of compose file."),
     print_individual_profiles: bool = typer.Option(
         False, "--profiles", "-P", **DETAILS_GROUP, help="Output profile names of services."
@@ -384,6 +390,9 @@ def main(  # noqa: CFQ002 (max arguments)
         ProjectSearchOptions(
             print_compose_errors=True,
             only_running=running,
+            jobs=jobs,
+            use_cache=not no_cache,
+            recursive=recursive,
         ),
     ):
         print_project(
@@ -1,19 +1,30 @@
 import dataclasses
+import functools
 import pathlib
+import typing as t
 
 import typer
 
 from src.utils.cli import ALL_PROFILES_OPTION
+from src.utils.cli import CHANGED_OPTION
+from src.utils.cli import NO_CACHE_OPTION
 from src.utils.cli import PROFILES_OPTION
 from src.utils.cli import PROJECTS_ARGUMENT
+from src.utils.cli import RECURSIVE_OPTION
+from src.utils.cli import RUN_JOBS_OPTION
 from src.utils.cli import RUNNING_OPTION
 from src.utils.cli import SERVICES_OPTION
 from src.utils.compose_rich import ComposeProject
 from src.utils.compose_rich import get_compose_projects
 from src.utils.compose_rich import ProjectSearchOptions
 from src.utils.compose_rich import rich_run_compose
+from src.utils.deploy_state import save_deployed_hashes
+from src.utils.deploy_state import select_changed_services
 from src.utils.doco import do_project_cmd
+from src.utils.doco import do_project_cmds_concurrently
 from src.utils.doco import ProjectInfo
+from src.utils.project_dependencies import get_project_dependencies
+from src.utils.project_dependencies import sort_projects
 
 
 @dataclasses.dataclass
@@ -23,11 +34,16 @@ class Options:
     show_timestamps: bool
     no_build: bool
     no_remove_orphans: bool
+    only_changed: bool
     dry_run: bool
 
 
 def up_project(project: ComposeProject, options: Options, info: ProjectInfo):
-    if not info.all_running:
+    services: t.Optional[list[str]] = project.selected_services
+    if info.all_running:
+        services = select_changed_services(project) if options.only_changed else None
+
+    if services is not None:
         rich_run_compose(
             project.dir,
             project.file,
@@ -38,11 +54,12 @@ def up_project(project: ComposeProject, options: Options, info: ProjectInfo):
                 *(["--build"] if not options.no_build else []),
                 *(["--pull", "always"] if options.do_pull else []),
                 "-d",
-                *project.selected_services,
+                *services,
             ],
             dry_run=options.dry_run,
             cmds=info.cmds,
         )
+        info.on_success.append(functools.partial(save_deployed_hashes, project, services))
 
     if options.do_log:
         rich_run_compose(
@@ -61,12 +78,16 @@ def up_project(project: ComposeProject, options: Options, info: ProjectInfo):
         )
 
 
-def main(  # noqa: CFQ002 (max arguments)
+def main(  # noqa: CFQ002 (max arguments) pylint: disable=too-many-locals
     projects: list[pathlib.Path] = PROJECTS_ARGUMENT,
+    recursive: bool = RECURSIVE_OPTION,
     services: list[str] = SERVICES_OPTION,
     profiles: list[str] = PROFILES_OPTION,
     all_profiles: bool = ALL_PROFILES_OPTION,
     running: bool = RUNNING_OPTION,
+    jobs: int = RUN_JOBS_OPTION,
+    no_cache: bool = NO_CACHE_OPTION,
+    only_changed: bool = CHANGED_OPTION,
     do_pull: bool = typer.Option(False, "--pull", help="Pull images before running."),
     do_log: bool = typer.Option(False, "--log", "-l", help="Also show logs."),
     show_timestamps: bool = typer.Option(False, "--timestamps", "-t", help="Show timestamps in logs."),
@@ -80,29 +101,50 @@ def main(  # noqa: CFQ002 (max arguments)
     Start projects.
     """
 
-    for project in get_compose_projects(
-        projects,
-        services,
-        all_profiles or profiles,
-        ProjectSearchOptions(
-            print_compose_errors=dry_run,
-            only_running=running,
-        ),
-    ):
+    if do_log and jobs > 1:
+        raise typer.BadParameter("Cannot be combined with -j / --jobs.", param_hint="'-l' / '--log'")
+
+    options = Options(
+        do_pull=do_pull,
+        do_log=do_log,
+        show_timestamps=show_timestamps,
+        no_build=no_build,
+        no_remove_orphans=no_remove_orphans,
+        only_changed=only_changed,
+        dry_run=dry_run,
+    )
+
+    compose_projects = list(
+        get_compose_projects(
+            projects,
+            services,
+            all_profiles or profiles,
+            ProjectSearchOptions(
+                print_compose_errors=dry_run,
+                only_running=running,
+                jobs=jobs,
+                use_cache=not no_cache,
+                recursive=recursive,
+            ),
+        )
+    )
+    dependencies = get_project_dependencies(compose_projects)
+
+    if jobs > 1 and not dry_run:
+        do_project_cmds_concurrently(
+            compose_projects,
+            dependencies,
+            jobs=jobs,
+            plan_task=lambda project, info: up_project(
+                project, options=dataclasses.replace(options, dry_run=True), info=info
+            ),
+        )
+        return
+
+    for project in sort_projects(compose_projects, dependencies):
         do_project_cmd(
-            # pylint: disable=cell-var-from-loop
             project=project,
             dry_run=dry_run,
-            cmd_task=lambda info: up_project(
-                project,
-                options=Options(
-                    do_pull=do_pull,
-                    do_log=do_log,
-                    show_timestamps=show_timestamps,
-                    no_build=no_build,
-                    no_remove_orphans=no_remove_orphans,
-                    dry_run=dry_run,
-                ),
-                info=info,
-            ),
+            # pylint: disable=cell-var-from-loop
+            cmd_task=lambda info: up_project(project, options=options, info=info),
         )
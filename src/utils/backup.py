@@ -1,11 +1,16 @@
 import dataclasses
+import hashlib
+import json
 import os
 import typing as t
 
 from src.utils.common import relative_path
 from src.utils.common import relative_path_if_below
+from src.utils.system import get_state_dir
 
 BACKUP_CONFIG_JSON = "config.json"
+BACKUP_MANIFEST = "manifest.jsonl.gz"
+BACKUP_CHUNK_TREE = "chunks.jsonl.gz"
 LAST_BACKUP_DIR_FILENAME = ".last-backup-dir"
 
 
@@ -67,3 +72,61 @@ def save_last_backup_directory(project_dir: str, value: str, file_name: str) ->
     path = os.path.join(project_dir, file_name)
     with open(path, "w", encoding="utf-8") as f:
         f.write(value + "\n")
+
+
+def select_link_dest_backup_dirs(
+    complete_backups: list[tuple[str, str]],
+    project_backups_dir: str,
+    new_backup_dir: str,
+    last_backup_dir: t.Optional[str],
+    count: int,
+) -> list[str]:
+    """Select the backup directories to hard link unchanged files from (see rsync's `--link-dest`).
+
+    :param complete_backups: Date-name-tuples of the complete backups in `project_backups_dir`
+    :return: The last backup directory first, then the most recent other complete backups
+    """
+    backup_dirs = [last_backup_dir] if last_backup_dir is not None else []
+    for _, name in sorted(complete_backups, reverse=True):
+        backup_dir = os.path.join(project_backups_dir, name)
+        if backup_dir not in backup_dirs and backup_dir != new_backup_dir:
+            backup_dirs.append(backup_dir)
+    return backup_dirs[:count]
+
+
+@dataclasses.dataclass
+class IncompleteBackup:
+    backup_dir: str
+    last_backup_dir: t.Optional[str]
+
+
+def _get_incomplete_backup_path(project_dir: str) -> str:
+    key = hashlib.sha256(os.path.abspath(project_dir).encode()).hexdigest()
+    return os.path.join(get_state_dir(), "incomplete-backups", f"{key}.json")
+
+
+def load_incomplete_backup(project_dir: str) -> t.Optional[IncompleteBackup]:
+    """Load the backup of the project which was started but did not finish (see `save_incomplete_backup`)."""
+    try:
+        with open(_get_incomplete_backup_path(project_dir), encoding="utf-8") as f:
+            backup = IncompleteBackup(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    if ".." in backup.backup_dir or backup.backup_dir.startswith("/"):
+        return None
+    return backup
+
+
+def save_incomplete_backup(project_dir: str, backup: IncompleteBackup) -> None:
+    """Remember a backup before it is transferred, until it is finished (see `remove_incomplete_backup`)."""
+    path = _get_incomplete_backup_path(project_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dataclasses.asdict(backup), f)
+
+
+def remove_incomplete_backup(project_dir: str) -> None:
+    try:
+        os.remove(_get_incomplete_backup_path(project_dir))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,228 @@
+"""Local cache of the backups stored at an rsync destination
+
+Listing the backups requires a network round trip (`rsync --list-only`),
+so the listings of the projects and of each project's backups are kept
+in doco's cache directory (one catalog per rsync destination).
+A listing is used until it is older than `.backup.rsync.list_cache_ttl` seconds,
+backups created by doco are added to it right away.
+"""
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import typing as t
+
+import pydantic
+
+from src.utils.backup import BACKUP_CONFIG_JSON
+from src.utils.common import print_cmd
+from src.utils.common import PrintCmdCallable
+from src.utils.retention import parse_backup_date
+from src.utils.rsync import RsyncConfig
+from src.utils.rsync import run_rsync_list
+from src.utils.system import get_cache_dir
+
+CACHE_SUBDIR = "backup-catalog"
+# Date format of rsync's listing
+CATALOG_DATE_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+# Catalogs are updated by concurrent backups of multiple projects
+_lock = threading.Lock()
+
+
+class CatalogEntry(pydantic.BaseModel):
+    name: str
+    # Modification date as listed by rsync (e.g. 2022/11/07 18:47:30)
+    mtime: str
+    # Total size of the backed up files, only known for backups created by doco
+    size: t.Optional[int] = None
+    # Whether the backup contains its config file (uploaded last), not known for projects
+    complete: t.Optional[bool] = None
+
+
+class CatalogListing(pydantic.BaseModel):
+    listed_at: float
+    entries: list[CatalogEntry] = []
+
+    def is_fresh(self, ttl: float) -> bool:
+        return 0 <= time.time() - self.listed_at < ttl
+
+
+class BackupCatalog(pydantic.BaseModel):
+    destination: str
+    projects: t.Optional[CatalogListing] = None
+    backups: dict[str, CatalogListing] = {}
+
+
+def _get_destination(config: RsyncConfig) -> str:
+    return json.dumps([config.user, config.host, config.module, config.root])
+
+
+def _get_catalog_path(config: RsyncConfig) -> str:
+    key = hashlib.sha256(_get_destination(config).encode()).hexdigest()
+    return os.path.join(get_cache_dir(), CACHE_SUBDIR, f"{key}.json")
+
+
+def load_catalog(config: RsyncConfig) -> BackupCatalog:
+    try:
+        with open(_get_catalog_path(config), encoding="utf-8") as f:
+            catalog = BackupCatalog.model_validate_json(f.read())
+        if catalog.destination == _get_destination(config):
+            return catalog
+    except (OSError, ValueError):
+        pass
+    return BackupCatalog(destination=_get_destination(config))
+
+
+def save_catalog(config: RsyncConfig, catalog: BackupCatalog) -> None:
+    path = _get_catalog_path(config)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(catalog.model_dump_json())
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def get_complete_backup_filter_args() -> list[str]:
+    """rsync filter arguments to list the backup directories of a project with their config file.
+
+    Hidden directories (e.g. the chunk store, see `chunk_store`) are not listed.
+    """
+    return ["-r", "-f", "- /.*/", "-f", "+ /*/", "-f", f"+ /*/{BACKUP_CONFIG_JSON}", "-f", "- *"]
+
+
+def _entries_from_backup_listing(
+    date_file_tuples: list[tuple[str, str]], known_entries: list[CatalogEntry]
+) -> list[CatalogEntry]:
+    suffix = "/" + BACKUP_CONFIG_JSON
+    complete_backups = {file[: -len(suffix)] for _, file in date_file_tuples if file.endswith(suffix)}
+    known_sizes = {entry.name: entry.size for entry in known_entries}
+    return [
+        CatalogEntry(name=file, mtime=date, size=known_sizes.get(file), complete=file in complete_backups)
+        for date, file in date_file_tuples
+        if "/" not in file
+    ]
+
+
+def list_catalog_projects(
+    config: RsyncConfig,
+    *,
+    show_progress: bool = False,
+    verbose: bool = False,
+    use_cache: bool = True,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+) -> list[CatalogEntry]:
+    """List the projects at the rsync destination (cached, see module docstring).
+
+    :raises subprocess.CalledProcessError:
+    """
+    catalog = load_catalog(config)
+    if use_cache and catalog.projects is not None and catalog.projects.is_fresh(config.list_cache_ttl):
+        return catalog.projects.entries
+    listed_at = time.time()
+    _, date_file_tuples = run_rsync_list(
+        config,
+        target="",
+        show_progress=show_progress,
+        verbose=verbose,
+        dry_run=False,
+        print_cmd_callback=print_cmd_callback,
+    )
+    listing = CatalogListing(
+        listed_at=listed_at, entries=[CatalogEntry(name=file, mtime=date) for date, file in date_file_tuples]
+    )
+    with _lock:
+        catalog = load_catalog(config)
+        catalog.projects = listing
+        save_catalog(config, catalog)
+    return listing.entries
+
+
+def list_catalog_backups(
+    config: RsyncConfig,
+    project_name: str,
+    *,
+    show_progress: bool = False,
+    verbose: bool = False,
+    use_cache: bool = True,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+) -> list[CatalogEntry]:
+    """List the backups of a project at the rsync destination (cached, see module docstring).
+
+    :raises subprocess.CalledProcessError:
+    """
+    catalog = load_catalog(config)
+    cached = catalog.backups.get(project_name)
+    if use_cache and cached is not None and cached.is_fresh(config.list_cache_ttl):
+        return cached.entries
+    listed_at = time.time()
+    _, date_file_tuples = run_rsync_list(
+        config,
+        target=f"{project_name}/",
+        show_progress=show_progress,
+        verbose=verbose,
+        dry_run=False,
+        print_cmd_callback=print_cmd_callback,
+        extra_args=get_complete_backup_filter_args(),
+    )
+    with _lock:
+        catalog = load_catalog(config)
+        cached = catalog.backups.get(project_name)
+        listing = CatalogListing(
+            listed_at=listed_at,
+            entries=_entries_from_backup_listing(
+                date_file_tuples, cached.entries if cached is not None else []
+            ),
+        )
+        catalog.backups[project_name] = listing
+        save_catalog(config, catalog)
+    return listing.entries
+
+
+def sort_backups(entries: list[CatalogEntry]) -> list[CatalogEntry]:
+    """Sort backups by modification date in descending order, but an item `backup` always comes first."""
+    return sorted(entries, key=lambda entry: (entry.name == "backup", entry.mtime), reverse=True)
+
+
+def add_backup(config: RsyncConfig, project_name: str, backup_name: str, size: t.Optional[int]) -> None:
+    """Add a backup created by doco to the cached listings (if any).
+
+    The backup's date is taken from its name (the time its directory was created),
+    the current date is used only for backups with custom names.
+    """
+    mtime = (parse_backup_date(backup_name) or datetime.datetime.now()).strftime(CATALOG_DATE_FORMAT)
+    with _lock:
+        catalog = load_catalog(config)
+        cached = catalog.backups.get(project_name)
+        if cached is not None:
+            entry = CatalogEntry(name=backup_name, mtime=mtime, size=size, complete=True)
+            cached.entries = [e for e in cached.entries if e.name != backup_name] + [entry]
+        if catalog.projects is not None and all(e.name != project_name for e in catalog.projects.entries):
+            catalog.projects.entries.append(CatalogEntry(name=project_name, mtime=mtime))
+        save_catalog(config, catalog)
+
+
+def remove_backups(config: RsyncConfig, project_name: str, backup_names: list[str]) -> None:
+    """Remove deleted backups from the cached listing of the project's backups (if any)."""
+    with _lock:
+        catalog = load_catalog(config)
+        cached = catalog.backups.get(project_name)
+        if cached is None:
+            return
+        cached.entries = [e for e in cached.entries if e.name not in backup_names]
+        save_catalog(config, catalog)
+
+
+def invalidate_backups(config: RsyncConfig, project_name: str) -> None:
+    """Drop the cached listing of the project's backups, e.g. after changing backups in an unknown way."""
+    with _lock:
+        catalog = load_catalog(config)
+        catalog.backups.pop(project_name, None)
+        if catalog.projects is not None and all(e.name != project_name for e in catalog.projects.entries):
+            catalog.projects = None
+        save_catalog(config, catalog)
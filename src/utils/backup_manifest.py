@@ -0,0 +1,81 @@
+"""Manifest of the files of a backup
+
+The manifest is stored next to the backup's config file as gzip-compressed JSON lines
+(one `ManifestEntry` per line, sorted by path), so a backup can be inspected or a restore be planned
+by downloading a single small file instead of listing the backup recursively at the rsync destination.
+The entries are taken from a local listing of the backed up sources (see `rsync_list_local_cmd`).
+"""
+import gzip
+import os
+import re
+import typing as t
+
+import pydantic
+
+_RSYNC_LOCAL_LIST_REGEX = re.compile(
+    r"^(?P<mode>[^ ]+) +(?P<size>[\d,]+) +(?P<mtime>[^ ]+ [^ ]+) (?P<file>.*)$"
+)
+
+
+class ManifestEntry(pydantic.BaseModel):
+    # Path relative to the backup directory
+    path: str
+    # Permissions as listed by rsync (e.g. -rw-r--r--), the first character is the file type
+    mode: str
+    size: int
+    # Modification date as listed by rsync (e.g. 2022/11/07 18:47:30)
+    mtime: str
+
+    @property
+    def is_file(self) -> bool:
+        return self.mode.startswith("-")
+
+
+def parse_manifest_entries(listing: str, target_path: str, is_dir: bool) -> list[ManifestEntry]:
+    """Parse the local listing of a backed up source (see `rsync_list_local_cmd`).
+
+    :param target_path: Path of the source relative to the backup directory
+    """
+    entries: list[ManifestEntry] = []
+    for line in listing.splitlines():
+        match = _RSYNC_LOCAL_LIST_REGEX.match(line)
+        if match is None:
+            continue
+        mode, file = match.group("mode"), match.group("file")
+        if mode.startswith("l"):
+            file = file.split(" -> ", 1)[0]
+        entries.append(
+            ManifestEntry(
+                path=os.path.normpath(os.path.join(target_path, file))
+                if is_dir
+                else os.path.normpath(target_path),
+                mode=mode,
+                size=int(match.group("size").replace(",", "")),
+                mtime=match.group("mtime"),
+            )
+        )
+    return entries
+
+
+def dump_manifest(entries: t.Iterable[ManifestEntry]) -> bytes:
+    lines = [entry.model_dump_json() + "\n" for entry in sorted(entries, key=lambda entry: entry.path)]
+    return gzip.compress("".join(lines).encode("utf-8"), mtime=0)
+
+
+def load_manifest(path: str) -> list[ManifestEntry]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [ManifestEntry.model_validate_json(line) for line in f if line.strip() != ""]
+
+
+def summarize_manifest(entries: list[ManifestEntry], path: str) -> tuple[int, int]:
+    """Count the files below the given path (relative to the backup directory).
+
+    :return: Tuple of number of files and their total size
+    """
+    path = os.path.normpath(path)
+    files = [
+        entry
+        for entry in entries
+        if entry.is_file and (entry.path == path or entry.path.startswith(path + "/") or path == ".")
+    ]
+    return len(files), sum(entry.size for entry in files)
@@ -1,21 +1,77 @@
+import asyncio
+import concurrent.futures
+import copy
+import dataclasses
+import functools
 import os
+import re
 import subprocess
 import tempfile
+import time
 import typing as t
 
+import pydantic
+import rich.rule
+import rich.table
+import rich.text
+import typer
+
 from src.utils.backup import BackupJob
+from src.utils.backup import select_link_dest_backup_dirs
+from src.utils.backup_catalog import list_catalog_backups
+from src.utils.backup_manifest import ManifestEntry
+from src.utils.backup_manifest import parse_manifest_entries
 from src.utils.common import PrintCmdData
+from src.utils.compose_rich import ComposeProject
+from src.utils.console import console
 from src.utils.doco_config import DocoBackupStructureConfig
+from src.utils.output import capture_thread_output
+from src.utils.output import run_cmd_tee
+from src.utils.progress_rich import RsyncProgressDisplay
+from src.utils.rich import format_bytes
 from src.utils.rich import Formatted
 from src.utils.rich import rich_print_cmd
+from src.utils.rich import rich_print_retry
 from src.utils.rich import RichAbortCmd
+from src.utils.rsync import get_filter_rules
+from src.utils.rsync import parse_rsync_stats
+from src.utils.rsync import rsync_backup_relative_cmd
+from src.utils.rsync import rsync_backup_with_hardlinks_cmd
 from src.utils.rsync import RsyncConfig
+from src.utils.rsync import RsyncStats
 from src.utils.rsync import run_rsync_backup_incremental
 from src.utils.rsync import run_rsync_backup_with_hardlinks
+from src.utils.rsync import run_rsync_list_local
 from src.utils.rsync import run_rsync_without_delete
+from src.utils.rsync import run_with_retries
+from src.utils.rsync import run_with_retries_async
+from src.utils.rsync import scope_filter_rule
+from src.utils.runner import ProcessRunner
+from src.utils.runner import run_coroutine
+from src.utils.snapshot import create_snapshot
+from src.utils.snapshot import delete_snapshot
+from src.utils.snapshot import plan_snapshot
+from src.utils.snapshot import Snapshot
+from src.utils.snapshot import SnapshotError
 from src.utils.system import chown_given_strings
 
 
+class TransferStats(pydantic.BaseModel):
+    # Multiple target paths if they were transferred with a single rsync call (see `do_backup_jobs_combined`)
+    target_paths: list[str]
+    stats: RsyncStats
+
+
+def add_transfer_stats(
+    stats: list[TransferStats], target_paths: list[str], transfer_stats: RsyncStats
+) -> None:
+    for entry in stats:
+        if entry.target_paths == target_paths:
+            entry.stats += transfer_stats
+            return
+    stats.append(TransferStats(target_paths=target_paths, stats=transfer_stats))
+
+
 def format_do_backup(job: BackupJob) -> Formatted:
     return Formatted(
         f"[green][b]{Formatted(job.display_source_path)}[/] "
@@ -34,8 +90,8 @@ def do_backup_content(  # noqa: CFQ002 (max arguments)
     rsync_config: RsyncConfig,
     structure_config: DocoBackupStructureConfig,
     new_backup_dir: str,
-    old_backup_dir: t.Optional[str],
-    content: str,
+    old_backup_dirs: list[str],
+    content: t.Union[str, bytes],
     target_file_name: str,
     show_progress: bool,
     verbose: bool,
@@ -44,20 +100,25 @@ def do_backup_content(  # noqa: CFQ002 (max arguments)
 ):
     with tempfile.TemporaryDirectory() as tmp_dir:
         source = os.path.join(tmp_dir, target_file_name)
-        with open(source, "w", encoding="utf-8") as f:
-            f.write(content)
+        if isinstance(content, bytes):
+            with open(source, "wb") as f:
+                f.write(content)
+        else:
+            with open(source, "w", encoding="utf-8") as f:
+                f.write(content)
         chown_given_strings(source, structure_config.uid, structure_config.gid)
         try:
             cmd = run_rsync_backup_with_hardlinks(
                 config=rsync_config,
                 source=source,
                 new_backup=os.path.join(new_backup_dir, target_file_name),
-                old_backup_dirs=[old_backup_dir] if old_backup_dir is not None else [],
+                old_backup_dirs=old_backup_dirs,
                 project_for_filter="",
                 show_progress=show_progress,
                 verbose=verbose,
                 dry_run=dry_run,
                 print_cmd_callback=rich_print_cmd,
+                retry_callback=rich_print_retry,
             )
         except subprocess.CalledProcessError as e:
             raise RichAbortCmd(e) from e
@@ -90,46 +151,337 @@ def do_copy_content(  # noqa: CFQ002 (max arguments)
                 verbose=verbose,
                 dry_run=dry_run,
                 print_cmd_callback=rich_print_cmd,
+                retry_callback=rich_print_retry,
             )
         except subprocess.CalledProcessError as e:
             raise RichAbortCmd(e) from e
         cmds.append(PrintCmdData(cmd=cmd))
 
 
+def get_link_dest_backup_dirs(
+    rsync_config: RsyncConfig,
+    new_backup_dir: str,
+    last_backup_dir: t.Optional[str],
+    count: int,
+) -> list[str]:
+    """Get the backup directories to hard link unchanged files from (see `select_link_dest_backup_dirs`).
+
+    The existing backups are listed also in dry-run mode (the listing does not change anything).
+    Falls back to the last backup directory if the existing backups cannot be listed
+    (e.g. because there are none yet).
+    """
+    if count <= 1:
+        return [last_backup_dir] if last_backup_dir is not None else []
+    project_backups_dir = os.path.dirname(new_backup_dir)
+    try:
+        entries = list_catalog_backups(rsync_config, project_backups_dir, print_cmd_callback=rich_print_cmd)
+    except subprocess.CalledProcessError as e:
+        if last_backup_dir is None:
+            return []
+        rich.print(
+            f"[yellow]Could not list the existing backups of[/] [b]{Formatted(project_backups_dir)}[/]"
+            f" [dim](exit code {e.returncode})[/][yellow], only linking to the last backup.[/]"
+        )
+        return [last_backup_dir]
+    return select_link_dest_backup_dirs(
+        [(entry.mtime, entry.name) for entry in entries if entry.complete],
+        project_backups_dir=project_backups_dir,
+        new_backup_dir=new_backup_dir,
+        last_backup_dir=last_backup_dir,
+        count=count,
+    )
+
+
+def _get_old_backup_paths(old_backup_dirs: list[str], job: BackupJob) -> list[str]:
+    old_backup_paths: list[str] = []
+    for old_backup_dir in old_backup_dirs:
+        old_backup_path = os.path.normpath(os.path.join(old_backup_dir, job.rsync_target_path))
+        if not job.is_dir:
+            old_backup_path = os.path.dirname(old_backup_path)
+        old_backup_paths.append(old_backup_path)
+    return old_backup_paths
+
+
 def do_backup_job(  # noqa: CFQ002 (max arguments)
     rsync_config: RsyncConfig,
     new_backup_dir: str,
-    old_backup_dir: t.Optional[str],
+    old_backup_dirs: list[str],
     job: BackupJob,
     project_for_filter: str,
     show_progress: bool,
     verbose: bool,
     dry_run: bool,
     cmds: list[PrintCmdData],
+    stats: t.Optional[list[TransferStats]] = None,
+    progress: t.Optional[RsyncProgressDisplay] = None,
 ):
-    if old_backup_dir is not None:
-        old_backup_path = os.path.normpath(os.path.join(old_backup_dir, job.rsync_target_path))
-        if not job.is_dir:
-            old_backup_path = os.path.dirname(old_backup_path)
-    else:
-        old_backup_path = None
+    """
+    :param stats: Collects the transfer statistics of the job
+    :param progress: Shows the progress instead of rsync's progress output (requires `show_progress`)
+    """
     try:
         cmd = run_rsync_backup_with_hardlinks(
             config=rsync_config,
             source=job.rsync_source_path,
             new_backup=os.path.join(new_backup_dir, job.rsync_target_path),
-            old_backup_dirs=[old_backup_path] if old_backup_path is not None else [],
+            old_backup_dirs=_get_old_backup_paths(old_backup_dirs, job),
             project_for_filter=project_for_filter,
+            path_for_filter=job.absolute_source_path,
             show_progress=show_progress,
             verbose=verbose,
             dry_run=dry_run,
             print_cmd_callback=rich_print_cmd,
+            retry_callback=rich_print_retry,
+            stats_callback=functools.partial(add_transfer_stats, stats, [job.rsync_target_path])
+            if stats is not None
+            else None,
+            output_callback=progress.output_callback(job.rsync_target_path)
+            if progress is not None and not dry_run
+            else None,
         )
     except subprocess.CalledProcessError as e:
         raise RichAbortCmd(e) from e
+    if progress is not None and not dry_run:
+        progress.finish(job.rsync_target_path)
     cmds.append(PrintCmdData(cmd=cmd))
 
 
+def get_manifest_entries(
+    rsync_config: RsyncConfig, job: BackupJob, project_for_filter: str
+) -> list[ManifestEntry]:
+    """List the files of the job's source like they are backed up (see `backup_manifest`)."""
+    try:
+        _, listing = run_rsync_list_local(
+            rsync_config,
+            source=job.rsync_source_path,
+            project_for_filter=project_for_filter,
+            path_for_filter=job.absolute_source_path,
+            print_cmd_callback=rich_print_cmd,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RichAbortCmd(e) from e
+    return parse_manifest_entries(listing, job.rsync_target_path, job.is_dir)
+
+
+def rich_print_transfer_stats(stats: list[TransferStats]) -> None:
+    table = rich.table.Table(title="Transfer statistics", title_justify="left", title_style="b")
+    table.add_column("Target", overflow="fold")
+    for column in ("Files", "Literal", "Matched", "Sent", "Received", "Speedup", "Time"):
+        table.add_column(column, justify="right", no_wrap=True)
+    for entry in sorted(stats, key=lambda entry: -entry.stats.elapsed_seconds):
+        transfer_stats = entry.stats
+        table.add_row(
+            str(Formatted(", ".join(entry.target_paths))),
+            f"{transfer_stats.files_transferred}/{transfer_stats.files}",
+            format_bytes(transfer_stats.literal_data),
+            format_bytes(transfer_stats.matched_data),
+            format_bytes(transfer_stats.bytes_sent),
+            format_bytes(transfer_stats.bytes_received),
+            f"{transfer_stats.speedup:.1f}",
+            f"{transfer_stats.elapsed_seconds:.1f}s",
+        )
+    console.print(table)
+
+
+def _strip_progress_updates(output: str) -> str:
+    """Keep only the last of the progress updates rsync overwrites using carriage returns."""
+    return re.sub(r"[^\n]*\r(?!\n)", "", output)
+
+
+def _rich_print_job_output(cmd: list[str], output: str) -> None:
+    rich_print_cmd(cmd, footer=False)
+    output = _strip_progress_updates(output).rstrip()
+    if output != "":
+        console.print(output, markup=False, highlight=False, soft_wrap=True)
+    rich_print_cmd([], header=False, body=False)
+
+
+def do_backup_jobs_concurrently(  # noqa: CFQ002 (max arguments)
+    rsync_config: RsyncConfig,
+    new_backup_dir: str,
+    old_backup_dirs: list[str],
+    jobs: list[BackupJob],
+    project_for_filter: str,
+    show_progress: bool,
+    verbose: bool,
+    dry_run: bool,
+    cmds: list[PrintCmdData],
+    parallel: int,
+    stats: t.Optional[list[TransferStats]] = None,
+    progress: t.Optional[RsyncProgressDisplay] = None,
+):
+    """Run backup jobs like `do_backup_job`, but up to `parallel` jobs at once.
+
+    The output of each job is captured and printed when the job is finished.
+    If a job fails, the remaining jobs are cancelled.
+    """
+    # pylint: disable=too-many-locals
+    job_cmds = [
+        rsync_backup_with_hardlinks_cmd(
+            config=rsync_config,
+            source=job.rsync_source_path,
+            new_backup=os.path.join(new_backup_dir, job.rsync_target_path),
+            old_backup_dirs=_get_old_backup_paths(old_backup_dirs, job),
+            project_for_filter=project_for_filter,
+            path_for_filter=job.absolute_source_path,
+            show_progress=show_progress,
+            verbose=verbose,
+            stats=stats is not None,
+        )
+        for job in jobs
+    ]
+
+    async def run_job(job: BackupJob, cmd: list[str], runner: ProcessRunner) -> tuple[list[str], str]:
+        start = time.monotonic()
+        result = await run_with_retries_async(
+            rsync_config,
+            lambda: runner.run(
+                cmd,
+                capture_output=True,
+                merge_stderr=True,
+                # The output is printed when the job is finished.
+                stdout_callback=progress.output_callback(job.rsync_target_path, print_output=False)
+                if progress is not None
+                else None,
+            ),
+            retry_callback=rich_print_retry,
+        )
+        if progress is not None:
+            progress.finish(job.rsync_target_path)
+        job_stats = parse_rsync_stats(result.stdout, elapsed_seconds=time.monotonic() - start)
+        if stats is not None and job_stats is not None:
+            add_transfer_stats(stats, [job.rsync_target_path], job_stats)
+        return cmd, result.stdout
+
+    async def run_all() -> None:
+        runner = ProcessRunner(max_concurrency=parallel)
+        tasks = [asyncio.ensure_future(run_job(job, cmd, runner)) for job, cmd in zip(jobs, job_cmds)]
+        try:
+            for future in asyncio.as_completed(tasks):
+                _rich_print_job_output(*await future)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    if not dry_run:
+        try:
+            run_coroutine(run_all())
+        except subprocess.CalledProcessError as e:
+            _rich_print_job_output(e.cmd, e.stdout or "")
+            raise RichAbortCmd(e) from e
+    cmds.extend(PrintCmdData(cmd=cmd) for cmd in job_cmds)
+
+
+def _get_scoped_filter_rules(
+    rsync_config: RsyncConfig, job: BackupJob, project_for_filter: str
+) -> t.Optional[list[str]]:
+    scoped_filter_rules: list[str] = []
+    for filter_rule in get_filter_rules(rsync_config, project_for_filter, job.absolute_source_path):
+        scoped = scope_filter_rule(filter_rule, job.rsync_target_path)
+        if scoped is None:
+            return None
+        scoped_filter_rules.extend(scoped)
+    return scoped_filter_rules
+
+
+def _link_combined_sources(
+    tmp_dir: str, jobs: list[BackupJob], structure_config: DocoBackupStructureConfig
+) -> list[str]:
+    """Link the sources of the jobs into `tmp_dir` at their target paths.
+
+    :return: rsync sources of the jobs (relative to `tmp_dir`, see `--relative`)
+    """
+    sources: list[str] = []
+    for job in jobs:
+        target_path = job.rsync_target_path.rstrip("/")
+        link_path = os.path.join(tmp_dir, target_path)
+        os.makedirs(os.path.dirname(link_path), exist_ok=True)
+        os.symlink(job.rsync_source_path, link_path)
+        sources.append(f"{tmp_dir}/./{target_path}/")
+    for root, _, _ in os.walk(tmp_dir):
+        chown_given_strings(root, structure_config.uid, structure_config.gid)
+    return sources
+
+
+def do_backup_jobs_combined(  # noqa: CFQ002 (max arguments)
+    rsync_config: RsyncConfig,
+    structure_config: DocoBackupStructureConfig,
+    new_backup_dir: str,
+    old_backup_dirs: list[str],
+    jobs: list[BackupJob],
+    project_for_filter: str,
+    show_progress: bool,
+    verbose: bool,
+    dry_run: bool,
+    cmds: list[PrintCmdData],
+    stats: t.Optional[list[TransferStats]] = None,
+    progress: t.Optional[RsyncProgressDisplay] = None,
+) -> list[BackupJob]:
+    """Back up the directories of multiple jobs with a single rsync call.
+
+    The sources are linked into a temporary directory at their target paths
+    and transferred with `--relative` (rsync follows the links because of the trailing slash).
+    Jobs for single files and jobs with filter rules that cannot be restricted to the job are skipped.
+
+    :return: Skipped jobs
+    """
+    # pylint: disable=too-many-locals
+    combined_jobs: list[BackupJob] = []
+    skipped_jobs: list[BackupJob] = []
+    filter_rules: list[str] = []
+    for job in jobs:
+        job_filter_rules = (
+            _get_scoped_filter_rules(rsync_config, job, project_for_filter) if job.is_dir else None
+        )
+        if job_filter_rules is None:
+            skipped_jobs.append(job)
+            continue
+        combined_jobs.append(job)
+        filter_rules.extend(job_filter_rules)
+    if len(combined_jobs) == 0:
+        return skipped_jobs
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sources = _link_combined_sources(tmp_dir, combined_jobs, structure_config)
+        cmd = rsync_backup_relative_cmd(
+            config=rsync_config,
+            sources=sources,
+            new_backup=f"{new_backup_dir}/",
+            old_backup_dirs=old_backup_dirs,
+            filter_rules=filter_rules,
+            show_progress=show_progress,
+            verbose=verbose,
+            stats=stats is not None,
+        )
+        if not dry_run:
+            rich_print_cmd(cmd)
+            # The statistics and progress of a single transfer cannot be split up by target path.
+            target_paths = [job.rsync_target_path for job in combined_jobs]
+            progress_key = ", ".join(target_paths)
+            start = time.monotonic()
+            try:
+                output = run_with_retries(
+                    rsync_config,
+                    lambda: run_cmd_tee(
+                        cmd,
+                        output_callback=progress.output_callback(progress_key)
+                        if progress is not None
+                        else None,
+                    ),
+                    retry_callback=rich_print_retry,
+                )
+            except subprocess.CalledProcessError as e:
+                raise RichAbortCmd(e) from e
+            if progress is not None:
+                progress.finish(progress_key)
+            combined_stats = parse_rsync_stats(output, elapsed_seconds=time.monotonic() - start)
+            if stats is not None and combined_stats is not None:
+                add_transfer_stats(stats, target_paths, combined_stats)
+        cmds.append(PrintCmdData(cmd=cmd))
+    return skipped_jobs
+
+
 def do_incremental_backup_job(  # noqa: CFQ002 (max arguments)
     rsync_config: RsyncConfig,
     backup_dir: str,
@@ -152,6 +504,7 @@ def do_incremental_backup_job(  # noqa: CFQ002 (max arguments)
             verbose=verbose,
             dry_run=dry_run,
             print_cmd_callback=rich_print_cmd,
+            retry_callback=rich_print_retry,
         )
     except subprocess.CalledProcessError as e:
         raise RichAbortCmd(e) from e
@@ -198,7 +551,114 @@ def create_target_structure(  # noqa: CFQ002 (max arguments)
                 verbose=verbose,
                 dry_run=dry_run,
                 print_cmd_callback=rich_print_cmd,
+                retry_callback=rich_print_retry,
             )
         except subprocess.CalledProcessError as e:
             raise RichAbortCmd(e) from e
         cmds.append(PrintCmdData(cmd=cmd))
+
+
+def create_snapshots(
+    jobs: list[BackupJob], dry_run: bool, cmds: list[PrintCmdData]
+) -> tuple[list[BackupJob], list[Snapshot]]:
+    """Snapshot the sources of the jobs (see `src.utils.snapshot`).
+
+    If a snapshot fails, the already created snapshots are deleted.
+
+    :return: Jobs reading from the snapshots and the snapshots (to delete them when done)
+    """
+    snapshot_jobs: list[BackupJob] = []
+    snapshots: list[Snapshot] = []
+    try:
+        for job in jobs:
+            snapshot = plan_snapshot(job.rsync_source_path)
+            if not dry_run:
+                create_snapshot(snapshot)
+                rich_print_cmd(snapshot.create_cmd)
+            cmds.append(PrintCmdData(cmd=snapshot.create_cmd))
+            snapshots.append(snapshot)
+
+            snapshot_job = copy.copy(job)
+            snapshot_job.rsync_source_path = snapshot.path + ("/" if job.is_dir else "")
+            snapshot_jobs.append(snapshot_job)
+    except SnapshotError:
+        delete_snapshots(snapshots, dry_run=dry_run, cmds=cmds)
+        raise
+    return snapshot_jobs, snapshots
+
+
+def delete_snapshots(snapshots: list[Snapshot], dry_run: bool, cmds: list[PrintCmdData]):
+    for snapshot in snapshots:
+        if not dry_run:
+            delete_snapshot(snapshot)
+        cmd = snapshot.delete_cmd or ["rm", "-rf", snapshot.path]
+        cmds.append(PrintCmdData(cmd=cmd))
+
+
+@dataclasses.dataclass
+class ProjectBackupResult:
+    project: ComposeProject
+    output: str
+    exit_code: int = 0
+
+
+def _backup_project_capturing_output(
+    project: ComposeProject, backup_task: t.Callable[[ComposeProject], None]
+) -> ProjectBackupResult:
+    with capture_thread_output() as output:
+        try:
+            backup_task(project)
+        except typer.Exit as e:
+            # Errors are already printed (see `DocoError` and `RichAbortCmd`).
+            return ProjectBackupResult(project=project, output=output.getvalue(), exit_code=e.exit_code or 1)
+    return ProjectBackupResult(project=project, output=output.getvalue())
+
+
+def _rich_print_project_backup_result(result: ProjectBackupResult) -> None:
+    project = result.project
+    console.print(
+        rich.rule.Rule(
+            title=rich.text.Text("▾ ").append(
+                rich.text.Text.from_markup(
+                    f"[b]{Formatted(project.config['name'])}[/]"
+                    f" [dim]{Formatted(os.path.join(project.dir, project.file))}[/]"
+                )
+            ),
+            align="left",
+            characters="═",
+            style="default" if result.exit_code == 0 else "red",
+        )
+    )
+    console.print(rich.text.Text.from_ansi(_strip_progress_updates(result.output).rstrip()), soft_wrap=True)
+
+
+def do_backup_projects_concurrently(
+    projects: list[ComposeProject], jobs: int, backup_task: t.Callable[[ComposeProject], None]
+):
+    """Run `backup_task` for up to `jobs` projects at once (in threads).
+
+    The output of each project is captured and printed when the project is finished;
+    failures are summarized at the end instead of aborting.
+    """
+    results: list[ProjectBackupResult] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_backup_project_capturing_output, project, backup_task) for project in projects
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            _rich_print_project_backup_result(result)
+            results.append(result)
+
+    failures = [result for result in results if result.exit_code != 0]
+    if len(failures) > 0:
+        table = rich.table.Table(title="Failed projects", title_justify="left", title_style="b red")
+        table.add_column("Project")
+        table.add_column("Exit code", justify="right")
+        for result in failures:
+            table.add_row(
+                f"[b]{Formatted(result.project.config['name'])}[/] [dim]{Formatted(result.project.dir)}[/]",
+                str(result.exit_code),
+            )
+        console.print(table)
+        raise typer.Exit(1)
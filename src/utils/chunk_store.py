@@ -0,0 +1,371 @@
+"""Content-addressed chunk store (the `chunks` backup backend)
+
+Instead of copying whole files (and hard linking unchanged ones, see `run_rsync_backup_with_hardlinks`),
+the files are split into chunks at content-defined boundaries (see `find_chunk_boundary`),
+so an insertion or a changed page in a large file (e.g. a database) only changes a few chunks.
+Each chunk is identified by the SHA-256 of its content and stored only once per project:
+
+- `<project>/.chunks/packs/<pack-id>.pack`: zlib-compressed chunks, appended to each other
+- `<project>/.chunks/index/<pack-id>.json`: offset and length of each chunk in the pack
+- `<backup-dir>/chunks.jsonl.gz`: the backed up files with the ids of their chunks (see `ChunkTreeEntry`)
+
+The pack indexes are mirrored in doco's cache directory, so chunks already stored are not uploaded again.
+Unchanged files (same size, modification date and inode) are not even read again.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import typing as t
+import zlib
+
+import pydantic
+
+from src.utils.rsync import RsyncConfig
+from src.utils.system import get_cache_dir
+
+CHUNK_STORE_DIR = ".chunks"
+PACKS_DIR = "packs"
+PACK_INDEXES_DIR = "index"
+CACHE_SUBDIR = "chunk-store"
+
+MIN_CHUNK_SIZE = 256 * 1024
+AVG_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+# Packs are uploaded as soon as they reach this size
+PACK_SIZE = 64 * 1024 * 1024
+
+_READ_SIZE = 8 * 1024 * 1024
+# Bytes searched at once for a boundary
+_SCAN_SIZE = 256 * 1024
+# A boundary is found on average every AVG_CHUNK_SIZE bytes (after MIN_CHUNK_SIZE)
+_BOUNDARY_BITS = (AVG_CHUNK_SIZE - MIN_CHUNK_SIZE).bit_length() - 1
+# Fixed random bit per byte value and the bit pattern marking a boundary,
+# they must never change (the chunk boundaries depend on them)
+_BYTE_BITS = bytes(hashlib.sha256(bytes([i])).digest()[0] & 1 for i in range(256))
+_BOUNDARY_PATTERN = bytes(b & 1 for b in hashlib.sha256(b"chunk boundary").digest()[:_BOUNDARY_BITS])
+
+# File caches are updated by concurrent backups of multiple projects
+_lock = threading.Lock()
+
+
+def find_chunk_boundary(data: t.Union[bytes, bytearray], end: int) -> int:
+    """Find the end of the first chunk in `data[:end]`.
+
+    Each byte is mapped to a random bit and a boundary is placed after the first occurrence of
+    `_BOUNDARY_PATTERN` in these bits (after `MIN_CHUNK_SIZE`), so it only depends on the last few bytes.
+    Mapping and searching is done by `bytes.translate` and `bytes.find`, which are implemented in C
+    (a rolling hash computed byte by byte in Python only reaches about 8 MiB/s).
+
+    :return: Position after the content-defined boundary, `end` if there is none within the maximum chunk size
+    """
+    if end <= MIN_CHUNK_SIZE:
+        return end
+    limit = min(end, MAX_CHUNK_SIZE)
+    start = MIN_CHUNK_SIZE
+    while True:
+        stop = min(start + _SCAN_SIZE, limit)
+        pos = data[start:stop].translate(_BYTE_BITS).find(_BOUNDARY_PATTERN)
+        if pos != -1:
+            return start + pos + len(_BOUNDARY_PATTERN)
+        if stop == limit:
+            return limit
+        # The pattern may span the scanned blocks
+        start = stop - len(_BOUNDARY_PATTERN) + 1
+
+
+def iter_chunks(f: t.BinaryIO) -> t.Iterator[bytes]:
+    buffer = bytearray()
+    eof = False
+    while True:
+        while not eof and len(buffer) < MAX_CHUNK_SIZE:
+            data = f.read(_READ_SIZE)
+            if not data:
+                eof = True
+            buffer += data
+        if len(buffer) == 0:
+            return
+        cut = find_chunk_boundary(buffer, len(buffer))
+        yield bytes(buffer[:cut])
+        del buffer[:cut]
+
+
+def get_chunk_id(chunk: bytes) -> str:
+    return hashlib.sha256(chunk).hexdigest()
+
+
+class ChunkTreeEntry(pydantic.BaseModel):
+    # Path relative to the backup directory
+    path: str
+    # st_mode, including the file type
+    mode: int
+    uid: int
+    gid: int
+    mtime_ns: int
+    size: int = 0
+    # Chunk ids of regular files
+    chunks: list[str] = []
+    # Target of symbolic links
+    link: t.Optional[str] = None
+
+    @property
+    def is_file(self) -> bool:
+        return stat.S_ISREG(self.mode)
+
+
+def dump_chunk_tree(entries: t.Iterable[ChunkTreeEntry]) -> bytes:
+    lines = [entry.model_dump_json() + "\n" for entry in sorted(entries, key=lambda entry: entry.path)]
+    return gzip.compress("".join(lines).encode("utf-8"), mtime=0)
+
+
+def load_chunk_tree(path: str) -> list[ChunkTreeEntry]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [ChunkTreeEntry.model_validate_json(line) for line in f if line.strip() != ""]
+
+
+class PackWriter:
+    """Write chunks into packs (and their indexes) in a local staging directory."""
+
+    def __init__(self, staging_dir: str):
+        self.staging_dir = staging_dir
+        self._data = bytearray()
+        self._index: dict[str, tuple[int, int]] = {}
+        os.makedirs(os.path.join(staging_dir, PACKS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(staging_dir, PACK_INDEXES_DIR), exist_ok=True)
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._index
+
+    def add(self, chunk_id: str, chunk: bytes) -> int:
+        """:return: Compressed size of the chunk"""
+        if chunk_id in self._index:
+            return 0
+        compressed = zlib.compress(chunk)
+        self._index[chunk_id] = (len(self._data), len(compressed))
+        self._data += compressed
+        return len(compressed)
+
+    def flush(self) -> t.Optional[str]:
+        """Write the pending chunks to a pack.
+
+        :return: Id of the written pack, None if there were no pending chunks
+        """
+        if len(self._index) == 0:
+            return None
+        pack_id = hashlib.sha256(self._data).hexdigest()
+        with open(os.path.join(self.staging_dir, PACKS_DIR, f"{pack_id}.pack"), "wb") as f:
+            f.write(self._data)
+        with open(
+            os.path.join(self.staging_dir, PACK_INDEXES_DIR, f"{pack_id}.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(self._index, f)
+        self._data = bytearray()
+        self._index = {}
+        return pack_id
+
+
+def load_pack_index(path: str) -> dict[str, tuple[int, int]]:
+    with open(path, encoding="utf-8") as f:
+        return {chunk_id: (offset, length) for chunk_id, (offset, length) in json.load(f).items()}
+
+
+def load_chunk_locations(pack_indexes_dir: str) -> dict[str, tuple[str, int, int]]:
+    """Load the pack indexes of a chunk store.
+
+    :return: Pack id, offset and length per chunk id
+    """
+    locations: dict[str, tuple[str, int, int]] = {}
+    if not os.path.isdir(pack_indexes_dir):
+        return locations
+    for file in sorted(os.listdir(pack_indexes_dir)):
+        if not file.endswith(".json"):
+            continue
+        pack_id = file[: -len(".json")]
+        for chunk_id, (offset, length) in load_pack_index(os.path.join(pack_indexes_dir, file)).items():
+            locations.setdefault(chunk_id, (pack_id, offset, length))
+    return locations
+
+
+def select_unused_packs(pack_indexes_dir: str, used_chunk_ids: t.Set[str]) -> list[str]:
+    """Select the packs none of whose chunks is used anymore.
+
+    Packs with some used chunks are kept as they are (they are not repacked).
+
+    :return: Ids of the unused packs
+    """
+    if not os.path.isdir(pack_indexes_dir):
+        return []
+    return [
+        file[: -len(".json")]
+        for file in sorted(os.listdir(pack_indexes_dir))
+        if file.endswith(".json")
+        and not any(
+            chunk_id in used_chunk_ids for chunk_id in load_pack_index(os.path.join(pack_indexes_dir, file))
+        )
+    ]
+
+
+class PackReader:
+    """Read chunks from the packs in a directory, keeping the recently used packs open."""
+
+    # Chunks of a file are usually in the same few packs
+    MAX_OPEN_PACKS = 16
+
+    def __init__(self, packs_dir: str):
+        self.packs_dir = packs_dir
+        self._files: dict[str, t.BinaryIO] = {}
+
+    def __enter__(self) -> "PackReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def read_chunk(self, pack_id: str, offset: int, length: int) -> bytes:
+        f = self._files.pop(pack_id, None)
+        if f is None:
+            if len(self._files) >= self.MAX_OPEN_PACKS:
+                self._files.pop(next(iter(self._files))).close()
+            # Closed when evicted or by `close`
+            f = open(  # pylint: disable=consider-using-with
+                os.path.join(self.packs_dir, f"{pack_id}.pack"), "rb"
+            )
+        # Most recently used last
+        self._files[pack_id] = f
+        f.seek(offset)
+        return zlib.decompress(f.read(length))
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+def store_file(
+    path: str,
+    writer: PackWriter,
+    is_stored: t.Callable[[str], bool],
+    pack_full_callback: t.Callable[[], None],
+) -> tuple[list[str], int]:
+    """Split a file into chunks and add the chunks which are not stored yet to the pack writer.
+
+    :param pack_full_callback: Called when the pending pack reached `PACK_SIZE`
+    :return: Tuple of chunk ids and size of the added (uncompressed) chunks
+    """
+    chunk_ids: list[str] = []
+    added = 0
+    with open(path, "rb") as f:
+        for chunk in iter_chunks(f):
+            chunk_id = get_chunk_id(chunk)
+            chunk_ids.append(chunk_id)
+            if chunk_id in writer or is_stored(chunk_id):
+                continue
+            writer.add(chunk_id, chunk)
+            added += len(chunk)
+            if writer.size >= PACK_SIZE:
+                pack_full_callback()
+    return chunk_ids, added
+
+
+def restore_file(
+    entry: ChunkTreeEntry, target_path: str, locations: dict[str, tuple[str, int, int]], packs: PackReader
+) -> None:
+    """Write a file, directory or symbolic link from the chunk store (see `restore_metadata` for the rest).
+
+    :raises KeyError: If a chunk is missing in the pack indexes
+    """
+    if os.path.islink(target_path) or (
+        os.path.lexists(target_path) and os.path.isdir(target_path) != stat.S_ISDIR(entry.mode)
+    ):
+        if os.path.isdir(target_path) and not os.path.islink(target_path):
+            shutil.rmtree(target_path)
+        else:
+            os.remove(target_path)
+    if stat.S_ISDIR(entry.mode):
+        os.makedirs(target_path, exist_ok=True)
+        return
+    if stat.S_ISLNK(entry.mode):
+        os.symlink(entry.link or "", target_path)
+        return
+    with open(target_path, "wb") as f:
+        for chunk_id in entry.chunks:
+            pack_id, offset, length = locations[chunk_id]
+            f.write(packs.read_chunk(pack_id, offset, length))
+
+
+def restore_metadata(entry: ChunkTreeEntry, target_path: str, restore_owner: bool) -> None:
+    if restore_owner:
+        os.lchown(target_path, entry.uid, entry.gid)
+    if not stat.S_ISLNK(entry.mode):
+        os.chmod(target_path, stat.S_IMODE(entry.mode))
+        os.utime(target_path, ns=(entry.mtime_ns, entry.mtime_ns))
+
+
+class CachedFile(pydantic.BaseModel):
+    size: int
+    mtime_ns: int
+    inode: int
+    chunks: list[str]
+
+
+class FileCache(pydantic.BaseModel):
+    destination: str
+    # Keyed by the path relative to the backup directory
+    files: dict[str, CachedFile] = {}
+
+    def get_chunks(self, path: str, st: os.stat_result) -> t.Optional[list[str]]:
+        """Get the chunk ids of a file if it is unchanged since it was backed up."""
+        cached = self.files.get(path)
+        if cached is None or (cached.size, cached.mtime_ns, cached.inode) != (
+            st.st_size,
+            st.st_mtime_ns,
+            st.st_ino,
+        ):
+            return None
+        return cached.chunks
+
+    def set_chunks(self, path: str, st: os.stat_result, chunks: list[str]) -> None:
+        self.files[path] = CachedFile(size=st.st_size, mtime_ns=st.st_mtime_ns, inode=st.st_ino, chunks=chunks)
+
+
+def _get_destination(config: RsyncConfig, project_name: str) -> str:
+    return json.dumps([config.user, config.host, config.module, config.root, project_name])
+
+
+def get_local_store_dir(config: RsyncConfig, project_name: str) -> str:
+    """Local directory for the mirrored pack indexes and the file cache of a project's chunk store."""
+    key = hashlib.sha256(_get_destination(config, project_name).encode()).hexdigest()
+    return os.path.join(get_cache_dir(), CACHE_SUBDIR, key)
+
+
+def load_file_cache(config: RsyncConfig, project_name: str) -> FileCache:
+    try:
+        with open(
+            os.path.join(get_local_store_dir(config, project_name), "files.json"), encoding="utf-8"
+        ) as f:
+            cache = FileCache.model_validate_json(f.read())
+        if cache.destination == _get_destination(config, project_name):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return FileCache(destination=_get_destination(config, project_name))
+
+
+def save_file_cache(config: RsyncConfig, project_name: str, cache: FileCache) -> None:
+    path = os.path.join(get_local_store_dir(config, project_name), "files.json")
+    with _lock:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(cache.model_dump_json())
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
@@ -0,0 +1,476 @@
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import time
+import typing as t
+
+from src.utils.backup import BACKUP_CHUNK_TREE
+from src.utils.backup import BackupJob
+from src.utils.backup_manifest import ManifestEntry
+from src.utils.backup_manifest import parse_manifest_entries
+from src.utils.backup_rich import add_transfer_stats
+from src.utils.backup_rich import TransferStats
+from src.utils.chunk_store import CHUNK_STORE_DIR
+from src.utils.chunk_store import ChunkTreeEntry
+from src.utils.chunk_store import get_local_store_dir
+from src.utils.chunk_store import load_chunk_locations
+from src.utils.chunk_store import load_chunk_tree
+from src.utils.chunk_store import load_file_cache
+from src.utils.chunk_store import load_pack_index
+from src.utils.chunk_store import PACK_INDEXES_DIR
+from src.utils.chunk_store import PackReader
+from src.utils.chunk_store import PACKS_DIR
+from src.utils.chunk_store import PackWriter
+from src.utils.chunk_store import restore_file
+from src.utils.chunk_store import restore_metadata
+from src.utils.chunk_store import save_file_cache
+from src.utils.chunk_store import select_unused_packs
+from src.utils.chunk_store import store_file
+from src.utils.common import PrintCmdData
+from src.utils.exceptions_rich import DocoError
+from src.utils.restore import RestoreJob
+from src.utils.rich import rich_print_cmd
+from src.utils.rich import rich_print_retry
+from src.utils.rich import RichAbortCmd
+from src.utils.rsync import RsyncConfig
+from src.utils.rsync import RsyncStats
+from src.utils.rsync import run_rsync_delete
+from src.utils.rsync import run_rsync_download_incremental
+from src.utils.rsync import run_rsync_list_local
+from src.utils.rsync import run_rsync_without_delete
+
+# Packs are downloaded to a directory with this prefix when restoring (see `do_restore_jobs_chunked`)
+STAGING_DIR_PREFIX = ".doco-restore-"
+
+
+def _upload(
+    rsync_config: RsyncConfig, source: str, destination: str, *, verbose: bool, dry_run: bool
+) -> list[str]:
+    try:
+        return run_rsync_without_delete(
+            rsync_config,
+            source=source,
+            destination=destination,
+            project_for_filter="",
+            show_progress=False,
+            verbose=verbose,
+            dry_run=dry_run,
+            print_cmd_callback=rich_print_cmd,
+            retry_callback=rich_print_retry,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RichAbortCmd(e) from e
+
+
+def _download(  # noqa: CFQ002 (max arguments)
+    rsync_config: RsyncConfig,
+    source: str,
+    destination: str,
+    *,
+    show_progress: bool,
+    verbose: bool,
+    dry_run: bool,
+    delete_from_destination: bool = True,
+    extra_args: t.Optional[list[str]] = None,
+) -> list[str]:
+    try:
+        return run_rsync_download_incremental(
+            rsync_config,
+            source=source,
+            destination=destination,
+            project_for_filter="",
+            show_progress=show_progress,
+            verbose=verbose,
+            delete_from_destination=delete_from_destination,
+            dry_run=dry_run,
+            print_cmd_callback=rich_print_cmd,
+            retry_callback=rich_print_retry,
+            extra_args=extra_args,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RichAbortCmd(e) from e
+
+
+def _get_source_path(job: BackupJob, manifest_entry: ManifestEntry) -> str:
+    if not job.is_dir:
+        return job.rsync_source_path
+    return os.path.join(
+        job.rsync_source_path, os.path.relpath(manifest_entry.path, os.path.normpath(job.rsync_target_path))
+    )
+
+
+def do_backup_jobs_chunked(  # noqa: C901 CFQ002 (too complex, max arguments)
+    rsync_config: RsyncConfig,
+    project_name: str,
+    jobs: list[BackupJob],
+    manifest: dict[str, list[ManifestEntry]],
+    *,
+    verbose: bool,
+    dry_run: bool,
+    cmds: list[PrintCmdData],
+    stats: list[TransferStats],
+) -> dict[str, list[ChunkTreeEntry]]:
+    """Back up the jobs to the project's chunk store (see `chunk_store`).
+
+    :param manifest: The files to back up per target path (see `get_manifest_entries`)
+    :return: Chunk tree entries per target path
+    """
+    # pylint: disable=too-many-locals
+    # pylint: disable=too-many-statements
+    store_path = f"{project_name}/{CHUNK_STORE_DIR}/"
+    indexes_dir = os.path.join(get_local_store_dir(rsync_config, project_name), PACK_INDEXES_DIR)
+    trees: dict[str, list[ChunkTreeEntry]] = {}
+
+    with tempfile.TemporaryDirectory() as staging_dir:
+        writer = PackWriter(staging_dir)
+
+        # Creates the chunk store at the first backup
+        cmds.append(
+            PrintCmdData(
+                cmd=_upload(rsync_config, f"{staging_dir}/", store_path, verbose=verbose, dry_run=dry_run)
+            )
+        )
+        os.makedirs(indexes_dir, exist_ok=True)
+        cmds.append(
+            PrintCmdData(
+                cmd=_download(
+                    rsync_config,
+                    f"{store_path}{PACK_INDEXES_DIR}/",
+                    f"{indexes_dir}/",
+                    show_progress=False,
+                    verbose=verbose,
+                    dry_run=dry_run,
+                )
+            )
+        )
+        if dry_run:
+            return trees
+
+        locations = load_chunk_locations(indexes_dir)
+        file_cache = load_file_cache(rsync_config, project_name)
+        sent = 0
+
+        def upload_pack():
+            nonlocal sent
+            pack_id = writer.flush()
+            if pack_id is None:
+                return
+            pack_path = os.path.join(staging_dir, PACKS_DIR, f"{pack_id}.pack")
+            index_path = os.path.join(staging_dir, PACK_INDEXES_DIR, f"{pack_id}.json")
+            # The pack first, so a pack index never refers to a missing pack
+            _upload(rsync_config, pack_path, f"{store_path}{PACKS_DIR}/", verbose=verbose, dry_run=False)
+            _upload(
+                rsync_config, index_path, f"{store_path}{PACK_INDEXES_DIR}/", verbose=verbose, dry_run=False
+            )
+            sent += os.path.getsize(pack_path) + os.path.getsize(index_path)
+            os.remove(pack_path)
+            mirrored_index_path = shutil.move(index_path, os.path.join(indexes_dir, f"{pack_id}.json"))
+            for chunk_id, (offset, length) in load_pack_index(mirrored_index_path).items():
+                locations.setdefault(chunk_id, (pack_id, offset, length))
+
+        for job in jobs:
+            start = time.monotonic()
+            sent = 0
+            job_stats = RsyncStats()
+            tree = trees.setdefault(job.rsync_target_path, [])
+            for manifest_entry in manifest.get(job.rsync_target_path, []):
+                source_path = _get_source_path(job, manifest_entry)
+                try:
+                    st = os.lstat(source_path)
+                    entry = ChunkTreeEntry(
+                        path=manifest_entry.path,
+                        mode=st.st_mode,
+                        uid=st.st_uid,
+                        gid=st.st_gid,
+                        mtime_ns=st.st_mtime_ns,
+                    )
+                    if stat.S_ISLNK(st.st_mode):
+                        entry.link = os.readlink(source_path)
+                    elif stat.S_ISREG(st.st_mode):
+                        entry.size = st.st_size
+                        chunks = file_cache.get_chunks(entry.path, st)
+                        if chunks is None or not all(chunk_id in locations for chunk_id in chunks):
+                            chunks, added = store_file(
+                                source_path, writer, lambda chunk_id: chunk_id in locations, upload_pack
+                            )
+                            file_cache.set_chunks(entry.path, st, chunks)
+                            job_stats.files_transferred += 1
+                            job_stats.total_transferred_file_size += st.st_size
+                            job_stats.literal_data += added
+                        entry.chunks = chunks
+                        job_stats.total_file_size += st.st_size
+                    elif not stat.S_ISDIR(st.st_mode):
+                        # Devices, sockets and named pipes are not supported by the chunk store
+                        continue
+                except FileNotFoundError:
+                    # Vanished since the source was listed (like rsync, ignore it)
+                    continue
+                tree.append(entry)
+                job_stats.files += 1
+            upload_pack()
+
+            job_stats.matched_data = job_stats.total_file_size - job_stats.literal_data
+            job_stats.bytes_sent = sent
+            job_stats.speedup = round(job_stats.total_file_size / sent, 2) if sent > 0 else 0.0
+            job_stats.elapsed_seconds = time.monotonic() - start
+            add_transfer_stats(stats, [job.rsync_target_path], job_stats)
+
+        save_file_cache(rsync_config, project_name, file_cache)
+    return trees
+
+
+def _get_restore_items(
+    tree: list[ChunkTreeEntry], backup_dir: str, jobs: list[RestoreJob]
+) -> list[tuple[ChunkTreeEntry, str]]:
+    """:return: Tuples of chunk tree entry and the local path to restore it to"""
+    items: list[tuple[ChunkTreeEntry, str]] = []
+    for job in jobs:
+        source_path = os.path.relpath(os.path.normpath(job.rsync_source_path), backup_dir)
+        target_path = os.path.normpath(job.rsync_target_path)
+        for entry in tree:
+            if entry.path == source_path:
+                items.append((entry, target_path))
+            elif entry.path.startswith(source_path + "/"):
+                items.append((entry, os.path.join(target_path, os.path.relpath(entry.path, source_path))))
+    return items
+
+
+def _list_restored_dir(
+    rsync_config: RsyncConfig, project_for_filter: str, job: RestoreJob
+) -> list[ManifestEntry]:
+    """List a restored directory with the project's filter rules (like a restore with rsync)."""
+    try:
+        _, listing = run_rsync_list_local(
+            rsync_config,
+            source=f"{job.rsync_target_path.rstrip('/')}/",
+            project_for_filter=project_for_filter,
+            path_for_filter=job.rsync_target_path,
+            print_cmd_callback=rich_print_cmd,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RichAbortCmd(e) from e
+    return parse_manifest_entries(listing, job.rsync_target_path, is_dir=True)
+
+
+def _delete_extraneous_files(
+    rsync_config: RsyncConfig, project_for_filter: str, jobs: list[RestoreJob], restored_paths: t.Set[str]
+) -> None:
+    """Delete files not in the backup from restored directories (like rsync's `--delete`).
+
+    Files excluded by the filter rules are kept (see `_list_restored_dir`),
+    directories are only removed if they are empty afterwards (they may contain excluded files).
+    """
+    for job in jobs:
+        if not job.is_dir or not os.path.isdir(job.rsync_target_path):
+            continue
+        entries = _list_restored_dir(rsync_config, project_for_filter, job)
+        # Deepest paths first, so directories are emptied before they are removed
+        for entry in sorted(entries, key=lambda entry: entry.path, reverse=True):
+            if entry.path in restored_paths or entry.path == os.path.normpath(job.rsync_target_path):
+                continue
+            if entry.mode.startswith("d"):
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    pass
+            elif os.path.lexists(entry.path):
+                os.remove(entry.path)
+
+
+def do_restore_jobs_chunked(  # noqa: CFQ002 (max arguments)
+    rsync_config: RsyncConfig,
+    backup_dir: str,
+    chunk_tree_file_name: str,
+    jobs: list[RestoreJob],
+    *,
+    project_for_filter: str,
+    staging_dir_parent: str,
+    show_progress: bool,
+    verbose: bool,
+    dry_run: bool,
+    cmds: list[PrintCmdData],
+):
+    """Restore the jobs of a backup created with the chunk store backend (see `chunk_store`).
+
+    :param backup_dir: Backup directory relative to the rsync root (including the project)
+    :param project_for_filter: Project name for selecting the filter rules protecting files from deletion
+    :param staging_dir_parent: Directory to download the needed packs to (they can be large,
+                               so rather next to the restored files than in the temporary directory)
+    """
+    # pylint: disable=too-many-locals
+    store_path = f"{os.path.dirname(backup_dir)}/{CHUNK_STORE_DIR}/"
+    with tempfile.TemporaryDirectory(
+        prefix=STAGING_DIR_PREFIX, dir=staging_dir_parent if not dry_run else None
+    ) as tmp_dir:
+        tree_path = os.path.join(tmp_dir, chunk_tree_file_name)
+        indexes_dir = os.path.join(tmp_dir, PACK_INDEXES_DIR)
+        packs_dir = os.path.join(tmp_dir, PACKS_DIR)
+        cmds.append(
+            PrintCmdData(
+                cmd=_download(
+                    rsync_config,
+                    f"{backup_dir}/{chunk_tree_file_name}",
+                    tree_path,
+                    show_progress=show_progress,
+                    verbose=verbose,
+                    dry_run=dry_run,
+                )
+            )
+        )
+        cmds.append(
+            PrintCmdData(
+                cmd=_download(
+                    rsync_config,
+                    f"{store_path}{PACK_INDEXES_DIR}/",
+                    f"{indexes_dir}/",
+                    show_progress=show_progress,
+                    verbose=verbose,
+                    dry_run=dry_run,
+                )
+            )
+        )
+
+        items: list[tuple[ChunkTreeEntry, str]] = []
+        locations: dict[str, tuple[str, int, int]] = {}
+        pack_ids: t.Set[str] = set()
+        if not dry_run:
+            items = _get_restore_items(load_chunk_tree(tree_path), backup_dir, jobs)
+            locations = load_chunk_locations(indexes_dir)
+            for entry, _ in items:
+                for chunk_id in entry.chunks:
+                    if chunk_id not in locations:
+                        raise DocoError(f"The chunk store misses chunk {chunk_id} of '{entry.path}'.")
+                    pack_ids.add(locations[chunk_id][0])
+
+        files_from_path = os.path.join(tmp_dir, "packs.txt")
+        with open(files_from_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{pack_id}.pack\n" for pack_id in sorted(pack_ids))
+        cmds.append(
+            PrintCmdData(
+                cmd=_download(
+                    rsync_config,
+                    f"{store_path}{PACKS_DIR}/",
+                    f"{packs_dir}/",
+                    show_progress=show_progress,
+                    verbose=verbose,
+                    dry_run=dry_run or len(pack_ids) == 0,
+                    delete_from_destination=False,
+                    extra_args=[f"--files-from={files_from_path}"],
+                )
+            )
+        )
+        if dry_run:
+            return
+
+        with PackReader(packs_dir) as packs:
+            for entry, target_path in items:
+                restore_file(entry, target_path, locations, packs)
+
+    # After the staging directory is removed, as it may be inside of a restored directory
+    restore_owner = os.geteuid() == 0
+    _delete_extraneous_files(rsync_config, project_for_filter, jobs, {target_path for _, target_path in items})
+    # Deepest paths first, so the dates of the directories are not changed afterwards
+    for entry, target_path in sorted(items, key=lambda item: item[1], reverse=True):
+        restore_metadata(entry, target_path, restore_owner)
+
+
+def _delete(
+    rsync_config: RsyncConfig, target: str, names: list[str], *, verbose: bool, dry_run: bool
+) -> list[str]:
+    with tempfile.TemporaryDirectory() as empty_dir:
+        try:
+            return run_rsync_delete(
+                rsync_config,
+                empty_dir=empty_dir,
+                target=target,
+                names=names,
+                verbose=verbose,
+                dry_run=dry_run,
+                print_cmd_callback=rich_print_cmd,
+                retry_callback=rich_print_retry,
+            )
+        except subprocess.CalledProcessError as e:
+            raise RichAbortCmd(e) from e
+
+
+def prune_chunk_store(
+    rsync_config: RsyncConfig,
+    project_name: str,
+    *,
+    verbose: bool,
+    dry_run: bool,
+    cmds: list[PrintCmdData],
+) -> list[str]:
+    """Delete the packs of the project's chunk store which are not used by any backup (mark and sweep).
+
+    The chunk trees of all backups at the destination are downloaded together with the pack indexes,
+    packs still containing a used chunk are kept (see `select_unused_packs`).
+    Backups being created at the same time may use chunks which are not in any chunk tree yet,
+    so this must not run concurrently with backups of the project.
+
+    :return: Ids of the deleted packs
+    """
+    store_path = f"{project_name}/{CHUNK_STORE_DIR}/"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cmds.append(
+            PrintCmdData(
+                cmd=_download(
+                    rsync_config,
+                    f"{project_name}/",
+                    f"{tmp_dir}/",
+                    show_progress=False,
+                    verbose=verbose,
+                    dry_run=dry_run,
+                    extra_args=[
+                        *[
+                            "-f",
+                            f"+ /{CHUNK_STORE_DIR}/",
+                            "-f",
+                            f"+ /{CHUNK_STORE_DIR}/{PACK_INDEXES_DIR}/***",
+                        ],
+                        *["-f", "- /.*/", "-f", "+ /*/", "-f", f"+ /*/{BACKUP_CHUNK_TREE}", "-f", "- *"],
+                    ],
+                )
+            )
+        )
+        used_chunk_ids: t.Set[str] = set()
+        unused_pack_ids: list[str] = []
+        if not dry_run:
+            for name in os.listdir(tmp_dir):
+                tree_path = os.path.join(tmp_dir, name, BACKUP_CHUNK_TREE)
+                if name != CHUNK_STORE_DIR and os.path.isfile(tree_path):
+                    used_chunk_ids.update(
+                        chunk_id for entry in load_chunk_tree(tree_path) for chunk_id in entry.chunks
+                    )
+            unused_pack_ids = select_unused_packs(
+                os.path.join(tmp_dir, CHUNK_STORE_DIR, PACK_INDEXES_DIR), used_chunk_ids
+            )
+    if len(unused_pack_ids) == 0:
+        return unused_pack_ids
+
+    # The pack indexes first, so a pack index never refers to a missing pack
+    cmds.append(
+        PrintCmdData(
+            cmd=_delete(
+                rsync_config,
+                f"{store_path}{PACK_INDEXES_DIR}/",
+                [f"{pack_id}.json" for pack_id in unused_pack_ids],
+                verbose=verbose,
+                dry_run=dry_run,
+            )
+        )
+    )
+    cmds.append(
+        PrintCmdData(
+            cmd=_delete(
+                rsync_config,
+                f"{store_path}{PACKS_DIR}/",
+                [f"{pack_id}.pack" for pack_id in unused_pack_ids],
+                verbose=verbose,
+                dry_run=dry_run,
+            )
+        )
+    )
+    return unused_pack_ids
@@ -53,3 +53,30 @@ ALL_PROFILES_OPTION = typer.Option(
 RUNNING_OPTION = typer.Option(
     False, "--running", help="Consider only projects with at least one running or restarting service."
 )
+JOBS_OPTION = typer.Option(
+    1, "--jobs", "-j", min=1, help="Number of projects to load in parallel (using docker compose)."
+)
+CHANGED_OPTION = typer.Option(
+    False,
+    "--changed",
+    help="Only update services whose resolved config or image changed since doco last brought them up.",
+)
+RUN_JOBS_OPTION = typer.Option(
+    1,
+    "--jobs",
+    "-j",
+    min=1,
+    help="Number of projects to load and run in parallel"
+    " (output is shown per project when finished, failures are summarized at the end).",
+)
+NO_CACHE_OPTION = typer.Option(
+    False, "--no-cache", help="Do not use cached compose configurations, always ask docker compose."
+)
+REFRESH_OPTION = typer.Option(
+    False,
+    "--refresh",
+    help="Do not use the cached listing of backups, always list them at the rsync destination.",
+)
+RECURSIVE_OPTION = typer.Option(
+    False, "--recursive", help="Search the given directories recursively for compose projects."
+)
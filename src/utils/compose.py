@@ -9,76 +9,197 @@ import yaml
 from src.utils.common import print_cmd
 from src.utils.common import PrintCmdCallable
 from src.utils.common import relative_path_if_below
+from src.utils.compose_discovery import COMPOSE_FILE_NAMES
+from src.utils.compose_discovery import discover_compose_dirs
+from src.utils.output import run_cmd
+from src.utils.runner import ProcessRunner
 
 
-def load_compose_config(
-    *, cwd: str, file: str, services: list[str], profiles: list[str]
-) -> tuple[t.Mapping[str, t.Any], str]:
+def compose_cmd(file: str, profiles: list[str], command: list[str]) -> list[str]:
     cmd = ["docker", "compose", "-f", file]
     for profile in profiles:
         cmd.extend(["--profile", profile])
-    cmd.append("config")
-    cmd.extend(services)
+    cmd.extend(command)
+    return cmd
+
 
+def load_compose_model(cwd: str, file: str) -> t.Mapping[str, t.Any]:
+    """Load the resolved compose model with all profiles enabled.
+
+    Profiles and services are selected afterwards (see `select_compose_config`),
+    so a single `docker compose config` call is enough per project.
+    """
     result = subprocess.run(
-        cmd,
+        compose_cmd(file, ["*"], ["config", "--format", "json"]),
         cwd=cwd,
         capture_output=True,
         encoding="utf-8",
         universal_newlines=True,
         check=True,
     )
-    return yaml.safe_load(result.stdout), result.stdout
+    return json.loads(result.stdout)
 
 
-def load_compose_profiles(cwd: str, file: str) -> list[str]:
-    result = subprocess.run(
-        ["docker", "compose", "-f", file, "config", "--profiles"],
-        cwd=cwd,
-        capture_output=True,
-        encoding="utf-8",
-        universal_newlines=True,
-        check=True,
+async def load_compose_model_async(cwd: str, file: str, *, runner: ProcessRunner) -> t.Mapping[str, t.Any]:
+    """Coroutine version of `load_compose_model`."""
+    result = await runner.run(
+        compose_cmd(file, ["*"], ["config", "--format", "json"]), cwd=cwd, capture_output=True
     )
-    return result.stdout.splitlines()
+    return json.loads(result.stdout)
 
 
-def load_compose_services(cwd: str, file: str, *, profiles: list[str]) -> list[str]:
-    cmd = ["docker", "compose", "-f", file]
-    for profile in profiles:
-        cmd.extend(["--profile", profile])
-    cmd.extend(["config", "--services"])
+def get_compose_profiles(model: t.Mapping[str, t.Any]) -> list[str]:
+    return sorted(
+        set(
+            profile
+            for service in model.get("services", {}).values()
+            for profile in service.get("profiles", [])
+        )
+    )
+
+
+def get_compose_services(model: t.Mapping[str, t.Any], *, profiles: list[str]) -> list[str]:
+    return [
+        name
+        for name, service in model.get("services", {}).items()
+        if not service.get("profiles") or any(profile in profiles for profile in service["profiles"])
+    ]
+
+
+class ComposeConfigError(Exception):
+    pass
+
+
+def select_compose_config(
+    model: t.Mapping[str, t.Any], *, services: list[str], profiles: list[str]
+) -> t.Mapping[str, t.Any]:
+    """Reduce the model to what `docker compose --profile ... config SERVICE...` would output.
+
+    Selected services are enabled regardless of their profiles and pull in the services they depend on.
+    Like with docker compose, the profiles of the selected services are enabled for their dependencies.
+
+    :raises ComposeConfigError: If a required dependency is not enabled by the profiles
+    """
+    model_services = model.get("services", {})
+    enabled_services = (
+        _select_services(model, services=services, profiles=profiles)
+        if services
+        else get_compose_services(model, profiles=profiles)
+    )
+    config = {
+        **model,
+        "services": {name: model_services[name] for name in enabled_services},
+    }
+    used_networks = set(network for name in enabled_services for network in get_service_networks(config, name))
+    used_volumes = set(volume for name in enabled_services for volume in get_service_volumes(config, name))
+    for key, used in (("networks", used_networks), ("volumes", used_volumes)):
+        if key in config:
+            config[key] = {name: value for name, value in config[key].items() if name in used}
+    return config
+
+
+def _select_services(model: t.Mapping[str, t.Any], *, services: list[str], profiles: list[str]) -> list[str]:
+    model_services = model.get("services", {})
+    selected_profiles = profiles + [
+        profile for service in services for profile in model_services.get(service, {}).get("profiles", [])
+    ]
+    enabled_dependencies = get_compose_services(model, profiles=selected_profiles)
+    selected_services: t.Set[str] = set()
+    pending = [service for service in services if service in model_services]
+    while pending:
+        service = pending.pop()
+        if service in selected_services:
+            continue
+        selected_services.add(service)
+        for dependency, condition in model_services[service].get("depends_on", {}).items():
+            if dependency in services or dependency in enabled_dependencies:
+                pending.append(dependency)
+            elif (condition or {}).get("required", True):
+                raise ComposeConfigError(
+                    f'Service "{dependency}" was pulled in as a dependency of service "{service}"'
+                    " but is not enabled by the active profiles."
+                )
+    return [service for service in model_services if service in selected_services]
+
+
+def get_service_networks(config: t.Mapping[str, t.Any], service: str) -> list[str]:
+    service_config = config["services"][service]
+    if "network_mode" in service_config:
+        return []
+    # Services without networks are connected to the default network (`networks` is a list or a mapping)
+    return list(service_config.get("networks") or ["default"])
+
+
+def get_service_volumes(config: t.Mapping[str, t.Any], service: str) -> list[str]:
+    volumes = []
+    for volume in config["services"][service].get("volumes", []):
+        if isinstance(volume, str):
+            # Short syntax (not normalized): "SOURCE:TARGET[:MODE]", the source is a path for bind mounts
+            source = volume.split(":")[0] if ":" in volume else ""
+            if source and not source.startswith((".", "/", "~")):
+                volumes.append(source)
+        elif volume.get("type", "volume") == "volume" and volume.get("source"):
+            volumes.append(volume["source"])
+    return volumes
+
+
+def dump_compose_config(config: t.Mapping[str, t.Any]) -> str:
+    return yaml.safe_dump(dict(config), sort_keys=False, allow_unicode=True)
+
+
+def load_compose_ps(
+    cwd: str, file: str, *, services: list[str], profiles: list[str]
+) -> list[t.Mapping[str, t.Any]]:
     result = subprocess.run(
-        cmd,
+        _compose_ps_cmd(file, services=services, profiles=profiles),
         cwd=cwd,
         capture_output=True,
         encoding="utf-8",
         universal_newlines=True,
         check=True,
     )
-    return result.stdout.splitlines()
+    return _parse_compose_ps(result.stdout)
 
 
-def load_compose_ps(
-    cwd: str, file: str, *, services: list[str], profiles: list[str]
+async def load_compose_ps_async(
+    cwd: str, file: str, *, services: list[str], profiles: list[str], runner: ProcessRunner
 ) -> list[t.Mapping[str, t.Any]]:
-    cmd = ["docker", "compose", "-f", file]
-    for profile in profiles:
-        cmd.extend(["--profile", profile])
-    cmd.extend(["ps", "--format", "json", "--orphans=false"])
-    cmd.extend(services)
+    """Coroutine version of `load_compose_ps`."""
+    result = await runner.run(
+        _compose_ps_cmd(file, services=services, profiles=profiles), cwd=cwd, capture_output=True
+    )
+    return _parse_compose_ps(result.stdout)
+
+
+def _compose_ps_cmd(file: str, *, services: list[str], profiles: list[str]) -> list[str]:
+    return compose_cmd(file, profiles, ["ps", "--format", "json", "--orphans=false", *services])
+
+
+def _parse_compose_ps(stdout: str) -> list[t.Mapping[str, t.Any]]:
+    if len(stdout) > 0 and stdout[0] == "[":
+        # before docker compose v2.21.0
+        return json.loads(stdout)
+    return [json.loads(line) for line in stdout.split("\n") if line]
+
+
+def load_image_ids(images: list[str]) -> dict[str, str]:
+    """Get the IDs of the locally available images (missing images are omitted)."""
+    if len(images) == 0:
+        return {}
     result = subprocess.run(
-        cmd,
-        cwd=cwd,
+        ["docker", "image", "inspect", "--format", "{{.Id}}", *images],
         capture_output=True,
         encoding="utf-8",
         universal_newlines=True,
-        check=True,
+        check=False,
     )
-    if len(result.stdout) > 0 and result.stdout[0] == "[":
-        # before docker compose v2.21.0
-        return json.loads(result.stdout)
-    return [json.loads(line) for line in result.stdout.split("\n") if line]
+    image_ids = result.stdout.split()
+    if result.returncode == 0 and len(image_ids) == len(images):
+        return dict(zip(images, image_ids))
+    if len(images) == 1:
+        return {}
+    # Some images are missing, so we cannot tell which ID belongs to which image.
+    return {image: image_id for image in images for image_id in load_image_ids([image]).values()}
 
 
 def run_compose(  # noqa: CFQ002 (max arguments)
@@ -90,20 +211,12 @@ def run_compose(  # noqa: CFQ002 (max arguments)
     cancelable: bool = False,
     print_cmd_callback: PrintCmdCallable = print_cmd,
 ):
-    cmd = [
-        "docker",
-        "compose",
-        "-f",
-        project_file,
-    ]
-    for profile in profiles:
-        cmd.extend(["--profile", profile])
-    cmd.extend(command)
+    cmd = compose_cmd(project_file, profiles, command)
 
     if not dry_run:
         print_cmd_callback(cmd, project_dir)
         try:
-            subprocess.run(cmd, cwd=project_dir, check=True)
+            run_cmd(cmd, cwd=project_dir)
         except KeyboardInterrupt:
             if not cancelable:
                 raise
@@ -111,10 +224,48 @@ def run_compose(  # noqa: CFQ002 (max arguments)
     return cmd
 
 
+async def run_compose_async(  # noqa: CFQ002 (max arguments)
+    project_dir,
+    project_file,
+    profiles: list[str],
+    command: list[str],
+    *,
+    runner: ProcessRunner,
+    dry_run: bool = False,
+    capture_output: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+) -> tuple[list[str], t.Optional[subprocess.CompletedProcess]]:
+    """Coroutine version of `run_compose`.
+
+    With `capture_output`, stderr is merged into stdout to keep the order of the messages.
+    """
+    cmd = compose_cmd(project_file, profiles, command)
+
+    result = None
+    if not dry_run:
+        print_cmd_callback(cmd, project_dir)
+        result = await runner.run(
+            cmd, cwd=project_dir, capture_output=capture_output, merge_stderr=capture_output
+        )
+
+    return cmd, result
+
+
+def _expand_project_paths(
+    paths: t.Iterable[pathlib.Path], recursive: bool, use_index: bool
+) -> t.Generator[str, None, None]:
+    for path in map(str, paths):
+        if recursive and os.path.isdir(path):
+            for compose_dir in discover_compose_dirs(path, use_index=use_index):
+                yield relative_path_if_below(compose_dir)
+        else:
+            yield path
+
+
 def find_compose_projects(
-    paths: t.Iterable[pathlib.Path], allow_empty: bool
+    paths: t.Iterable[pathlib.Path], allow_empty: bool, *, recursive: bool = False, use_index: bool = True
 ) -> t.Generator[tuple[str, str], None, None]:
-    for project in map(str, paths):
+    for project in _expand_project_paths(paths, recursive, use_index):
         project_dir = None
         project_file = None
         if (
@@ -126,7 +277,7 @@ def find_compose_projects(
             if project_dir == "":
                 project_dir = ""
         if project_dir is None or project_file is None:
-            for file in ["compose.yaml", "compose.yml", "docker-compose.yaml", "docker-compose.yml"]:
+            for file in COMPOSE_FILE_NAMES:
                 if os.path.exists(os.path.join(project, file)):
                     project_dir, project_file = project, file
                     break
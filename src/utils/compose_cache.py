@@ -0,0 +1,192 @@
+"""Persistent cache for resolved compose models
+
+An entry is valid as long as the fingerprints (mtime, size and content hash)
+of all files the model was rendered from are unchanged
+and all environment variables those files reference still have the same values.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import typing as t
+
+import yaml
+
+from src.utils.compose import load_compose_model
+from src.utils.system import get_cache_dir
+
+CACHE_SUBDIR = "compose"
+CACHE_MAX_SIZE = 32 * 1024 * 1024
+
+_VARIABLE_REGEX = re.compile(r"\$\{?([A-Za-z_][A-Za-z0-9_]*)")
+
+
+class _UncacheableError(Exception):
+    pass
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(path: str) -> t.Optional[dict[str, t.Any]]:
+    try:
+        stat = os.stat(path)
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": _file_hash(path)}
+    except FileNotFoundError:
+        return None
+
+
+def _is_fingerprint_valid(path: str, fingerprint: t.Optional[dict[str, t.Any]]) -> bool:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return fingerprint is None
+    if fingerprint is None:
+        return False
+    if stat.st_mtime_ns == fingerprint["mtime_ns"] and stat.st_size == fingerprint["size"]:
+        return True
+    return stat.st_size == fingerprint["size"] and _file_hash(path) == fingerprint["sha256"]
+
+
+def _as_list(value: t.Any) -> list[t.Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _resolve(base_dir: str, path: t.Any) -> str:
+    if not isinstance(path, str) or "$" in path:
+        raise _UncacheableError(f"Cannot track path {path!r}.")
+    return os.path.normpath(os.path.join(base_dir, os.path.expanduser(path)))
+
+
+def _referenced_compose_files(path: str, content: t.Any) -> t.Generator[tuple[str, bool], None, None]:
+    """Yield files referenced by a raw compose file and whether they are compose files themselves."""
+    if not isinstance(content, dict):
+        return
+    base_dir = os.path.dirname(path)
+    for include in _as_list(content.get("include")):
+        if isinstance(include, dict):
+            for include_path in _as_list(include.get("path")):
+                yield _resolve(base_dir, include_path), True
+            for env_file in _as_list(include.get("env_file")):
+                yield _resolve(base_dir, env_file), False
+        else:
+            yield _resolve(base_dir, include), True
+    for service in (content.get("services") or {}).values():
+        if not isinstance(service, dict):
+            continue
+        extends = service.get("extends")
+        if isinstance(extends, dict) and "file" in extends:
+            yield _resolve(base_dir, extends["file"]), True
+        for env_file in _as_list(service.get("env_file")):
+            yield _resolve(base_dir, env_file["path"] if isinstance(env_file, dict) else env_file), False
+
+
+def _collect_dependencies(cwd: str, file: str) -> tuple[list[str], list[str]]:
+    """Collect all files and environment variables the compose model depends on."""
+    compose_file = os.path.normpath(os.path.join(os.path.abspath(cwd), file))
+    files: list[str] = [os.path.join(os.path.dirname(compose_file), ".env")]
+    variables: t.Set[str] = set(name for name in os.environ if name.startswith("COMPOSE_"))
+    pending = [compose_file]
+    while pending:
+        path = pending.pop()
+        if path in files:
+            continue
+        files.append(path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            continue
+        variables.update(_VARIABLE_REGEX.findall(text))
+        try:
+            content = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise _UncacheableError(str(e)) from e
+        for referenced_file, is_compose_file in _referenced_compose_files(path, content):
+            if is_compose_file:
+                pending.append(referenced_file)
+            elif referenced_file not in files:
+                files.append(referenced_file)
+    return files, sorted(variables)
+
+
+def _entry_path(cwd: str, file: str) -> str:
+    key = json.dumps([os.path.abspath(cwd), file])
+    return os.path.join(get_cache_dir(), CACHE_SUBDIR, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def _load_entry(path: str) -> t.Optional[t.Mapping[str, t.Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+        if not all(_is_fingerprint_valid(p, fingerprint) for p, fingerprint in entry["files"].items()):
+            return None
+        if any(os.environ.get(name) != value for name, value in entry["environment"].items()):
+            return None
+        os.utime(path)  # mark as recently used
+        return entry["model"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _evict(cache_dir: str, max_size: int) -> None:
+    entries = []
+    for entry in os.scandir(cache_dir):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+def _save_entry(path: str, entry: t.Mapping[str, t.Any]) -> None:
+    cache_dir = os.path.dirname(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        _evict(cache_dir, CACHE_MAX_SIZE)
+    except OSError:
+        pass
+
+
+def load_cached_compose_model(cwd: str, file: str, *, use_cache: bool = True) -> t.Mapping[str, t.Any]:
+    """Like `load_compose_model`, but skip `docker compose config` if nothing changed since the last call."""
+    if not use_cache:
+        return load_compose_model(cwd, file)
+
+    path = _entry_path(cwd, file)
+    model = _load_entry(path)
+    if model is not None:
+        return model
+
+    try:
+        files, variables = _collect_dependencies(cwd, file)
+    except _UncacheableError:
+        return load_compose_model(cwd, file)
+    entry = {
+        "files": {p: _fingerprint(p) for p in files},
+        "environment": {name: os.environ.get(name) for name in variables},
+    }
+    model = load_compose_model(cwd, file)
+    _save_entry(path, {**entry, "model": model})
+    return model
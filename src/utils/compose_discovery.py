@@ -0,0 +1,97 @@
+"""Recursive discovery of compose projects
+
+The directory tree is remembered in an index (in doco's cache directory).
+A directory is only scanned again if its mtime changed,
+so repeated discovery over a large tree mostly costs one `stat` per directory.
+"""
+import hashlib
+import json
+import os
+import threading
+import typing as t
+
+from src.utils.system import get_cache_dir
+
+COMPOSE_FILE_NAMES = ["compose.yaml", "compose.yml", "docker-compose.yaml", "docker-compose.yml"]
+IGNORED_DIR_NAMES = {"node_modules", "__pycache__", "venv"}
+
+INDEX_SUBDIR = "discovery"
+
+_DirEntry = dict[str, t.Any]
+
+
+def _is_ignored_dir(name: str) -> bool:
+    return name.startswith(".") or name in IGNORED_DIR_NAMES
+
+
+def _scan_dir(path: str, mtime_ns: int) -> _DirEntry:
+    has_compose_file = False
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name in COMPOSE_FILE_NAMES and entry.is_file():
+                    has_compose_file = True
+                elif not _is_ignored_dir(entry.name) and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+    except OSError:
+        pass
+    return {"mtime_ns": mtime_ns, "compose": has_compose_file, "subdirs": sorted(subdirs)}
+
+
+def _walk(
+    path: str, old_index: t.Mapping[str, _DirEntry], new_index: dict[str, _DirEntry]
+) -> t.Generator[str, None, None]:
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return
+    entry = old_index.get(path)
+    if entry is None or entry["mtime_ns"] != mtime_ns:
+        entry = _scan_dir(path, mtime_ns)
+    new_index[path] = entry
+    if entry["compose"]:
+        # Do not descend into projects, their subdirectories usually contain volume data.
+        yield path
+        return
+    for name in entry["subdirs"]:
+        yield from _walk(os.path.join(path, name), old_index, new_index)
+
+
+def _index_path(root: str) -> str:
+    return os.path.join(get_cache_dir(), INDEX_SUBDIR, hashlib.sha256(root.encode()).hexdigest() + ".json")
+
+
+def _load_index(path: str) -> t.Mapping[str, _DirEntry]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(path: str, index: t.Mapping[str, _DirEntry]) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def discover_compose_dirs(root: str, *, use_index: bool = True) -> list[str]:
+    """Find all directories below root (including root) containing a compose file.
+
+    Hidden directories and directories like `node_modules` are skipped,
+    directories containing a compose file are not descended into.
+    """
+    root = os.path.abspath(root)
+    index_path = _index_path(root)
+    old_index = _load_index(index_path) if use_index else {}
+    new_index: dict[str, _DirEntry] = {}
+    compose_dirs = list(_walk(root, old_index, new_index))
+    if use_index and new_index != old_index:
+        _save_index(index_path, new_index)
+    return compose_dirs
@@ -1,18 +1,26 @@
+import concurrent.futures
 import dataclasses
+import functools
 import os
 import pathlib
 import subprocess
+import threading
 import typing as t
 
 import rich.tree
 
 from src.utils.common import PrintCmdData
+from src.utils.compose import ComposeConfigError
+from src.utils.compose import dump_compose_config
 from src.utils.compose import find_compose_projects
-from src.utils.compose import load_compose_config
-from src.utils.compose import load_compose_profiles
+from src.utils.compose import get_compose_profiles
 from src.utils.compose import load_compose_ps
-from src.utils.compose import load_compose_services
 from src.utils.compose import run_compose
+from src.utils.compose import select_compose_config
+from src.utils.compose_cache import load_cached_compose_model
+from src.utils.docker_api import DockerApiError
+from src.utils.docker_api import get_docker_socket_path
+from src.utils.docker_api import load_compose_containers
 from src.utils.doco_config import DocoConfig
 from src.utils.doco_config import load_doco_config
 from src.utils.exceptions_rich import DocoError
@@ -23,16 +31,32 @@ from src.utils.system import get_user_groups
 
 
 @dataclasses.dataclass
-class ComposeProject:  # pylint: disable=too-many-instance-attributes
+class ComposeProject:
+    """A loaded compose project
+
+    Container states (`ps`), the config text (`config_yaml`) and the doco config
+    are loaded on first access and memoized, so commands only pay for what they use.
+    """
+
     dir: str
     file: str
     config: t.Mapping[str, t.Any]
-    config_yaml: str
-    ps: t.List[t.Mapping[str, t.Any]]
     selected_services: list[str]
     all_profiles: list[str]
     selected_profiles: list[str]
-    doco_config: DocoConfig
+    load_ps: t.Callable[[], t.List[t.Mapping[str, t.Any]]] = dataclasses.field(default=list, repr=False)
+
+    @functools.cached_property
+    def ps(self) -> t.List[t.Mapping[str, t.Any]]:
+        return self.load_ps()
+
+    @functools.cached_property
+    def config_yaml(self) -> str:
+        return dump_compose_config(self.config) if self.config else ""
+
+    @functools.cached_property
+    def doco_config(self) -> DocoConfig:
+        return load_doco_config(self.dir)
 
 
 @dataclasses.dataclass
@@ -40,33 +64,159 @@ class ProjectSearchOptions:
     print_compose_errors: bool
     only_running: bool
     allow_empty: bool = False
+    jobs: int = 1
+    use_cache: bool = True
+    recursive: bool = False
+
+
+class ComposeStateProvider:
+    """Provide container states like `docker compose ps` does.
+
+    All compose containers are fetched with a single Docker Engine API call on first use.
+    If the API is not reachable, `docker compose ps` is called per project instead.
+    """
+
+    def __init__(self, socket_path: t.Optional[str]):
+        self._socket_path = socket_path
+        self._containers: t.Optional[dict[str, list[t.Mapping[str, t.Any]]]] = None
+        self._lock = threading.Lock()
+
+    def _load_containers(self) -> t.Optional[dict[str, list[t.Mapping[str, t.Any]]]]:
+        with self._lock:
+            if self._containers is None and self._socket_path is not None:
+                try:
+                    self._containers = load_compose_containers(socket_path=self._socket_path)
+                except DockerApiError:
+                    self._socket_path = None
+            return self._containers
+
+    def ps(  # noqa: CFQ002 (max arguments)
+        self,
+        project_dir: str,
+        project_file: str,
+        *,
+        config: t.Mapping[str, t.Any],
+        services: list[str],
+        profiles: list[str],
+    ) -> list[t.Mapping[str, t.Any]]:
+        containers = self._load_containers()
+        if containers is None:
+            return load_compose_ps(project_dir, project_file, services=services, profiles=profiles)
+        selected_services = services or list(config["services"].keys())
+        return [item for item in containers.get(config["name"], []) if item["Service"] in selected_services]
+
+
+_LoadedProject = t.Union[ComposeProject, subprocess.CalledProcessError, ComposeConfigError, None]
 
 
-def _get_profiles(cwd: str, file: str, *, profiles: t.Union[list[str], t.Literal[True]]):
-    project_profiles = load_compose_profiles(cwd, file)
+def _get_profiles(model: t.Mapping[str, t.Any], *, profiles: t.Union[list[str], t.Literal[True]]):
+    project_profiles = get_compose_profiles(model)
     selected_profiles = (
         project_profiles if profiles is True else [p for p in profiles if p in project_profiles]
     )
     return project_profiles, selected_profiles
 
 
-def _get_services(
-    cwd: str, file: str, *, services: list[str], selected_profiles: list[str]
-) -> t.Optional[list[str]]:
+def _get_services(model: t.Mapping[str, t.Any], *, services: list[str]) -> t.Optional[list[str]]:
     if services:
-        project_services = load_compose_services(cwd, file, profiles=selected_profiles)
+        # Like with docker compose, explicitly selected services do not need their profiles
+        project_services = model.get("services", {})
         selected_services = [s for s in services if s in project_services]
         return selected_services or None
     return []
 
 
-def get_compose_projects(  # noqa: C901 (too complex)
+def _load_compose_project(
+    project_dir: str,
+    project_file: str,
+    *,
+    services: list[str],
+    profiles: t.Union[list[str], t.Literal[True]],
+    options: ProjectSearchOptions,
+    state_provider: ComposeStateProvider,
+) -> _LoadedProject:
+    # pylint: disable=too-many-locals
+    if options.allow_empty and project_file == "":
+        return ComposeProject(
+            dir=project_dir,
+            file=project_file,
+            config={},
+            selected_services=[],
+            all_profiles=[],
+            selected_profiles=[],
+        )
+
+    try:
+        project_model = load_cached_compose_model(project_dir, project_file, use_cache=options.use_cache)
+    except subprocess.CalledProcessError as e:
+        return e
+
+    project_profiles, selected_profiles = _get_profiles(project_model, profiles=profiles)
+    selected_services = _get_services(project_model, services=services)
+    if selected_services is None:
+        return None
+    try:
+        project_config = select_compose_config(project_model, services=services, profiles=selected_profiles)
+    except ComposeConfigError as e:
+        return e
+
+    project = ComposeProject(
+        dir=project_dir,
+        file=project_file,
+        config=project_config,
+        selected_services=selected_services,
+        all_profiles=project_profiles,
+        selected_profiles=selected_profiles,
+        load_ps=functools.partial(
+            state_provider.ps,
+            project_dir,
+            project_file,
+            config=project_config,
+            services=selected_services,
+            profiles=selected_profiles,
+        ),
+    )
+
+    if options.only_running and not _has_running_or_restarting_service(project):
+        return None
+
+    return project
+
+
+def _has_running_or_restarting_service(project: ComposeProject) -> bool:
+    for service_name in project.config["services"].keys():
+        state = next((s["State"] for s in project.ps if s["Service"] == service_name), "exited")
+
+        if state in ("running", "restarting"):
+            return True
+    return False
+
+
+def _print_compose_error(
+    project_dir: str, project_file: str, error: t.Union[subprocess.CalledProcessError, ComposeConfigError]
+):
+    tree = rich.tree.Tree(f"[b]{Formatted(os.path.join(project_dir, project_file))}[/]")
+    if isinstance(error, ComposeConfigError):
+        message = str(error)
+    elif error.stderr is not None:
+        message = error.stderr.strip()
+    else:
+        message = f"Exit code [b]{error.returncode}[/]"
+    tree.add("[red]" + str(Formatted(message)) + "[/]")
+    rich.print(tree)
+
+
+def get_compose_projects(
     paths: t.Iterable[pathlib.Path],
     services: list[str],
     profiles: t.Union[list[str], t.Literal[True]],
     options: ProjectSearchOptions,
 ) -> t.Generator[ComposeProject, None, None]:
-    # pylint: disable=too-many-locals
+    """Load the compose projects found in the given paths.
+
+    With ``options.jobs > 1`` the projects are loaded by a pool of worker threads,
+    but they are still yielded in the order they were found.
+    """
 
     if not (os.geteuid() == 0 or "docker" in get_user_groups()):
         raise DocoError(
@@ -74,73 +224,42 @@ def get_compose_projects(  # noqa: C901 (too complex)
             "Please try again, this time using 'sudo'."
         )
 
-    for project_dir, project_file in find_compose_projects(paths, options.allow_empty):
-        if not (options.allow_empty and project_file == ""):
-            try:
-                project_profiles, selected_profiles = _get_profiles(
-                    project_dir, project_file, profiles=profiles
-                )
-                selected_services = _get_services(
-                    project_dir, project_file, services=services, selected_profiles=selected_profiles
-                )
-                if selected_services is None:
-                    continue
-                project_config, project_config_yaml = load_compose_config(
-                    cwd=project_dir,
-                    file=project_file,
-                    services=services,
-                    profiles=selected_profiles,
-                )
-            except subprocess.CalledProcessError as e:
-                if options.print_compose_errors:
-                    tree = rich.tree.Tree(f"[b]{Formatted(os.path.join(project_dir, project_file))}[/]")
-                    tree.add(
-                        "[red]"
-                        + str(
-                            Formatted(
-                                e.stderr.strip() if e.stderr is not None else f"Exit code [b]{e.returncode}[/]"
-                            )
-                        )
-                        + "[/]"
-                    )
-                    rich.print(tree)
-                continue
-
-            project_ps = load_compose_ps(
-                project_dir, project_file, services=selected_services, profiles=selected_profiles
-            )
-
-            if options.only_running:
-                has_running_or_restarting = False
-                for service_name in project_config["services"].keys():
-                    state = next((s["State"] for s in project_ps if s["Service"] == service_name), "exited")
-
-                    if state in ("running", "restarting"):
-                        has_running_or_restarting = True
-                        break
-
-                if not has_running_or_restarting:
-                    continue
-        else:
-            project_config = {}
-            project_config_yaml = ""
-            project_ps = []
-            selected_services = []
-            project_profiles = []
-            selected_profiles = []
-
-        yield ComposeProject(
-            dir=project_dir,
-            file=project_file,
-            config=project_config,
-            config_yaml=project_config_yaml,
-            ps=project_ps,
-            selected_services=selected_services,
-            all_profiles=project_profiles,
-            selected_profiles=selected_profiles,
-            doco_config=load_doco_config(project_dir),
+    state_provider = ComposeStateProvider(get_docker_socket_path())
+
+    def load(found_project: tuple[str, str]):
+        return found_project, _load_compose_project(
+            *found_project,
+            services=services,
+            profiles=profiles,
+            options=options,
+            state_provider=state_provider,
         )
 
+    found_projects = find_compose_projects(
+        paths, options.allow_empty, recursive=options.recursive, use_index=options.use_cache
+    )
+    if options.jobs > 1:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=options.jobs)
+        try:
+            results = executor.map(load, found_projects)
+            yield from _yield_loaded_projects(results, options)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        yield from _yield_loaded_projects(map(load, found_projects), options)
+
+
+def _yield_loaded_projects(
+    results: t.Iterable[tuple[tuple[str, str], _LoadedProject]],
+    options: ProjectSearchOptions,
+) -> t.Generator[ComposeProject, None, None]:
+    for (project_dir, project_file), result in results:
+        if isinstance(result, (subprocess.CalledProcessError, ComposeConfigError)):
+            if options.print_compose_errors:
+                _print_compose_error(project_dir, project_file, result)
+        elif result is not None:
+            yield result
+
 
 def rich_run_compose(  # noqa: CFQ002 (max arguments)
     project_dir,
@@ -0,0 +1,114 @@
+"""Remember what doco brought up
+
+After services are brought up, a hash of each service's resolved compose config
+and the ID of its image is stored in doco's state directory.
+Later runs can then tell which services changed since (see `--changed`).
+"""
+import hashlib
+import json
+import os
+import typing as t
+
+from src.utils.compose import get_service_networks
+from src.utils.compose import get_service_volumes
+from src.utils.compose import load_image_ids
+from src.utils.compose import select_compose_config
+from src.utils.compose_rich import ComposeProject
+from src.utils.system import get_state_dir
+
+
+def _get_state_path(project: ComposeProject) -> str:
+    key = hashlib.sha256(json.dumps([os.path.abspath(project.dir), project.file]).encode()).hexdigest()
+    return os.path.join(get_state_dir(), "deployed", f"{key}.json")
+
+
+def _get_service_image(project: ComposeProject, service_name: str) -> str:
+    # Images of services without `image` are built and named like this by docker compose.
+    return project.config["services"][service_name].get("image") or f"{project.config['name']}-{service_name}"
+
+
+def get_service_hashes(project: ComposeProject, services: list[str]) -> dict[str, str]:
+    images = {service_name: _get_service_image(project, service_name) for service_name in services}
+    image_ids = load_image_ids(sorted(set(images.values())))
+    return {
+        service_name: hashlib.sha256(
+            json.dumps(
+                {
+                    "project": _get_service_project_config(project, service_name),
+                    "service": project.config["services"][service_name],
+                    "image_id": image_ids.get(images[service_name]),
+                },
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+        for service_name in services
+    }
+
+
+def _get_service_project_config(project: ComposeProject, service_name: str) -> dict[str, t.Any]:
+    # The other top-level keys may affect each service, so they are part of every hash.
+    # Networks and volumes depend on the selected services, so only those of the service itself are included.
+    project_config = {
+        key: value for key, value in project.config.items() if key not in ("services", "networks", "volumes")
+    }
+    for key, used in (
+        ("networks", get_service_networks(project.config, service_name)),
+        ("volumes", get_service_volumes(project.config, service_name)),
+    ):
+        if key in project.config:
+            project_config[key] = {name: value for name, value in project.config[key].items() if name in used}
+    return project_config
+
+
+def load_deployed_hashes(project: ComposeProject) -> dict[str, str]:
+    try:
+        with open(_get_state_path(project), encoding="utf-8") as f:
+            return json.load(f)["services"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def save_deployed_hashes(project: ComposeProject, services: list[str]) -> None:
+    """Remember the current state of the given services (all if empty) after they were brought up.
+
+    docker compose also brings up the services they depend on, so these are remembered as well.
+    """
+    if services:
+        # All profiles, the dependencies are already enabled (they are part of the project's config)
+        services = list(
+            select_compose_config(project.config, services=services, profiles=project.all_profiles)["services"]
+        )
+    else:
+        services = list(project.config["services"].keys())
+    hashes: dict[str, t.Any] = {**load_deployed_hashes(project), **get_service_hashes(project, services)}
+    path = _get_state_path(project)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"dir": os.path.abspath(project.dir), "file": project.file, "services": hashes}, f)
+    os.replace(tmp_path, path)
+
+
+def get_changed_services(project: ComposeProject) -> list[str]:
+    """Get the services whose config or image changed since they were last brought up by doco."""
+    services = list(project.config["services"].keys())
+    deployed_hashes = load_deployed_hashes(project)
+    current_hashes = get_service_hashes(project, services)
+    return [
+        service_name
+        for service_name in services
+        if deployed_hashes.get(service_name) != current_hashes[service_name]
+    ]
+
+
+def select_changed_services(project: ComposeProject) -> t.Optional[list[str]]:
+    """Get the services to pass to docker compose to only update the changed services.
+
+    :return: None if nothing changed
+    """
+    changed_services = get_changed_services(project)
+    if len(changed_services) == 0:
+        return None
+    if len(changed_services) == len(project.config["services"]):
+        return project.selected_services
+    return changed_services
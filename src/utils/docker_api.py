@@ -0,0 +1,106 @@
+"""Minimal Docker Engine API client (talking HTTP over the docker unix socket)"""
+import http.client
+import json
+import os
+import socket
+import typing as t
+import urllib.parse
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+COMPOSE_SERVICE_LABEL = "com.docker.compose.service"
+COMPOSE_ONEOFF_LABEL = "com.docker.compose.oneoff"
+
+
+class DockerApiError(Exception):
+    pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _current_docker_context() -> t.Optional[str]:
+    if "DOCKER_CONTEXT" in os.environ:
+        return os.environ["DOCKER_CONTEXT"]
+    config_dir = os.environ.get("DOCKER_CONFIG", os.path.join(os.path.expanduser("~"), ".docker"))
+    try:
+        with open(os.path.join(config_dir, "config.json"), encoding="utf-8") as f:
+            return json.load(f).get("currentContext")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_docker_socket_path() -> t.Optional[str]:
+    """Get the unix socket of the docker daemon the docker CLI would talk to.
+
+    Returns None if the CLI is configured to use something we cannot resolve (TCP host, non-default context).
+    """
+    docker_host = os.environ.get("DOCKER_HOST")
+    if docker_host:
+        return docker_host[len("unix://") :] if docker_host.startswith("unix://") else None
+    if _current_docker_context() not in (None, "", "default"):
+        return None
+    return DEFAULT_DOCKER_SOCKET
+
+
+def docker_api_get(path: str, *, socket_path: str, timeout: float = 10) -> t.Any:
+    connection = _UnixHTTPConnection(socket_path, timeout=timeout)
+    try:
+        connection.request("GET", path, headers={"Accept": "application/json"})
+        response = connection.getresponse()
+        body = response.read()
+    except OSError as e:
+        raise DockerApiError(f"Cannot talk to the docker daemon at {socket_path}: {e}") from e
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise DockerApiError(f"Docker API request {path} failed with status {response.status}: {body!r}")
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise DockerApiError(f"Docker API request {path} returned invalid JSON: {e}") from e
+
+
+def _compose_ps_item(container: t.Mapping[str, t.Any]) -> t.Mapping[str, t.Any]:
+    """Convert a container of `/containers/json` to an item like in the output of `docker compose ps`."""
+    labels = container.get("Labels") or {}
+    names = container.get("Names") or []
+    return {
+        "ID": container["Id"],
+        "Name": names[0].lstrip("/") if names else container["Id"][:12],
+        "Image": container.get("Image", ""),
+        "Command": container.get("Command", ""),
+        "Project": labels.get(COMPOSE_PROJECT_LABEL, ""),
+        "Service": labels.get(COMPOSE_SERVICE_LABEL, ""),
+        "Created": container.get("Created", 0),
+        "State": container.get("State", ""),
+        "Status": container.get("Status", ""),
+    }
+
+
+def load_compose_containers(*, socket_path: str) -> dict[str, list[t.Mapping[str, t.Any]]]:
+    """Load all (non one-off) compose containers with a single API call.
+
+    :return: Mapping of compose project names to `docker compose ps`-like items
+    """
+    filters = json.dumps({"label": [COMPOSE_PROJECT_LABEL, f"{COMPOSE_ONEOFF_LABEL}=False"]})
+    containers = docker_api_get(
+        f"/containers/json?all=1&filters={urllib.parse.quote(filters)}", socket_path=socket_path
+    )
+    projects: dict[str, list[t.Mapping[str, t.Any]]] = {}
+    for container in containers:
+        item = _compose_ps_item(container)
+        projects.setdefault(item["Project"], []).append(item)
+    for items in projects.values():
+        # Running containers first, as callers use the first container found for a service.
+        items.sort(key=lambda item: (item["State"] not in ("running", "restarting"), item["Name"]))
+    return projects
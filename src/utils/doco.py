@@ -1,5 +1,8 @@
+import asyncio
 import dataclasses
+import functools
 import os
+import subprocess
 import typing as t
 
 import rich.console
@@ -7,52 +10,200 @@ import rich.json
 import rich.markup
 import rich.panel
 import rich.pretty
+import rich.rule
+import rich.table
+import rich.text
 import rich.tree
+import typer
 
 from .common import PrintCmdData
 from .compose_rich import ComposeProject
+from .console import console
+from .project_dependencies import Dependencies
+from .project_dependencies import get_project_waves
+from .rich import format_cmd_line
 from .rich import Formatted
 from .rich import rich_print_conditional_cmds
+from .runner import ProcessRunner
+from .runner import run_coroutine
 
 
 @dataclasses.dataclass
 class ProjectInfo:
-    has_running_or_restarting: bool
-    all_running: bool
+    project: ComposeProject
     cmds: list[PrintCmdData]
+    # Called after the commands were run successfully (not in dry-run mode).
+    on_success: list[t.Callable[[], None]] = dataclasses.field(default_factory=list)
+
+    @functools.cached_property
+    def service_states(self) -> dict[str, str]:
+        return {
+            service_name: next((s["State"] for s in self.project.ps if s["Service"] == service_name), "exited")
+            for service_name in self.project.config["services"].keys()
+        }
+
+    @property
+    def has_running_or_restarting(self) -> bool:
+        return any(state in ("running", "restarting") for state in self.service_states.values())
+
+    @property
+    def all_running(self) -> bool:
+        return all(state == "running" for state in self.service_states.values())
 
 
 def do_project_cmd(project: ComposeProject, dry_run: bool, cmd_task: t.Callable[[ProjectInfo], None]):
-    project_name = project.config["name"]
-    project_id = f"[b]{Formatted(project_name)}[/]"
-    project_id += f" [dim]{Formatted(os.path.join(project.dir, project.file))}[/]"
+    info = ProjectInfo(project=project, cmds=[])
 
-    tree = rich.tree.Tree(project_id)
+    cmd_task(info)
 
-    has_running_or_restarting = False
-    all_running = True
+    if not dry_run:
+        for callback in info.on_success:
+            callback()
+    else:
+        project_name = project.config["name"]
+        project_id = f"[b]{Formatted(project_name)}[/]"
+        project_id += f" [dim]{Formatted(os.path.join(project.dir, project.file))}[/]"
 
-    for service_name, _ in project.config["services"].items():
-        state = next((s["State"] for s in project.ps if s["Service"] == service_name), "exited")
+        tree = rich.tree.Tree(project_id)
+        for service_name, state in info.service_states.items():
+            tree.add(f"[b]{Formatted(service_name)}[/] [i]{Formatted(state)}[/]")
+
+        rich.print(tree)
+        rich_print_conditional_cmds(info.cmds)
 
-        if state in ("running", "restarting"):
-            has_running_or_restarting = True
 
-        if state != "running":
-            all_running = False
+@dataclasses.dataclass
+class ProjectCmdResult:
+    info: ProjectInfo
+    outputs: list[tuple[list[str], str]] = dataclasses.field(default_factory=list)
+    error: t.Optional[subprocess.CalledProcessError] = None
+    failed_dependencies: list[str] = dataclasses.field(default_factory=list)
 
-        tree.add(f"[b]{Formatted(service_name)}[/] [i]{Formatted(state)}[/]")
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or len(self.failed_dependencies) > 0
 
-    cmds: list[PrintCmdData] = []
 
-    cmd_task(
-        ProjectInfo(
-            has_running_or_restarting=has_running_or_restarting,
-            all_running=all_running,
-            cmds=cmds,
+async def _run_project_cmds(info: ProjectInfo, runner: ProcessRunner) -> ProjectCmdResult:
+    result = ProjectCmdResult(info=info)
+    for cmd in info.cmds:
+        assert cmd.cmd is not None
+        try:
+            completed = await runner.run(
+                cmd.cmd,
+                cwd=os.path.abspath(cmd.cwd or info.project.dir),
+                capture_output=True,
+                merge_stderr=True,
+            )
+        except subprocess.CalledProcessError as e:
+            result.outputs.append((cmd.cmd, e.stdout or ""))
+            result.error = e
+            break
+        result.outputs.append((cmd.cmd, completed.stdout))
+    if result.error is None:
+        for callback in info.on_success:
+            await asyncio.to_thread(callback)
+    return result
+
+
+def _format_project_names(names: list[str]) -> str:
+    return ", ".join(f"[b]{Formatted(name)}[/]" for name in names)
+
+
+def _rich_print_project_result(result: ProjectCmdResult) -> None:
+    project = result.info.project
+    console.print(
+        rich.rule.Rule(
+            title=rich.text.Text("▾ ").append(
+                rich.text.Text.from_markup(
+                    f"[b]{Formatted(project.config['name'])}[/]"
+                    f" [dim]{Formatted(os.path.join(project.dir, project.file))}[/]"
+                )
+            ),
+            align="left",
+            characters="─",
+            style="default" if not result.failed else "red",
         )
     )
+    for cmd, output in result.outputs:
+        console.print(str(format_cmd_line(cmd)), highlight=False, soft_wrap=True)
+        if output.strip() != "":
+            console.print(output.rstrip(), markup=False, highlight=False, soft_wrap=True)
+    if result.failed_dependencies:
+        console.print(
+            f"[red]Skipped because of failed projects:[/] {_format_project_names(result.failed_dependencies)}"
+        )
+    elif len(result.outputs) == 0:
+        console.print("[i]Nothing to do[/]")
+    if result.error is not None:
+        console.print(f"[red]Exit code [b]{result.error.returncode}[/][/]")
 
-    if dry_run:
-        rich.print(tree)
-        rich_print_conditional_cmds(cmds)
+
+def _rich_print_failures(results: list[ProjectCmdResult]) -> None:
+    table = rich.table.Table(title="Failed projects", title_justify="left", title_style="b red")
+    table.add_column("Project")
+    table.add_column("Command")
+    table.add_column("Exit code", justify="right")
+    for result in results:
+        project = result.info.project
+        project_id = f"[b]{Formatted(project.config['name'])}[/] [dim]{Formatted(project.dir)}[/]"
+        if result.error is not None:
+            table.add_row(project_id, str(format_cmd_line(result.error.cmd)), str(result.error.returncode))
+        else:
+            table.add_row(
+                project_id, f"[i]Skipped because of[/] {_format_project_names(result.failed_dependencies)}", ""
+            )
+    console.print(table)
+
+
+def do_project_cmds_concurrently(
+    projects: list[ComposeProject],
+    dependencies: Dependencies,
+    jobs: int,
+    plan_task: t.Callable[[ComposeProject, ProjectInfo], None],
+):
+    """Run the commands of multiple projects concurrently.
+
+    `plan_task` is expected to only collect the commands of the project (like in dry-run mode),
+    which are then run in sequence per project.
+    A project is started once all projects it depends on have finished successfully
+    and is skipped if one of them failed.
+    Output is captured and printed per project when it is finished;
+    failures are summarized at the end instead of aborting.
+    """
+    get_project_waves(projects, dependencies)  # fail early on cyclic dependencies
+
+    infos: list[ProjectInfo] = []
+    for project in projects:
+        info = ProjectInfo(project=project, cmds=[])
+        plan_task(project, info)
+        infos.append(info)
+
+    async def run_all() -> list[ProjectCmdResult]:
+        runner = ProcessRunner(max_concurrency=jobs)
+        semaphore = asyncio.Semaphore(jobs)
+        tasks: list["asyncio.Task[ProjectCmdResult]"] = []
+
+        async def run_project(index: int) -> ProjectCmdResult:
+            required_results = [await tasks[required] for required in sorted(dependencies[index])]
+            failed_dependencies = [
+                result.info.project.config["name"] for result in required_results if result.failed
+            ]
+            if failed_dependencies:
+                return ProjectCmdResult(info=infos[index], failed_dependencies=failed_dependencies)
+            # Keep the slot for all commands of the project, so started projects finish first.
+            async with semaphore:
+                return await _run_project_cmds(infos[index], runner)
+
+        tasks.extend(asyncio.ensure_future(run_project(index)) for index in range(len(infos)))
+        results: list[ProjectCmdResult] = []
+        for future in asyncio.as_completed(tasks):
+            result = await future
+            _rich_print_project_result(result)
+            results.append(result)
+        return results
+
+    failures = [result for result in run_coroutine(run_all()) if result.failed]
+    if len(failures) > 0:
+        _rich_print_failures(failures)
+        raise typer.Exit(1)
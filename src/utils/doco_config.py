@@ -1,5 +1,7 @@
+import enum
 import os
 import pathlib
+import re
 import shlex
 import typing as t
 
@@ -32,15 +34,69 @@ class DocoBackupRestoreStructureConfig(pydantic.BaseModel):
     gid: t.Optional[str] = None
 
 
+class BackupBackend(str, enum.Enum):
+    # Copy the files, hard linking unchanged files to the last backups (see `run_rsync_backup_with_hardlinks`)
+    RSYNC = "rsync"
+    # Store the files as deduplicated chunks (see `chunk_store`)
+    CHUNKS = "chunks"
+
+
+class DocoBackupServicePolicy(pydantic.BaseModel):
+    project_pattern: re.Pattern
+    service_pattern: re.Pattern
+    live: bool
+
+
+class DocoBackupRetentionPolicy(pydantic.BaseModel):
+    project_pattern: re.Pattern
+    keep_last: int = pydantic.Field(default=0, ge=0)
+    keep_daily: int = pydantic.Field(default=0, ge=0)
+    keep_weekly: int = pydantic.Field(default=0, ge=0)
+    keep_monthly: int = pydantic.Field(default=0, ge=0)
+    keep_yearly: int = pydantic.Field(default=0, ge=0)
+
+    def keeps_any(self) -> bool:
+        return any((self.keep_last, self.keep_daily, self.keep_weekly, self.keep_monthly, self.keep_yearly))
+
+
 class DocoBackupConfig(pydantic.BaseModel):
     structure: DocoBackupStructureConfig = DocoBackupStructureConfig()
     restore_structure: DocoBackupRestoreStructureConfig = DocoBackupRestoreStructureConfig()
     rsync: RsyncConfig = RsyncConfig()
+    backend: BackupBackend = BackupBackend.RSYNC
+    services: list[DocoBackupServicePolicy] = []
+    retention: list[DocoBackupRetentionPolicy] = []
+
+    def is_live_service(self, project_name: str, service_name: str) -> bool:
+        """Whether a service can keep running during backup (the last matching policy wins)."""
+        live = False
+        for policy in self.services:
+            if policy.project_pattern.search(project_name) and policy.service_pattern.search(service_name):
+                live = policy.live
+        return live
+
+    def get_retention_policy(self, project_name: str) -> t.Optional[DocoBackupRetentionPolicy]:
+        """Get the retention policy of a project (the last matching policy wins)."""
+        policy = None
+        for retention_policy in self.retention:
+            if retention_policy.project_pattern.search(project_name):
+                policy = retention_policy
+        return policy
+
+
+class DocoProjectDependency(pydantic.BaseModel):
+    project: str
+    requires: list[str]
+
+
+class DocoProjectsConfig(pydantic.BaseModel):
+    depends_on: list[DocoProjectDependency] = []
 
 
 class DocoConfig(pydantic.BaseModel):
     output: DocoOutputConfig = DocoOutputConfig()
     backup: DocoBackupConfig = DocoBackupConfig()
+    projects: DocoProjectsConfig = DocoProjectsConfig()
 
 
 def _load_config_from_filesystem(project_path: str) -> t.Optional[DocoConfig]:
@@ -89,6 +145,23 @@ def _load_backup_rsync_config_from_env(config: RsyncConfig) -> None:
     args = os.environ.get(f"{prefix}ARGS")
     config.args = shlex.split(args) if args is not None else config.args
 
+    multiplex_ssh = os.environ.get(f"{prefix}MULTIPLEX_SSH")
+    if multiplex_ssh is not None:
+        config.multiplex_ssh = multiplex_ssh.lower() in ("1", "true", "yes")
+
+    nice = os.environ.get(f"{prefix}NICE")
+    if nice is not None:
+        config.nice = nice.lower() in ("1", "true", "yes")
+
+    retries = os.environ.get(f"{prefix}RETRIES")
+    config.retries = int(retries) if retries is not None else config.retries
+
+    retry_delay = os.environ.get(f"{prefix}RETRY_DELAY")
+    config.retry_delay = float(retry_delay) if retry_delay is not None else config.retry_delay
+
+    list_cache_ttl = os.environ.get(f"{prefix}LIST_CACHE_TTL")
+    config.list_cache_ttl = float(list_cache_ttl) if list_cache_ttl is not None else config.list_cache_ttl
+
 
 def load_doco_config(project_path: str) -> DocoConfig:
     config = _load_config_from_filesystem(project_path)
@@ -0,0 +1,136 @@
+"""Capture the output of threads
+
+Used to run tasks printing to stdout in threads (e.g. backups of multiple projects at once)
+and to print their output in one piece when they are finished.
+While a thread captures its output, everything written to `sys.stdout` (e.g. by the rich console)
+from this thread goes to its buffer; other threads are not affected.
+Subprocesses write to the file descriptor directly, use `run_cmd` to capture their output as well.
+"""
+import codecs
+import contextlib
+import io
+import os
+import re
+import subprocess
+import sys
+import threading
+import typing as t
+
+from src.utils.runner import OutputCallback
+
+_thread_local = threading.local()
+_LINE_SEPARATOR_REGEX = re.compile(r"[\r\n]")
+_lock = threading.Lock()
+_capturing_threads: set[int] = set()
+
+
+class _ThreadStdout(io.TextIOBase):
+    def __init__(self, stdout: t.TextIO):
+        super().__init__()
+        self.stdout = stdout
+
+    def _target(self) -> t.TextIO:
+        buffer = getattr(_thread_local, "buffer", None)
+        return buffer if buffer is not None else self.stdout
+
+    @property
+    def encoding(self):  # type: ignore
+        return self.stdout.encoding
+
+    def write(self, s: str) -> int:  # type: ignore
+        return self._target().write(s)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def isatty(self) -> bool:
+        # Keep the terminal features (like colors) of the real stdout the output is printed to later.
+        return self.stdout.isatty()
+
+    def fileno(self) -> int:
+        return self.stdout.fileno()
+
+
+def is_output_captured() -> bool:
+    return getattr(_thread_local, "buffer", None) is not None
+
+
+@contextlib.contextmanager
+def capture_thread_output() -> t.Iterator[io.StringIO]:
+    """Capture everything the current thread writes to `sys.stdout` (see module docstring)."""
+    buffer = io.StringIO()
+    with _lock:
+        if len(_capturing_threads) == 0:
+            sys.stdout = _ThreadStdout(sys.stdout)
+        _capturing_threads.add(threading.get_ident())
+    _thread_local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _thread_local.buffer = None
+        with _lock:
+            _capturing_threads.discard(threading.get_ident())
+            if len(_capturing_threads) == 0 and isinstance(sys.stdout, _ThreadStdout):
+                sys.stdout = sys.stdout.stdout
+
+
+def run_cmd(cmd: list[str], cwd: t.Optional[str] = None) -> None:
+    """Like `subprocess.run(cmd, cwd=cwd, check=True)`, but respects `capture_thread_output`.
+
+    If the output is captured, stderr is merged into it (so `CalledProcessError.stderr` is None).
+    """
+    if not is_output_captured():
+        subprocess.run(cmd, cwd=cwd, check=True)
+        return
+    result = subprocess.run(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        check=False,
+    )
+    # Decoded manually, universal newlines mode would turn carriage returns (of progress output) into newlines
+    output = result.stdout.decode("utf-8", errors="replace")
+    sys.stdout.write(output)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, cmd, output=output)
+
+
+def run_cmd_tee(
+    cmd: list[str], cwd: t.Optional[str] = None, output_callback: t.Optional[OutputCallback] = None
+) -> str:
+    """Like `run_cmd`, but also returns the output (stdout) while it is printed.
+
+    :param output_callback: Called with each line of output instead of printing it
+        (lines are split at both `\\n` and `\\r`, rsync uses the latter for progress updates)
+    :raises subprocess.CalledProcessError: with the output
+    """
+    captured = is_output_captured()
+    with subprocess.Popen(
+        cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT if captured else None
+    ) as process:
+        assert process.stdout is not None
+        # Decoded incrementally, universal newlines mode would turn carriage returns into newlines
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        chunks: list[str] = []
+        pending = ""
+        while True:
+            data = os.read(process.stdout.fileno(), 64 * 1024)
+            text = decoder.decode(data, final=not data)
+            chunks.append(text)
+            if output_callback is not None:
+                *lines, pending = _LINE_SEPARATOR_REGEX.split(pending + text)
+                for line in lines:
+                    output_callback(line)
+            else:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            if not data:
+                break
+        if output_callback is not None and pending != "":
+            output_callback(pending)
+        returncode = process.wait()
+    output = "".join(chunks)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=output)
+    return output
@@ -0,0 +1,98 @@
+import contextlib
+import threading
+import typing as t
+
+import rich.progress
+
+from src.utils.console import console
+from src.utils.output import is_output_captured
+from src.utils.rich import Formatted
+from src.utils.rsync import parse_rsync_progress
+from src.utils.runner import OutputCallback
+
+
+class RsyncProgressDisplay:
+    """Show the progress of multiple rsync transfers and their total progress in one display.
+
+    The progress is parsed from the output of rsync (see `--info=progress2`),
+    use `output_callback` to get the callback for the output of a transfer.
+    As rsync only reports a percentage, the size of a transfer is estimated from it.
+    """
+
+    def __init__(self):
+        self.progress = rich.progress.Progress(
+            rich.progress.TextColumn("{task.description}"),
+            rich.progress.BarColumn(),
+            rich.progress.TaskProgressColumn(),
+            rich.progress.DownloadColumn(),
+            rich.progress.TransferSpeedColumn(),
+            rich.progress.TimeRemainingColumn(),
+            console=console,
+        )
+        self._lock = threading.Lock()
+        self._tasks: dict[str, rich.progress.TaskID] = {}
+        self._finished: set[str] = set()
+        self._total_task = self.progress.add_task("", total=None)
+        self._update_total()
+
+    def _get_task(self, name: str) -> rich.progress.TaskID:
+        with self._lock:
+            if name not in self._tasks:
+                self._tasks[name] = self.progress.add_task(str(Formatted(name)), total=None)
+                self._update_total()
+            return self._tasks[name]
+
+    def _update_total(self) -> None:
+        # Transfers which did not report any progress yet are not included in the total size.
+        tasks = [self.progress.tasks[task_id] for task_id in self._tasks.values()]
+        totals = [task.total for task in tasks if task.total is not None]
+        self.progress.update(
+            self._total_task,
+            description=f"[b]Total[/] [dim]({len(self._finished)}/{len(tasks)} finished)[/]",
+            completed=sum(task.completed for task in tasks),
+            total=sum(totals) if len(totals) > 0 else None,
+        )
+
+    def output_callback(self, name: str, print_output: bool = True) -> OutputCallback:
+        """Get the callback to pass the output of the transfer with the given name to.
+
+        :param print_output: Print lines which are no progress updates (above the display)
+        """
+        task_id = self._get_task(name)
+
+        def callback(line: str) -> None:
+            update = parse_rsync_progress(line)
+            if update is None:
+                if print_output and line.strip() != "":
+                    console.print(line, markup=False, highlight=False, soft_wrap=True)
+                return
+            transferred, percent = update
+            with self._lock:
+                self.progress.update(
+                    task_id, completed=transferred, total=transferred * 100 / percent if percent > 0 else None
+                )
+                self._update_total()
+
+        return callback
+
+    def finish(self, name: str) -> None:
+        task_id = self._get_task(name)
+        with self._lock:
+            task = self.progress.tasks[task_id]
+            self.progress.update(task_id, total=task.completed)
+            self._finished.add(name)
+            self._update_total()
+
+
+@contextlib.contextmanager
+def rsync_progress_display(enabled: bool) -> t.Iterator[t.Optional[RsyncProgressDisplay]]:
+    """Show a `RsyncProgressDisplay` while in the context, if enabled.
+
+    The display is not shown if the output is captured (see `capture_thread_output`).
+    """
+    if not enabled or is_output_captured():
+        yield None
+        return
+    display = RsyncProgressDisplay()
+    with display.progress:
+        yield display
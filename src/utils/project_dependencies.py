@@ -0,0 +1,90 @@
+"""Dependencies between compose projects
+
+A project requires another project if
+- the doco config says so (`[[projects.depends_on]]`), or
+- it uses an external network or volume which the other project defines.
+
+Dependencies are given as list of sets of indices (into the list of projects),
+so projects sharing a name (e.g. with different profiles) are distinguished.
+"""
+import typing as t
+
+from src.utils.compose_rich import ComposeProject
+from src.utils.exceptions_rich import DocoError
+from src.utils.rich import Formatted
+
+Dependencies = list[t.Set[int]]
+
+
+def _resource_names(project: ComposeProject, kind: str, external: bool) -> t.Set[str]:
+    return {
+        resource.get("name", f"{project.config['name']}_{key}")
+        for key, resource in (project.config.get(kind) or {}).items()
+        if bool((resource or {}).get("external", False)) == external
+    }
+
+
+def get_project_dependencies(projects: list[ComposeProject]) -> Dependencies:
+    """
+    :return: Indices of the required projects for each project
+    """
+    indices_by_name: dict[str, t.Set[int]] = {}
+    indices_by_resource: dict[tuple[str, str], t.Set[int]] = {}
+    for index, project in enumerate(projects):
+        indices_by_name.setdefault(project.config["name"], set()).add(index)
+        for kind in ("networks", "volumes"):
+            for name in _resource_names(project, kind, external=False):
+                indices_by_resource.setdefault((kind, name), set()).add(index)
+
+    configured_requirements: dict[str, t.Set[str]] = {}
+    for project in projects:
+        for dependency in project.doco_config.projects.depends_on:
+            configured_requirements.setdefault(dependency.project, set()).update(dependency.requires)
+
+    dependencies: Dependencies = []
+    for index, project in enumerate(projects):
+        required: t.Set[int] = set()
+        for name in configured_requirements.get(project.config["name"], set()):
+            required.update(indices_by_name.get(name, set()))
+        for kind in ("networks", "volumes"):
+            for name in _resource_names(project, kind, external=True):
+                required.update(indices_by_resource.get((kind, name), set()))
+        required.discard(index)
+        dependencies.append(required)
+    return dependencies
+
+
+def reverse_dependencies(dependencies: Dependencies) -> Dependencies:
+    """Turn "requires" into "is required by", e.g. to shut down dependent projects first."""
+    reversed_dependencies: Dependencies = [set() for _ in dependencies]
+    for index, required in enumerate(dependencies):
+        for required_index in required:
+            reversed_dependencies[required_index].add(index)
+    return reversed_dependencies
+
+
+def get_project_waves(projects: list[ComposeProject], dependencies: Dependencies) -> list[list[int]]:
+    """Group the projects into waves, each only requiring projects of previous waves.
+
+    :return: Indices of the projects per wave
+    """
+    remaining = {index: set(required) for index, required in enumerate(dependencies)}
+    waves: list[list[int]] = []
+    while remaining:
+        wave = sorted(index for index, required in remaining.items() if not required)
+        if not wave:
+            names = ", ".join(
+                f"[b]{Formatted(projects[index].config['name'])}[/]" for index in sorted(remaining)
+            )
+            raise DocoError(f"Cyclic dependencies between the projects: {names}", formatted=True)
+        for index in wave:
+            del remaining[index]
+        for required in remaining.values():
+            required.difference_update(wave)
+        waves.append(wave)
+    return waves
+
+
+def sort_projects(projects: list[ComposeProject], dependencies: Dependencies) -> list[ComposeProject]:
+    """Sort the projects so that each one comes after the projects it requires."""
+    return [projects[index] for wave in get_project_waves(projects, dependencies) for index in wave]
@@ -3,13 +3,14 @@ import os
 import subprocess
 import typing as t
 
+from src.utils.backup_catalog import list_catalog_backups
+from src.utils.backup_catalog import sort_backups
 from src.utils.common import print_cmd
 from src.utils.common import PrintCmdCallable
 from src.utils.common import relative_path
 from src.utils.common import relative_path_if_below
 from src.utils.rich import RichAbortCmd
 from src.utils.rsync import RsyncConfig
-from src.utils.rsync import run_rsync_list
 
 
 @dataclasses.dataclass
@@ -69,23 +70,23 @@ def get_backup_directory(
     backup_id: str,
     show_progress: bool,
     verbose: bool,
+    use_cache: bool = True,
     print_cmd_callback: PrintCmdCallable = print_cmd,
 ) -> str:
+    """
+    :param use_cache: Use the cached listing of backups to resolve an index (see `backup_catalog`)
+    """
     if backup_id.isnumeric():
         try:
-            _, date_file_tuples = run_rsync_list(
+            entries = list_catalog_backups(
                 rsync_config,
-                target=f"{project_name}/",
+                project_name,
                 show_progress=show_progress,
                 verbose=verbose,
-                dry_run=False,
+                use_cache=use_cache,
                 print_cmd_callback=print_cmd_callback,
             )
         except subprocess.CalledProcessError as e:
             raise RichAbortCmd(e) from e
-        files = [
-            item[1]
-            for item in sorted(date_file_tuples, key=lambda item: (item[1] == "backup", item[0]), reverse=True)
-        ]
-        return files[int(backup_id)]
+        return sort_backups(entries)[int(backup_id)].name
     return backup_id
@@ -9,6 +9,9 @@ import rich.panel
 import rich.tree
 
 from src.utils.backup import BACKUP_CONFIG_JSON
+from src.utils.backup_catalog import list_catalog_backups
+from src.utils.backup_catalog import list_catalog_projects
+from src.utils.backup_catalog import sort_backups
 from src.utils.common import PrintCmdData
 from src.utils.doco_config import DocoBackupRestoreStructureConfig
 from src.utils.doco_config import DocoConfig
@@ -16,40 +19,41 @@ from src.utils.restore import RestoreJob
 from src.utils.rich import Formatted
 from src.utils.rich import rich_print_cmd
 from src.utils.rich import rich_print_conditional_cmds
+from src.utils.rich import rich_print_retry
 from src.utils.rich import RichAbortCmd
 from src.utils.rsync import RsyncConfig
 from src.utils.rsync import run_rsync_download_incremental
-from src.utils.rsync import run_rsync_list
 from src.utils.system import chown_given_strings
 
 
-def list_projects(doco_config: DocoConfig, *, show_progress: bool, verbose: bool):
+def list_projects(doco_config: DocoConfig, *, show_progress: bool, verbose: bool, use_cache: bool = True):
     try:
-        _, date_file_tuples = run_rsync_list(
+        entries = list_catalog_projects(
             doco_config.backup.rsync,
-            target="",
             show_progress=show_progress,
             verbose=verbose,
-            dry_run=False,
+            use_cache=use_cache,
             print_cmd_callback=rich_print_cmd,
         )
     except subprocess.CalledProcessError as e:
         raise RichAbortCmd(e) from e
     tree = rich.tree.Tree(f"[b]{Formatted(doco_config.backup.rsync.root or '/')}[/]")
-    files = sorted([item[1] for item in date_file_tuples])
+    files = sorted([entry.name for entry in entries])
     for file in files:
         tree.add(f"[yellow]{Formatted(file)}[/]")
     rich.print(tree)
 
 
-def list_backups(project_name: str, doco_config: DocoConfig, *, show_progress: bool, verbose: bool):
+def list_backups(
+    project_name: str, doco_config: DocoConfig, *, show_progress: bool, verbose: bool, use_cache: bool = True
+):
     try:
-        _, date_file_tuples = run_rsync_list(
+        entries = list_catalog_backups(
             doco_config.backup.rsync,
-            target=f"{project_name}/",
+            project_name,
             show_progress=show_progress,
             verbose=verbose,
-            dry_run=False,
+            use_cache=use_cache,
             print_cmd_callback=rich_print_cmd,
         )
     except subprocess.CalledProcessError as e:
@@ -57,12 +61,8 @@ def list_backups(project_name: str, doco_config: DocoConfig, *, show_progress: b
     tree = rich.tree.Tree(
         f"[dim]{Formatted(doco_config.backup.rsync.root)}/[/][b]{Formatted(project_name)}[/]"
     )
-    files = [
-        item[1]
-        for item in sorted(date_file_tuples, key=lambda item: (item[1] == "backup", item[0]), reverse=True)
-    ]
-    for i, file in enumerate(files):
-        tree.add(f"[yellow]{i}[/][dim]:[/] {Formatted(file)}")
+    for i, entry in enumerate(sort_backups(entries)):
+        tree.add(f"[yellow]{i}[/][dim]:[/] {Formatted(entry.name)}")
     rich.print(tree)
 
 
@@ -86,6 +86,7 @@ def do_restore_job(  # noqa: CFQ002 (max arguments)
             verbose=verbose,
             dry_run=dry_run,
             print_cmd_callback=rich_print_cmd,
+            retry_callback=rich_print_retry,
         )
     except subprocess.CalledProcessError as e:
         raise RichAbortCmd(e) from e
@@ -0,0 +1,54 @@
+"""Select the backups to keep according to a retention policy
+
+Backups are thinned out grandfather-father-son style (like `restic forget` or `borg prune`):
+Besides the `keep_last` most recent backups, the most recent backup of each of
+the last `keep_daily` days, `keep_weekly` weeks, `keep_monthly` months and `keep_yearly` years
+(which have backups) is kept.
+Only backups named like the ones doco creates (`backup-YYYY-MM-DD_HH.MM`) are subject to pruning.
+"""
+import datetime
+import re
+import typing as t
+
+from src.utils.doco_config import DocoBackupRetentionPolicy
+
+_BACKUP_NAME_REGEX = re.compile(r"^backup-(?P<date>\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})$")
+
+
+def parse_backup_date(name: str) -> t.Optional[datetime.datetime]:
+    """Get the creation date of a backup from its name (see `doco backups create`)."""
+    match = _BACKUP_NAME_REGEX.match(name)
+    if match is None:
+        return None
+    try:
+        return datetime.datetime.strptime(match.group("date"), "%Y-%m-%d_%H.%M")
+    except ValueError:
+        return None
+
+
+def select_backups_to_keep(
+    backups: list[tuple[str, datetime.datetime]], policy: DocoBackupRetentionPolicy
+) -> dict[str, list[str]]:
+    """
+    :param backups: Tuples of name and creation date
+    :return: Names of the backups to keep with the reasons to keep them (e.g. `daily`)
+    """
+    keep: dict[str, list[str]] = {}
+    newest_first = sorted(backups, key=lambda backup: backup[1], reverse=True)
+    rules: list[tuple[str, int, t.Callable[[datetime.datetime], t.Hashable]]] = [
+        ("last", policy.keep_last, lambda date: date),
+        ("daily", policy.keep_daily, lambda date: date.date()),
+        ("weekly", policy.keep_weekly, lambda date: date.isocalendar()[:2]),
+        ("monthly", policy.keep_monthly, lambda date: (date.year, date.month)),
+        ("yearly", policy.keep_yearly, lambda date: date.year),
+    ]
+    for reason, count, get_period in rules:
+        periods: set[t.Hashable] = set()
+        for name, date in newest_first:
+            if len(periods) >= count:
+                break
+            period = get_period(date)
+            if period not in periods:
+                periods.add(period)
+                keep.setdefault(name, []).append(reason)
+    return keep
@@ -58,6 +58,10 @@ def format_cmd_line(cmd: list[str]) -> Formatted:
     return Formatted(cmdline, True)
 
 
+def rich_print_retry(message: str) -> None:
+    console.print(f"[yellow]{Formatted(message)}[/]")
+
+
 def rich_print_cmd(
     cmd: list[str],
     cwd: t.Optional[str] = None,
@@ -120,6 +124,14 @@ def rich_print_conditional_cmds(cmds: list[PrintCmdData]):
         rich_print_cmd([], header=False, body=False)
 
 
+def format_bytes(value: float) -> str:
+    for unit in ("B", "kB", "MB", "GB"):
+        if value < 1000:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1000
+    return f"{value:.1f} TB"
+
+
 def format_not_existing(text: t.Union[str, Formatted]) -> Formatted:
     text = Formatted(text)
     return Formatted(f"[red][b]{text}[/] [dim](not existing)[/][/]", True)
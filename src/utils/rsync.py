@@ -1,11 +1,29 @@
+import asyncio
 import re
+import shutil
 import subprocess
+import time
 import typing as t
 
 import pydantic
 
 from src.utils.common import print_cmd
 from src.utils.common import PrintCmdCallable
+from src.utils.output import run_cmd
+from src.utils.output import run_cmd_tee
+from src.utils.runner import OutputCallback
+from src.utils.runner import ProcessRunner
+from src.utils.ssh import ssh_multiplexer
+
+
+# Exit codes of rsync for errors which may go away when trying again: 10 (socket I/O),
+# 12 (protocol data stream), 30 (timeout), 35 (daemon connection timeout)
+# (23, partial transfer, is not retried: it is mostly caused by errors which persist, like missing permissions)
+RSYNC_TRANSIENT_EXIT_CODES = (10, 12, 30, 35)
+# Partially transferred files are kept there (relative to the destination directory) to resume the transfer.
+RSYNC_PARTIAL_DIR = ".rsync-partial"
+
+T = t.TypeVar("T")
 
 
 class RsyncFilterRule(pydantic.BaseModel):
@@ -22,12 +40,99 @@ class RsyncConfig(pydantic.BaseModel):
     rsh: str = ""  # deprecated
     args: list[str] = []
     filter: list[RsyncFilterRule] = []
+    multiplex_ssh: bool = True
+    nice: bool = False
+    retries: int = 3
+    retry_delay: float = 10.0
+    list_cache_ttl: float = 300.0
 
     def is_complete(self):
         return self.host != ""
 
 
+def get_filter_rules(config: RsyncConfig, project_for_filter: str, path_for_filter: str) -> list[str]:
+    return [
+        filter_rule
+        for filter_ in config.filter
+        if filter_.project_pattern.search(project_for_filter) and filter_.path_pattern.search(path_for_filter)
+        for filter_rule in filter_.filter
+    ]
+
+
+_SCOPABLE_FILTER_RULE_REGEX = re.compile(
+    r"^(?P<rule>[-+PRHS]|include|exclude|protect|risk|hide|show)(?P<modifiers>,?[sr]*)[ _](?P<pattern>.+)$"
+)
+
+
+def scope_filter_rule(filter_rule: str, prefix: str) -> t.Optional[list[str]]:
+    """Rewrite a filter rule to only apply below the given directory of the transfer.
+
+    :return: None for rules that cannot be rewritten (e.g. merge rules or modifiers like `!` and `/`)
+    """
+    match = _SCOPABLE_FILTER_RULE_REGEX.match(filter_rule)
+    if match is None:
+        return None
+    rule = match.group("rule") + match.group("modifiers")
+    pattern = match.group("pattern")
+    prefix = "/" + prefix.strip("/")
+    if pattern.startswith("/"):
+        return [f"{rule} {prefix}{pattern}"]
+    # Unanchored patterns match at any depth.
+    return [f"{rule} {prefix}/{pattern}", f"{rule} {prefix}/**/{pattern}"]
+
+
+_BWLIMIT_REGEX = re.compile(r"^(?P<rate>\d+(\.\d+)?)(?P<unit>[KMG]?)$", re.IGNORECASE)
+_BWLIMIT_UNITS = {"": 1, "K": 1, "M": 1024, "G": 1024 * 1024}
+
+
+def split_bwlimit(bwlimit: str, parts: int) -> str:
+    """Split a total bandwidth limit evenly between rsync processes running at the same time.
+
+    :param bwlimit: Rate like for rsync's `--bwlimit` (KiB/s or with suffix K, M or G)
+    :return: Rate per process in KiB/s (at least 1, as 0 means unlimited for rsync)
+    """
+    match = _BWLIMIT_REGEX.match(bwlimit.strip())
+    if match is None:
+        raise ValueError(f"Invalid bandwidth limit: {bwlimit!r}")
+    rate = float(match.group("rate")) * _BWLIMIT_UNITS[match.group("unit").upper()]
+    return str(max(1, int(rate / max(1, parts))))
+
+
+def _rsync_command(config: RsyncConfig) -> list[str]:
+    if not config.nice:
+        return ["rsync"]
+    # Lowest CPU priority and (if available) idle IO scheduling class
+    ionice = ["ionice", "-c", "3"] if shutil.which("ionice") is not None else []
+    return ["nice", "-n", "19", *ionice, "rsync"]
+
+
+def _pop_rsh_arg(args: list[str]) -> tuple[t.Optional[str], list[str]]:
+    """Extract the remote shell (the last `-e` / `--rsh` option, like rsync does) from rsync args.
+
+    :return: Tuple of remote shell and remaining args
+    """
+    rsh: t.Optional[str] = None
+    remaining_args: list[str] = []
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg in ("-e", "--rsh") and index + 1 < len(args):
+            rsh = args[index + 1]
+            index += 2
+            continue
+        if arg.startswith("--rsh="):
+            rsh = arg[len("--rsh=") :]
+        elif arg == "--":
+            remaining_args.extend(args[index:])
+            break
+        else:
+            remaining_args.append(arg)
+        index += 1
+    return rsh, remaining_args
+
+
 class RsyncBaseOptions:
+    command: list[str]
     host: str
     module: t.Optional[str]
     root: str
@@ -40,6 +145,7 @@ class RsyncBaseOptions:
         if not config.is_complete():
             raise Exception("You need to configure rsync.")
 
+        self.command = _rsync_command(config)
         self.host = (config.user + "@" if config.user != "" else "") + config.host
         self.module = config.module if config.module != "" else None
         self.root = config.root
@@ -49,8 +155,14 @@ class RsyncBaseOptions:
         if self.root not in ("", "/") and not self.root.endswith("/"):
             self.root += "/"
 
-        ssh_args = ["-e", config.rsh] if config.rsh != "" else []
-        self.args = [*ssh_args, *config.args]
+        rsh, args = _pop_rsh_arg(config.args)
+        if rsh is None and config.rsh != "":
+            rsh = config.rsh
+        # ssh is used if a remote shell is given or if not connecting to an rsync daemon
+        if config.multiplex_ssh and (rsh is not None or self.module is None):
+            rsh = ssh_multiplexer.wrap_rsh(rsh, self.host) or rsh
+        ssh_args = ["-e", rsh] if rsh is not None else []
+        self.args = [*ssh_args, *args]
 
     def path(self):
         prefix = ":" + self.module if self.module is not None else ""
@@ -67,6 +179,7 @@ class RsyncBackupOptions(RsyncBaseOptions):
         delete_from_destination: bool,
         show_progress: bool,
         verbose: bool,
+        stats: bool = False,
         compress: bool = True,
         cross_filesystem_boundaries: bool = True,
         preserve_creation_times: bool = False,  # supported only on OS X apparently
@@ -80,9 +193,11 @@ class RsyncBackupOptions(RsyncBaseOptions):
         super().__init__(config)
 
         info_args = [
-            "-h",
+            # The statistics are parsed, so they must not be human-readable (i.e. rounded)
+            "--no-h" if stats else "-h",
             *(["--info=progress2"] if show_progress else []),
             *(["-v"] if verbose else []),
+            *(["--stats"] if stats else []),
         ]
         backup_args = [
             *(["--delete"] if delete_from_destination else []),
@@ -101,14 +216,8 @@ class RsyncBackupOptions(RsyncBaseOptions):
             *(["-x"] if not cross_filesystem_boundaries else []),
         ]
         filter_args = []
-        for filter_ in [
-            filter_
-            for filter_ in config.filter
-            if filter_.project_pattern.search(project_for_filter)
-            and filter_.path_pattern.search(path_for_filter)
-        ]:
-            for filter_rule in filter_.filter:
-                filter_args.extend(["-f", filter_rule])
+        for filter_rule in get_filter_rules(config, project_for_filter, path_for_filter):
+            filter_args.extend(["-f", filter_rule])
         self.args.extend([*info_args, *backup_args, *archive_args, *filter_args])
 
 
@@ -133,15 +242,13 @@ class RsyncListOptions(RsyncBaseOptions):
         self.args.extend([*info_args, *list_args])
 
 
-def run_rsync_without_delete(  # noqa: CFQ002 (max arguments)
+def rsync_without_delete_cmd(
     config: RsyncConfig,
     source: str,
     destination: str,
     project_for_filter: str,
     show_progress: bool,
     verbose: bool,
-    dry_run: bool = False,
-    print_cmd_callback: PrintCmdCallable = print_cmd,
 ) -> list[str]:
     opt = RsyncBackupOptions(
         config=config,
@@ -151,20 +258,16 @@ def run_rsync_without_delete(  # noqa: CFQ002 (max arguments)
         show_progress=show_progress,
         verbose=verbose,
     )
-    cmd = [
-        "rsync",
+    return [
+        *opt.command,
         *opt.args,
         "--",
         source,
         f"{opt.path()}{destination}",
     ]
-    if not dry_run:
-        print_cmd_callback(cmd=cmd)
-        subprocess.run(cmd, check=True)
-    return cmd
 
 
-def run_rsync_backup_incremental(  # noqa: CFQ002 (max arguments)
+def rsync_backup_incremental_cmd(  # noqa: CFQ002 (max arguments)
     config: RsyncConfig,
     source: str,
     destination: str,
@@ -172,8 +275,6 @@ def run_rsync_backup_incremental(  # noqa: CFQ002 (max arguments)
     project_for_filter: str,
     show_progress: bool,
     verbose: bool,
-    dry_run: bool = False,
-    print_cmd_callback: PrintCmdCallable = print_cmd,
 ) -> list[str]:
     opt = RsyncBackupOptions(
         config=config,
@@ -183,8 +284,8 @@ def run_rsync_backup_incremental(  # noqa: CFQ002 (max arguments)
         show_progress=show_progress,
         verbose=verbose,
     )
-    cmd = [
-        "rsync",
+    return [
+        *opt.command,
         *opt.args,
         "--backup-dir",
         f"{opt.root}{backup_dir}",
@@ -192,13 +293,9 @@ def run_rsync_backup_incremental(  # noqa: CFQ002 (max arguments)
         source,
         f"{opt.path()}{destination}",
     ]
-    if not dry_run:
-        print_cmd_callback(cmd=cmd)
-        subprocess.run(cmd, check=True)
-    return cmd
 
 
-def run_rsync_backup_with_hardlinks(  # noqa: CFQ002 (max arguments)
+def rsync_backup_with_hardlinks_cmd(  # noqa: CFQ002 (max arguments)
     config: RsyncConfig,
     source: str,
     new_backup: str,
@@ -206,33 +303,68 @@ def run_rsync_backup_with_hardlinks(  # noqa: CFQ002 (max arguments)
     project_for_filter: str,
     show_progress: bool,
     verbose: bool,
-    dry_run: bool = False,
-    print_cmd_callback: PrintCmdCallable = print_cmd,
+    path_for_filter: t.Optional[str] = None,
+    stats: bool = False,
 ) -> list[str]:
     opt = RsyncBackupOptions(
         config=config,
         project_for_filter=project_for_filter,
-        path_for_filter=source,
+        path_for_filter=path_for_filter if path_for_filter is not None else source,
         delete_from_destination=True,
         show_progress=show_progress,
         verbose=verbose,
+        stats=stats,
     )
+    opt.args.append(f"--partial-dir={RSYNC_PARTIAL_DIR}")
     for old_backup_dir in old_backup_dirs:
         opt.args.extend(["--link-dest", f"{opt.root}{old_backup_dir}"])
-    cmd = [
-        "rsync",
+    return [
+        *opt.command,
         *opt.args,
         "--",
         source,
         f"{opt.path()}{new_backup}",
     ]
-    if not dry_run:
-        print_cmd_callback(cmd=cmd)
-        subprocess.run(cmd, check=True)
-    return cmd
 
 
-def run_rsync_download_incremental(  # noqa: CFQ002 (max arguments)
+def rsync_backup_relative_cmd(  # noqa: CFQ002 (max arguments)
+    config: RsyncConfig,
+    sources: list[str],
+    new_backup: str,
+    old_backup_dirs: list[str],
+    filter_rules: list[str],
+    show_progress: bool,
+    verbose: bool,
+    stats: bool = False,
+) -> list[str]:
+    """Back up multiple sources at once, using their relative paths (see `--relative`) below `new_backup`.
+
+    The configured filters are not applied, give the (scoped) rules in `filter_rules` instead.
+    """
+    opt = RsyncBackupOptions(
+        config=config.model_copy(update={"filter": []}),
+        project_for_filter="",
+        path_for_filter="",
+        delete_from_destination=True,
+        show_progress=show_progress,
+        verbose=verbose,
+        stats=stats,
+    )
+    opt.args.extend(["--relative", f"--partial-dir={RSYNC_PARTIAL_DIR}"])
+    for filter_rule in filter_rules:
+        opt.args.extend(["-f", filter_rule])
+    for old_backup_dir in old_backup_dirs:
+        opt.args.extend(["--link-dest", f"{opt.root}{old_backup_dir}"])
+    return [
+        *opt.command,
+        *opt.args,
+        "--",
+        *sources,
+        f"{opt.path()}{new_backup}",
+    ]
+
+
+def rsync_download_incremental_cmd(  # noqa: CFQ002 (max arguments)
     config: RsyncConfig,
     source: str,
     destination: str,
@@ -240,8 +372,6 @@ def run_rsync_download_incremental(  # noqa: CFQ002 (max arguments)
     show_progress: bool,
     verbose: bool,
     delete_from_destination: bool = True,
-    dry_run: bool = False,
-    print_cmd_callback: PrintCmdCallable = print_cmd,
     extra_args: t.Union[list[str], None] = None,
 ) -> list[str]:
     opt = RsyncBackupOptions(
@@ -252,20 +382,456 @@ def run_rsync_download_incremental(  # noqa: CFQ002 (max arguments)
         show_progress=show_progress,
         verbose=verbose,
     )
-    cmd = [
-        "rsync",
+    return [
+        *opt.command,
         *opt.args,
         *(extra_args or []),
         "--",
         f"{opt.path()}{source}",
         destination,
     ]
+
+
+def rsync_list_cmd(
+    config: RsyncConfig,
+    target: str,
+    show_progress: bool,
+    verbose: bool,
+    extra_args: t.Optional[list[str]] = None,
+) -> list[str]:
+    opt = RsyncListOptions(config=config, show_progress=show_progress, verbose=verbose)
+    return [
+        *opt.command,
+        *opt.args,
+        *(extra_args or []),
+        "--",
+        f"{opt.path()}{target}",
+    ]
+
+
+def rsync_delete_cmd(
+    config: RsyncConfig,
+    empty_dir: str,
+    target: str,
+    names: list[str],
+    verbose: bool,
+) -> list[str]:
+    """Delete the given entries of `target` (files or directories with all their contents) in a single pass.
+
+    An empty local directory is synced to `target` with `--delete`,
+    all entries not given are protected from deletion by filter rules.
+    """
+    opt = RsyncBaseOptions(config)
+    filter_args: list[str] = []
+    for name in names:
+        # "/name/***" only matches directories (and their contents)
+        filter_args.extend(["-f", f"+ /{name}", "-f", f"+ /{name}/***"])
+    return [
+        *opt.command,
+        *opt.args,
+        "-r",
+        "--delete",
+        *(["-v"] if verbose else []),
+        *filter_args,
+        "-f",
+        "- *",
+        "--",
+        empty_dir.rstrip("/") + "/",
+        f"{opt.path()}{target}",
+    ]
+
+
+def rsync_list_local_cmd(
+    config: RsyncConfig,
+    source: str,
+    project_for_filter: str,
+    path_for_filter: str,
+) -> list[str]:
+    """List a local source recursively like it is backed up (with the same filter rules)."""
+    filter_args: list[str] = []
+    for filter_rule in get_filter_rules(config, project_for_filter, path_for_filter):
+        filter_args.extend(["-f", filter_rule])
+    return [*_rsync_command(config), "-r", "--list-only", "--no-h", *filter_args, "--", source]
+
+
+class RsyncStats(pydantic.BaseModel):
+    """Transfer statistics of an rsync call (see `--stats`)."""
+
+    files: int = 0
+    files_transferred: int = 0
+    total_file_size: int = 0
+    total_transferred_file_size: int = 0
+    literal_data: int = 0
+    matched_data: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    speedup: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    def __add__(self, other: "RsyncStats") -> "RsyncStats":
+        """Combine the statistics of multiple transfers of the same source (e.g. with `--pre-sync`)."""
+        summed = RsyncStats(
+            **{
+                name: value + getattr(other, name)
+                for name, value in self.model_dump().items()
+                if name not in ("files", "total_file_size", "speedup")
+            },
+            files=max(self.files, other.files),
+            total_file_size=max(self.total_file_size, other.total_file_size),
+        )
+        transferred = summed.bytes_sent + summed.bytes_received
+        summed.speedup = round(summed.total_file_size / transferred, 2) if transferred > 0 else 0.0
+        return summed
+
+
+_RSYNC_STATS_REGEXES = {
+    "files": re.compile(r"^Number of files: (?P<value>\d+)", re.MULTILINE),
+    "files_transferred": re.compile(
+        r"^Number of (?:regular )?files transferred: (?P<value>\d+)", re.MULTILINE
+    ),
+    "total_file_size": re.compile(r"^Total file size: (?P<value>\d+)", re.MULTILINE),
+    "total_transferred_file_size": re.compile(r"^Total transferred file size: (?P<value>\d+)", re.MULTILINE),
+    "literal_data": re.compile(r"^Literal data: (?P<value>\d+)", re.MULTILINE),
+    "matched_data": re.compile(r"^Matched data: (?P<value>\d+)", re.MULTILINE),
+    "bytes_sent": re.compile(r"^Total bytes sent: (?P<value>\d+)", re.MULTILINE),
+    "bytes_received": re.compile(r"^Total bytes received: (?P<value>\d+)", re.MULTILINE),
+    "speedup": re.compile(r"speedup is (?P<value>\d+[.,]\d+)", re.MULTILINE),
+}
+
+
+def parse_rsync_stats(output: str, elapsed_seconds: float = 0.0) -> t.Optional[RsyncStats]:
+    """Parse the statistics printed by rsync because of `--stats` (together with `--no-h`).
+
+    :return: None if the output contains no statistics
+    """
+    values: dict[str, t.Any] = {}
+    for name, regex in _RSYNC_STATS_REGEXES.items():
+        match = regex.search(output)
+        if match is not None:
+            value = match.group("value")
+            # The decimal separator of the speedup depends on the locale
+            values[name] = float(value.replace(",", ".")) if name == "speedup" else int(value)
+    if len(values) == 0:
+        return None
+    return RsyncStats(**values, elapsed_seconds=round(elapsed_seconds, 3))
+
+
+StatsCallback = t.Callable[[RsyncStats], None]
+
+
+_RSYNC_NUMBER_UNITS = {"": 1, "K": 1000, "M": 1000**2, "G": 1000**3, "T": 1000**4, "P": 1000**5}
+
+
+def _parse_rsync_number(value: str) -> float:
+    # Digit groups are separated by "," (or "." in some locales, then "," is the decimal separator).
+    unit = value[-1] if value[-1] in _RSYNC_NUMBER_UNITS else ""
+    number = value[: len(value) - len(unit)]
+    if re.fullmatch(r"\d{1,3}(\.\d{3})+(,\d+)?", number):
+        number = number.replace(".", "").replace(",", ".")
+    else:
+        number = number.replace(",", "")
+    return float(number) * _RSYNC_NUMBER_UNITS[unit]
+
+
+_RSYNC_PROGRESS_REGEX = re.compile(
+    r"^\s*(?P<bytes>[\d,.]+[KMGTP]?)\s+(?P<percent>\d+)%\s+\S+/s\s+\d+:\d{2}:\d{2}(\s|$)"
+)
+
+
+def parse_rsync_progress(line: str) -> t.Optional[tuple[int, int]]:
+    """Parse a progress update of rsync (see `--info=progress2`).
+
+    :return: Tuple of transferred bytes and percentage or None if the line is no progress update
+    """
+    match = _RSYNC_PROGRESS_REGEX.match(line)
+    if match is None:
+        return None
+    return int(_parse_rsync_number(match.group("bytes"))), int(match.group("percent"))
+
+
+def parse_rsync_list(stdout: str) -> list[tuple[str, str]]:
+    """
+    :return: List of date-file-tuples
+    """
+    date_file_tuples: list[tuple[str, str]] = []
+    # Output contains lines like: drwxr-xr-x          4,096 2022/11/07 18:47:30 backup-2022-11-07_18.47
+    regex = re.compile("[^ ]+ + [^ ]+ +(?P<date>[^ ]+ +[^ ]+) +(?P<file>.*)")
+    for line in stdout.split("\n"):
+        match = regex.match(line)
+        if match and match.group("file") != ".":
+            date_file_tuples.append((match.group("date"), match.group("file")))
+    return date_file_tuples
+
+
+def _get_retry_delay(
+    config: RsyncConfig,
+    error: subprocess.CalledProcessError,
+    attempt: int,
+    retry_callback: t.Optional[OutputCallback],
+) -> t.Optional[float]:
+    """
+    :param attempt: Number of the failed attempt (starting at 0)
+    :return: Seconds to wait before retrying (exponential backoff) or None if not to retry
+    """
+    if error.returncode not in RSYNC_TRANSIENT_EXIT_CODES or attempt >= config.retries:
+        return None
+    delay = config.retry_delay * 2**attempt
+    if retry_callback is not None:
+        retry_callback(
+            f"rsync failed with exit code {error.returncode},"
+            f" retrying in {delay:.0f}s ({attempt + 1}/{config.retries})..."
+        )
+    return delay
+
+
+def run_with_retries(
+    config: RsyncConfig, run: t.Callable[[], T], retry_callback: t.Optional[OutputCallback] = None
+) -> T:
+    """Run an rsync call, retrying it on transient errors (see `RSYNC_TRANSIENT_EXIT_CODES`).
+
+    :param run: Runs rsync, raising `subprocess.CalledProcessError` on failure
+    :param retry_callback: Called with a message before each retry
+    """
+    attempt = 0
+    while True:
+        try:
+            return run()
+        except subprocess.CalledProcessError as e:
+            delay = _get_retry_delay(config, e, attempt, retry_callback)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+
+
+async def run_with_retries_async(
+    config: RsyncConfig,
+    run: t.Callable[[], t.Awaitable[T]],
+    retry_callback: t.Optional[OutputCallback] = None,
+) -> T:
+    """Coroutine version of `run_with_retries`."""
+    attempt = 0
+    while True:
+        try:
+            return await run()
+        except subprocess.CalledProcessError as e:
+            delay = _get_retry_delay(config, e, attempt, retry_callback)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def _run_rsync(
+    config: RsyncConfig,
+    cmd: list[str],
+    dry_run: bool,
+    print_cmd_callback: PrintCmdCallable,
+    retry_callback: t.Optional[OutputCallback],
+) -> list[str]:
     if not dry_run:
         print_cmd_callback(cmd=cmd)
-        subprocess.run(cmd, check=True)
+        run_with_retries(config, lambda: run_cmd(cmd), retry_callback=retry_callback)
     return cmd
 
 
+def _run_rsync_tee(  # noqa: CFQ002 (max arguments)
+    config: RsyncConfig,
+    cmd: list[str],
+    dry_run: bool,
+    print_cmd_callback: PrintCmdCallable,
+    stats_callback: t.Optional[StatsCallback],
+    output_callback: t.Optional[OutputCallback],
+    retry_callback: t.Optional[OutputCallback],
+) -> list[str]:
+    if not dry_run:
+        print_cmd_callback(cmd=cmd)
+        start = time.monotonic()
+        output = run_with_retries(
+            config, lambda: run_cmd_tee(cmd, output_callback=output_callback), retry_callback=retry_callback
+        )
+        stats = parse_rsync_stats(output, elapsed_seconds=time.monotonic() - start)
+        if stats_callback is not None and stats is not None:
+            stats_callback(stats)
+    return cmd
+
+
+async def run_rsync_async(  # noqa: CFQ002 (max arguments)
+    cmd: list[str],
+    *,
+    runner: ProcessRunner,
+    dry_run: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+    capture_output: bool = False,
+    stdout_callback: t.Optional[OutputCallback] = None,
+    timeout: t.Optional[float] = None,
+) -> t.Optional[subprocess.CompletedProcess]:
+    """Coroutine version to run any of the `rsync_*_cmd` commands."""
+    if dry_run:
+        return None
+    print_cmd_callback(cmd=cmd)
+    return await runner.run(
+        cmd, capture_output=capture_output, stdout_callback=stdout_callback, timeout=timeout
+    )
+
+
+async def run_rsync_list_async(
+    config: RsyncConfig,
+    target: str,
+    *,
+    runner: ProcessRunner,
+    dry_run: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """
+    :return: Tuple of cmdline and list of date-file-tuples
+    """
+    cmd = rsync_list_cmd(config, target, show_progress=False, verbose=False)
+    result = await run_rsync_async(
+        cmd, runner=runner, dry_run=dry_run, print_cmd_callback=print_cmd_callback, capture_output=True
+    )
+    return cmd, parse_rsync_list(result.stdout) if result is not None else []
+
+
+def run_rsync_without_delete(  # noqa: CFQ002 (max arguments)
+    config: RsyncConfig,
+    source: str,
+    destination: str,
+    project_for_filter: str,
+    show_progress: bool,
+    verbose: bool,
+    dry_run: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+    retry_callback: t.Optional[OutputCallback] = None,
+) -> list[str]:
+    """
+    :param retry_callback: Called with a message before rsync is run again after a transient error
+    """
+    cmd = rsync_without_delete_cmd(config, source, destination, project_for_filter, show_progress, verbose)
+    return _run_rsync(config, cmd, dry_run, print_cmd_callback, retry_callback)
+
+
+def run_rsync_backup_incremental(  # noqa: CFQ002 (max arguments)
+    config: RsyncConfig,
+    source: str,
+    destination: str,
+    backup_dir: str,
+    project_for_filter: str,
+    show_progress: bool,
+    verbose: bool,
+    dry_run: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+    retry_callback: t.Optional[OutputCallback] = None,
+) -> list[str]:
+    """
+    :param retry_callback: Called with a message before rsync is run again after a transient error
+    """
+    cmd = rsync_backup_incremental_cmd(
+        config, source, destination, backup_dir, project_for_filter, show_progress, verbose
+    )
+    return _run_rsync(config, cmd, dry_run, print_cmd_callback, retry_callback)
+
+
+def run_rsync_backup_with_hardlinks(  # noqa: CFQ002 (max arguments)
+    config: RsyncConfig,
+    source: str,
+    new_backup: str,
+    old_backup_dirs: list[str],
+    project_for_filter: str,
+    show_progress: bool,
+    verbose: bool,
+    dry_run: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+    path_for_filter: t.Optional[str] = None,
+    stats_callback: t.Optional[StatsCallback] = None,
+    output_callback: t.Optional[OutputCallback] = None,
+    retry_callback: t.Optional[OutputCallback] = None,
+) -> list[str]:
+    """
+    :param stats_callback: Called with the transfer statistics (runs rsync with `--stats`)
+    :param output_callback: Called with each line of output instead of printing it
+    :param retry_callback: Called with a message before rsync is run again after a transient error
+    """
+    cmd = rsync_backup_with_hardlinks_cmd(
+        config,
+        source,
+        new_backup,
+        old_backup_dirs,
+        project_for_filter,
+        show_progress,
+        verbose,
+        path_for_filter=path_for_filter,
+        stats=stats_callback is not None,
+    )
+    if stats_callback is not None or output_callback is not None:
+        return _run_rsync_tee(
+            config, cmd, dry_run, print_cmd_callback, stats_callback, output_callback, retry_callback
+        )
+    return _run_rsync(config, cmd, dry_run, print_cmd_callback, retry_callback)
+
+
+def run_rsync_download_incremental(  # noqa: CFQ002 (max arguments)
+    config: RsyncConfig,
+    source: str,
+    destination: str,
+    project_for_filter: str,
+    show_progress: bool,
+    verbose: bool,
+    delete_from_destination: bool = True,
+    dry_run: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+    extra_args: t.Union[list[str], None] = None,
+    retry_callback: t.Optional[OutputCallback] = None,
+) -> list[str]:
+    """
+    :param retry_callback: Called with a message before rsync is run again after a transient error
+    """
+    cmd = rsync_download_incremental_cmd(
+        config,
+        source,
+        destination,
+        project_for_filter,
+        show_progress,
+        verbose,
+        delete_from_destination=delete_from_destination,
+        extra_args=extra_args,
+    )
+    return _run_rsync(config, cmd, dry_run, print_cmd_callback, retry_callback)
+
+
+def run_rsync_delete(  # noqa: CFQ002 (max arguments)
+    config: RsyncConfig,
+    empty_dir: str,
+    target: str,
+    names: list[str],
+    verbose: bool,
+    dry_run: bool = False,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+    retry_callback: t.Optional[OutputCallback] = None,
+) -> list[str]:
+    """
+    :param retry_callback: Called with a message before rsync is run again after a transient error
+    """
+    cmd = rsync_delete_cmd(config, empty_dir, target, names, verbose)
+    return _run_rsync(config, cmd, dry_run, print_cmd_callback, retry_callback)
+
+
+def run_rsync_list_local(
+    config: RsyncConfig,
+    source: str,
+    project_for_filter: str,
+    path_for_filter: str,
+    print_cmd_callback: PrintCmdCallable = print_cmd,
+) -> tuple[list[str], str]:
+    """
+    :return: Tuple of cmdline and listing (see `rsync_list_local_cmd`)
+    """
+    cmd = rsync_list_local_cmd(config, source, project_for_filter, path_for_filter)
+    print_cmd_callback(cmd=cmd)
+    result = subprocess.run(cmd, capture_output=True, encoding="utf-8", errors="replace", check=True)
+    return cmd, result.stdout
+
+
 def run_rsync_list(
     config: RsyncConfig,
     target: str,
@@ -273,27 +839,17 @@ def run_rsync_list(
     verbose: bool,
     dry_run: bool = False,
     print_cmd_callback: PrintCmdCallable = print_cmd,
+    extra_args: t.Optional[list[str]] = None,
 ) -> tuple[list[str], list[tuple[str, str]]]:
     """
     :return: Tuple of cmdline and list of date-file-tuples
     """
-    opt = RsyncListOptions(config=config, show_progress=show_progress, verbose=verbose)
-    cmd = [
-        "rsync",
-        *opt.args,
-        "--",
-        f"{opt.path()}{target}",
-    ]
+    cmd = rsync_list_cmd(config, target, show_progress, verbose, extra_args=extra_args)
     date_file_tuples: list[tuple[str, str]] = []
     if not dry_run:
         print_cmd_callback(cmd=cmd)
         result = subprocess.run(
             cmd, capture_output=True, encoding="utf-8", universal_newlines=True, check=True
         )
-        # Output contains lines like: drwxr-xr-x          4,096 2022/11/07 18:47:30 backup-2022-11-07_18.47
-        regex = re.compile("[^ ]+ + [^ ]+ +(?P<date>[^ ]+ +[^ ]+) +(?P<file>.*)")
-        for line in result.stdout.split("\n"):
-            match = regex.match(line)
-            if match and match.group("file") != ".":
-                date_file_tuples.append((match.group("date"), match.group("file")))
+        date_file_tuples = parse_rsync_list(result.stdout)
     return cmd, date_file_tuples
@@ -0,0 +1,137 @@
+"""Asynchronous subprocess runner
+
+Used to overlap I/O-bound external calls (docker, rsync) of batch operations.
+"""
+import asyncio
+import codecs
+import re
+import subprocess
+import typing as t
+
+OutputCallback = t.Callable[[str], None]
+T = t.TypeVar("T")
+
+_LINE_SEPARATOR_REGEX = re.compile(r"[\r\n]")
+_READ_SIZE = 64 * 1024
+
+
+async def _read_stream(stream: t.Optional[asyncio.StreamReader], callback: t.Optional[OutputCallback]) -> str:
+    """Read a stream until EOF, passing each line to the callback.
+
+    Lines are split at both `\\n` and `\\r` (rsync uses the latter for progress updates).
+    """
+    if stream is None:
+        return ""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    chunks: list[str] = []
+    pending = ""
+    while True:
+        data = await stream.read(_READ_SIZE)
+        text = decoder.decode(data, final=not data)
+        chunks.append(text)
+        if callback is not None:
+            *lines, pending = _LINE_SEPARATOR_REGEX.split(pending + text)
+            for line in lines:
+                callback(line)
+        if not data:
+            break
+    if callback is not None and pending != "":
+        callback(pending)
+    return "".join(chunks)
+
+
+class ProcessRunner:
+    """Run subprocesses as coroutines
+
+    At most `max_concurrency` processes run at the same time.
+    Processes exceeding their timeout and processes of cancelled coroutines are killed.
+    """
+
+    def __init__(self, max_concurrency: int = 1, timeout: t.Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore: t.Optional[asyncio.Semaphore] = None
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # The semaphore is bound to an event loop, and each `run_coroutine` call creates a new one.
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(  # noqa: CFQ002 (max arguments)
+        self,
+        cmd: list[str],
+        *,
+        cwd: t.Optional[str] = None,
+        env: t.Optional[t.Mapping[str, str]] = None,
+        timeout: t.Optional[float] = None,
+        capture_output: bool = False,
+        stdout_callback: t.Optional[OutputCallback] = None,
+        stderr_callback: t.Optional[OutputCallback] = None,
+        merge_stderr: bool = False,
+        check: bool = True,
+    ) -> subprocess.CompletedProcess:
+        """Run a command like `subprocess.run` would.
+
+        Output is captured if `capture_output` is set or if a callback is given for the stream.
+        With `merge_stderr`, stderr is captured as part of stdout.
+        """
+        # pylint: disable=too-many-locals
+        capture_stdout = capture_output or stdout_callback is not None
+        capture_stderr = not merge_stderr and (capture_output or stderr_callback is not None)
+        timeout = timeout if timeout is not None else self.timeout
+        async with self._get_semaphore():
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                cwd=cwd,
+                env=env,
+                stdout=asyncio.subprocess.PIPE if capture_stdout else None,
+                stderr=asyncio.subprocess.STDOUT
+                if merge_stderr
+                else (asyncio.subprocess.PIPE if capture_stderr else None),
+            )
+            stdout_task = asyncio.ensure_future(_read_stream(process.stdout, stdout_callback))
+            stderr_task = asyncio.ensure_future(_read_stream(process.stderr, stderr_callback))
+            try:
+                await asyncio.wait_for(asyncio.gather(stdout_task, stderr_task, process.wait()), timeout)
+            except asyncio.TimeoutError as e:
+                await self._kill(process)
+                raise subprocess.TimeoutExpired(
+                    cmd,
+                    t.cast(float, timeout),
+                    output=_result_or_none(stdout_task),
+                    stderr=_result_or_none(stderr_task),
+                ) from e
+            except asyncio.CancelledError:
+                await self._kill(process)
+                raise
+
+        stdout = stdout_task.result() if capture_stdout else None
+        stderr = stderr_task.result() if capture_stderr else None
+        assert process.returncode is not None
+        if check and process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, output=stdout, stderr=stderr)
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout=stdout, stderr=stderr)
+
+    @staticmethod
+    async def _kill(process: "asyncio.subprocess.Process") -> None:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+
+def _result_or_none(task: "asyncio.Future[str]") -> t.Optional[str]:
+    if task.done() and not task.cancelled() and task.exception() is None:
+        return task.result()
+    return None
+
+
+def run_coroutine(coroutine: t.Coroutine[t.Any, t.Any, T]) -> T:
+    """Run a coroutine from synchronous code."""
+    return asyncio.run(coroutine)
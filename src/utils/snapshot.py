@@ -0,0 +1,87 @@
+"""Filesystem snapshots of backup sources
+
+Sources are snapshotted next to themselves (snapshots must be on the same filesystem):
+- btrfs subvolumes as read-only btrfs snapshots,
+- everything else as reflink copy (supported e.g. by btrfs and XFS).
+"""
+import dataclasses
+import os
+import shutil
+import subprocess
+import tempfile
+import typing as t
+
+SNAPSHOT_DIR_PREFIX = ".doco-snapshot-"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class Snapshot:
+    source: str
+    path: str
+    is_btrfs_subvolume: bool
+
+    @property
+    def create_cmd(self) -> list[str]:
+        if self.is_btrfs_subvolume:
+            return ["btrfs", "subvolume", "snapshot", "-r", self.source, self.path]
+        return ["cp", "-a", "--reflink=always", self.source, self.path]
+
+    @property
+    def delete_cmd(self) -> t.Optional[list[str]]:
+        if self.is_btrfs_subvolume:
+            return ["btrfs", "subvolume", "delete", self.path]
+        return None
+
+
+def _is_btrfs_subvolume(path: str) -> bool:
+    # The root directory of a btrfs subvolume always has the inode number 256.
+    if not os.path.isdir(path) or os.stat(path).st_ino != 256:
+        return False
+    result = subprocess.run(
+        ["stat", "-f", "-c", "%T", path],
+        capture_output=True,
+        encoding="utf-8",
+        universal_newlines=True,
+        check=False,
+    )
+    return result.returncode == 0 and result.stdout.strip() == "btrfs"
+
+
+def plan_snapshot(source: str) -> Snapshot:
+    """Determine how to snapshot the source, without creating anything (see `create_snapshot`)."""
+    source = os.path.normpath(os.path.abspath(source))
+    snapshot_dir = os.path.join(os.path.dirname(source), f"{SNAPSHOT_DIR_PREFIX}XXXXXXXX")
+    return Snapshot(
+        source=source,
+        path=os.path.join(snapshot_dir, os.path.basename(source)),
+        is_btrfs_subvolume=_is_btrfs_subvolume(source),
+    )
+
+
+def create_snapshot(snapshot: Snapshot) -> None:
+    """Create the planned snapshot (its path is updated to the created directory)."""
+    snapshot_dir = tempfile.mkdtemp(prefix=SNAPSHOT_DIR_PREFIX, dir=os.path.dirname(snapshot.source))
+    snapshot.path = os.path.join(snapshot_dir, os.path.basename(snapshot.source))
+    result = subprocess.run(
+        snapshot.create_cmd,
+        capture_output=True,
+        encoding="utf-8",
+        universal_newlines=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        delete_snapshot(snapshot)
+        raise SnapshotError(f"Cannot snapshot {snapshot.source}: {result.stderr.strip()}")
+
+
+def delete_snapshot(snapshot: Snapshot) -> None:
+    delete_cmd = snapshot.delete_cmd
+    if delete_cmd is not None and os.path.exists(snapshot.path):
+        subprocess.run(delete_cmd, capture_output=True, check=False)
+    snapshot_dir = os.path.dirname(snapshot.path)
+    if os.path.basename(snapshot_dir).startswith(SNAPSHOT_DIR_PREFIX):
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
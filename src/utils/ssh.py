@@ -0,0 +1,81 @@
+"""SSH connection multiplexing
+
+All ssh connections of a doco invocation to the same host share one master connection
+(see `ControlMaster` in ssh_config(5)), so the ssh handshake is done only once per host.
+The master connections are closed when doco exits.
+"""
+import atexit
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import typing as t
+
+CONTROL_PERSIST_SECONDS = 60
+
+
+class SshMultiplexer:
+    def __init__(self):
+        self._control_dir: t.Optional[str] = None
+        self._masters: set[tuple[tuple[str, ...], str]] = set()
+        self._lock = threading.Lock()
+
+    def _get_control_dir(self) -> str:
+        if self._control_dir is None:
+            # Private directory, as the sockets allow using the connections without authentication.
+            self._control_dir = tempfile.mkdtemp(prefix="doco-ssh-")
+            atexit.register(self.close)
+        return self._control_dir
+
+    def wrap_rsh(self, rsh: t.Optional[str], host: str) -> t.Optional[str]:
+        """Add multiplexing options to the remote shell command used by rsync to connect to `host`.
+
+        :param rsh: Remote shell command, None for rsync's default (`$RSYNC_RSH` or `ssh`)
+        :return: The modified command or None if it is not an ssh command
+        """
+        if rsh is None:
+            rsh = os.environ.get("RSYNC_RSH") or "ssh"
+        cmd = shlex.split(rsh)
+        if len(cmd) == 0 or os.path.basename(cmd[0]) != "ssh":
+            return None
+        with self._lock:
+            control_path = os.path.join(self._get_control_dir(), "%C")
+            self._masters.add((tuple(cmd), host))
+        return shlex.join(
+            [
+                cmd[0],
+                "-o",
+                "ControlMaster=auto",
+                "-o",
+                f"ControlPath={control_path}",
+                "-o",
+                f"ControlPersist={CONTROL_PERSIST_SECONDS}",
+                *cmd[1:],
+            ]
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._control_dir is None:
+                return
+            control_path = os.path.join(self._control_dir, "%C")
+            for cmd, host in self._masters:
+                try:
+                    subprocess.run(
+                        [cmd[0], "-o", f"ControlPath={control_path}", *cmd[1:], "-O", "exit", host],
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        timeout=10,
+                        check=False,
+                    )
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._masters.clear()
+            shutil.rmtree(self._control_dir, ignore_errors=True)
+            self._control_dir = None
+
+
+ssh_multiplexer = SshMultiplexer()
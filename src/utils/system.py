@@ -24,3 +24,15 @@ def chown_given_strings(path: t.Union[str, os.PathLike[str]], uid: t.Optional[st
             int(uid) if uid is not None and uid.isnumeric() else uid,  # type: ignore
             int(gid) if gid is not None and gid.isnumeric() else gid,  # type: ignore
         )
+
+
+def get_cache_dir() -> str:
+    """Get doco's cache directory according to the XDG Base Directory Specification."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "doco")
+
+
+def get_state_dir() -> str:
+    """Get doco's state directory according to the XDG Base Directory Specification."""
+    state_home = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_home, "doco")
@@ -0,0 +1,53 @@
+from src.utils.backup import IncompleteBackup
+from src.utils.backup import load_incomplete_backup
+from src.utils.backup import remove_incomplete_backup
+from src.utils.backup import save_incomplete_backup
+from src.utils.backup import select_link_dest_backup_dirs
+
+
+def test_incomplete_backup_state(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    project_dir = str(tmp_path / "project")
+    assert load_incomplete_backup(project_dir) is None
+
+    backup = IncompleteBackup(backup_dir="project/backup-2024-01-02_03.04", last_backup_dir=None)
+    save_incomplete_backup(project_dir, backup)
+    assert load_incomplete_backup(project_dir) == backup
+    assert load_incomplete_backup(str(tmp_path / "other")) is None
+
+    remove_incomplete_backup(project_dir)
+    remove_incomplete_backup(project_dir)
+    assert load_incomplete_backup(project_dir) is None
+
+
+def test_select_link_dest_backup_dirs():
+    complete_backups = [
+        ("2024/01/01 10:05:00", "backup-2024-01-01_10.00"),
+        ("2024/01/04 10:05:00", "backup-2024-01-04_10.00"),
+        ("2024/01/02 10:05:00", "backup-2024-01-02_10.00"),
+    ]
+
+    assert select_link_dest_backup_dirs(
+        complete_backups,
+        project_backups_dir="project",
+        new_backup_dir="project/backup-2024-01-05_10.00",
+        last_backup_dir="project/backup-2024-01-02_10.00",
+        count=3,
+    ) == [
+        "project/backup-2024-01-02_10.00",
+        "project/backup-2024-01-04_10.00",
+        "project/backup-2024-01-01_10.00",
+    ]
+
+    # The new backup itself (when resumed) is skipped
+    assert select_link_dest_backup_dirs(
+        complete_backups,
+        project_backups_dir="project",
+        new_backup_dir="project/backup-2024-01-04_10.00",
+        last_backup_dir=None,
+        count=20,
+    ) == ["project/backup-2024-01-02_10.00", "project/backup-2024-01-01_10.00"]
+
+    assert select_link_dest_backup_dirs(
+        [], project_backups_dir="project", new_backup_dir="project/new", last_backup_dir="project/old", count=3
+    ) == ["project/old"]
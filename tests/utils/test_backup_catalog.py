@@ -0,0 +1,108 @@
+import pytest
+
+import src.utils.backup_catalog
+from src.utils.backup_catalog import add_backup
+from src.utils.backup_catalog import invalidate_backups
+from src.utils.backup_catalog import list_catalog_backups
+from src.utils.backup_catalog import list_catalog_projects
+from src.utils.backup_catalog import sort_backups
+from src.utils.rsync import parse_rsync_list
+from src.utils.rsync import RsyncConfig
+
+BACKUPS_LISTING = """\
+drwxr-xr-x          4,096 2024/01/04 10:00:00 .
+drwxr-xr-x          4,096 2024/01/01 10:00:00 backup-2024-01-01_10.00
+-rw-r--r--          1,000 2024/01/01 10:05:00 backup-2024-01-01_10.00/config.json
+drwxr-xr-x          4,096 2024/01/03 10:00:00 backup-2024-01-03_10.00
+drwxr-xr-x          4,096 2024/01/02 10:00:00 backup
+-rw-r--r--          1,000 2024/01/02 10:05:00 backup/config.json
+"""
+PROJECTS_LISTING = """\
+drwxr-xr-x          4,096 2024/01/04 10:00:00 .
+drwxr-xr-x          4,096 2024/01/04 10:00:00 project
+"""
+
+
+@pytest.fixture(name="list_calls")
+def fixture_list_calls(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    calls: list[str] = []
+
+    def run_rsync_list(config, target, show_progress, verbose, dry_run, print_cmd_callback, extra_args=None):
+        # pylint: disable=unused-argument
+        calls.append(target)
+        return [], parse_rsync_list(BACKUPS_LISTING if target != "" else PROJECTS_LISTING)
+
+    monkeypatch.setattr(src.utils.backup_catalog, "run_rsync_list", run_rsync_list)
+    return calls
+
+
+def when_having_config(ttl: float = 300.0) -> RsyncConfig:
+    return RsyncConfig(host="nas", module="Backup", list_cache_ttl=ttl)
+
+
+def test_backups_are_listed_with_completion_status(list_calls):
+    entries = list_catalog_backups(when_having_config(), "project")
+
+    assert list_calls == ["project/"]
+    assert [(entry.name, entry.complete) for entry in sort_backups(entries)] == [
+        ("backup", True),
+        ("backup-2024-01-03_10.00", False),
+        ("backup-2024-01-01_10.00", True),
+    ]
+
+
+def test_listing_is_cached_until_ttl(list_calls):
+    config = when_having_config()
+
+    first = list_catalog_backups(config, "project")
+    second = list_catalog_backups(config, "project")
+    list_catalog_backups(config, "project", use_cache=False)
+    list_catalog_backups(when_having_config(ttl=0), "project")
+
+    assert first == second
+    assert list_calls == ["project/", "project/", "project/"]
+
+
+def test_created_backups_are_added_to_cached_listings(list_calls):
+    config = when_having_config()
+    list_catalog_projects(config)
+    list_catalog_backups(config, "project")
+
+    add_backup(config, "project", "backup-2024-01-05_10.00", size=1234)
+    add_backup(config, "other", "backup-2024-01-05_10.00", size=None)
+    entries = sort_backups(list_catalog_backups(config, "project"))
+
+    assert list_calls == ["", "project/"]
+    assert (entries[1].name, entries[1].size, entries[1].complete) == ("backup-2024-01-05_10.00", 1234, True)
+    assert entries[1].mtime == "2024/01/05 10:00:00"
+    assert sorted(entry.name for entry in list_catalog_projects(config)) == ["other", "project"]
+    assert list_calls == ["", "project/"]
+
+
+def test_known_sizes_are_kept_when_listing_again(list_calls):
+    config = when_having_config()
+    list_catalog_backups(config, "project")
+    add_backup(config, "project", "backup-2024-01-01_10.00", size=1234)
+
+    entries = list_catalog_backups(config, "project", use_cache=False)
+
+    assert {entry.name: entry.size for entry in entries}["backup-2024-01-01_10.00"] == 1234
+    assert len(list_calls) == 2
+
+
+def test_invalidated_listing_is_listed_again(list_calls):
+    config = when_having_config()
+    list_catalog_backups(config, "project")
+
+    invalidate_backups(config, "project")
+    list_catalog_backups(config, "project")
+
+    assert list_calls == ["project/", "project/"]
+
+
+def test_catalogs_are_kept_per_destination(list_calls):
+    list_catalog_backups(when_having_config(), "project")
+    list_catalog_backups(RsyncConfig(host="other-nas", module="Backup"), "project")
+
+    assert list_calls == ["project/", "project/"]
@@ -0,0 +1,53 @@
+from src.utils.backup_manifest import dump_manifest
+from src.utils.backup_manifest import load_manifest
+from src.utils.backup_manifest import parse_manifest_entries
+from src.utils.backup_manifest import summarize_manifest
+
+DIR_LISTING = """\
+drwxr-xr-x           4096 2024/01/01 10:00:00 .
+-rw-r--r--           1000 2024/01/01 10:01:00 a.txt
+drwxr-xr-x           4096 2024/01/01 10:02:00 sub
+-rw-------        1234567 2024/01/01 10:03:00 sub/b c.db
+lrwxrwxrwx              5 2024/01/01 10:04:00 sub/link -> a.txt
+"""
+
+
+def test_dir_listing_is_parsed_relative_to_backup_dir():
+    entries = parse_manifest_entries(DIR_LISTING, "volumes/db/data/", is_dir=True)
+
+    assert [(entry.path, entry.mode, entry.size) for entry in entries] == [
+        ("volumes/db/data", "drwxr-xr-x", 4096),
+        ("volumes/db/data/a.txt", "-rw-r--r--", 1000),
+        ("volumes/db/data/sub", "drwxr-xr-x", 4096),
+        ("volumes/db/data/sub/b c.db", "-rw-------", 1234567),
+        ("volumes/db/data/sub/link", "lrwxrwxrwx", 5),
+    ]
+    assert entries[1].mtime == "2024/01/01 10:01:00"
+
+
+def test_file_listing_uses_target_path():
+    entries = parse_manifest_entries(
+        "-rw-r--r--          1,000 2024/01/01 10:01:00 app.conf\n", "volumes/web/app.conf", is_dir=False
+    )
+
+    assert [(entry.path, entry.size) for entry in entries] == [("volumes/web/app.conf", 1000)]
+
+
+def test_manifest_round_trip(tmp_path):
+    entries = parse_manifest_entries(DIR_LISTING, "volumes/db/data/", is_dir=True)
+    path = tmp_path / "manifest.jsonl.gz"
+    path.write_bytes(dump_manifest(reversed(entries)))
+
+    assert load_manifest(str(path)) == entries
+
+
+def test_summarize_counts_files_below_path():
+    entries = [
+        *parse_manifest_entries(DIR_LISTING, "volumes/db/data/", is_dir=True),
+        *parse_manifest_entries(DIR_LISTING, "volumes/db/data2/", is_dir=True),
+    ]
+
+    assert summarize_manifest(entries, "volumes/db/data/") == (2, 1235567)
+    assert summarize_manifest(entries, "volumes/db/data/sub") == (1, 1234567)
+    assert summarize_manifest(entries, ".") == (4, 2 * 1235567)
+    assert summarize_manifest(entries, "volumes/web") == (0, 0)
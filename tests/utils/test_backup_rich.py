@@ -0,0 +1,17 @@
+from src.utils.backup_rich import add_transfer_stats
+from src.utils.backup_rich import TransferStats
+from src.utils.rsync import RsyncStats
+
+
+def test_transfer_stats_are_kept_per_transfer():
+    stats: list[TransferStats] = []
+
+    add_transfer_stats(stats, ["volumes/a", "volumes/b"], RsyncStats(files=2, bytes_sent=10))
+    add_transfer_stats(stats, ["volumes/c"], RsyncStats(files=1, bytes_sent=5))
+    add_transfer_stats(stats, ["volumes/a", "volumes/b"], RsyncStats(files=2, bytes_sent=3))
+
+    assert [(entry.target_paths, entry.stats.bytes_sent) for entry in stats] == [
+        (["volumes/a", "volumes/b"], 13),
+        (["volumes/c"], 5),
+    ]
+    assert stats[0].model_dump()["target_paths"] == ["volumes/a", "volumes/b"]
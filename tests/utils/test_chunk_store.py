@@ -0,0 +1,175 @@
+import io
+import os
+import random
+import stat
+
+from src.utils.chunk_store import _BOUNDARY_PATTERN
+from src.utils.chunk_store import _BYTE_BITS
+from src.utils.chunk_store import ChunkTreeEntry
+from src.utils.chunk_store import dump_chunk_tree
+from src.utils.chunk_store import FileCache
+from src.utils.chunk_store import find_chunk_boundary
+from src.utils.chunk_store import get_chunk_id
+from src.utils.chunk_store import iter_chunks
+from src.utils.chunk_store import load_chunk_locations
+from src.utils.chunk_store import load_chunk_tree
+from src.utils.chunk_store import load_pack_index
+from src.utils.chunk_store import MAX_CHUNK_SIZE
+from src.utils.chunk_store import MIN_CHUNK_SIZE
+from src.utils.chunk_store import PACK_INDEXES_DIR
+from src.utils.chunk_store import PackReader
+from src.utils.chunk_store import PACKS_DIR
+from src.utils.chunk_store import PackWriter
+from src.utils.chunk_store import restore_file
+from src.utils.chunk_store import select_unused_packs
+from src.utils.chunk_store import store_file
+
+DATA = random.Random(0).randbytes(6 * 1024 * 1024)
+
+
+def test_chunks_have_bounded_sizes():
+    chunks = list(iter_chunks(io.BytesIO(DATA)))
+
+    assert b"".join(chunks) == DATA
+    assert len(chunks) > 1
+    assert all(MIN_CHUNK_SIZE <= len(chunk) <= MAX_CHUNK_SIZE for chunk in chunks[:-1])
+
+
+def test_chunk_boundaries_survive_insertions():
+    changed = DATA[:3_000_000] + b"inserted" + DATA[3_000_000:]
+
+    chunks = list(iter_chunks(io.BytesIO(DATA)))
+    changed_chunks = list(iter_chunks(io.BytesIO(changed)))
+
+    assert len(set(chunks) - set(changed_chunks)) == 1
+
+
+def test_boundaries_spanning_scanned_blocks_are_found():
+    for offset in range(0, len(DATA) - MAX_CHUNK_SIZE, 100_003):
+        data = DATA[offset : offset + MAX_CHUNK_SIZE]
+        pos = data[MIN_CHUNK_SIZE:].translate(_BYTE_BITS).find(_BOUNDARY_PATTERN)
+        expected = MAX_CHUNK_SIZE if pos == -1 else MIN_CHUNK_SIZE + pos + len(_BOUNDARY_PATTERN)
+        assert find_chunk_boundary(data, len(data)) == expected
+
+
+def test_chunks_without_boundary_have_maximum_size():
+    assert [len(chunk) for chunk in iter_chunks(io.BytesIO(bytes(MAX_CHUNK_SIZE + 1)))] == [MAX_CHUNK_SIZE, 1]
+
+
+def test_boundaries_do_not_depend_on_later_data():
+    cut = find_chunk_boundary(DATA, len(DATA))
+    changed = DATA[:cut] + bytes(len(DATA) - cut)
+
+    assert MIN_CHUNK_SIZE < cut < MAX_CHUNK_SIZE
+    assert find_chunk_boundary(changed, len(changed)) == cut
+    assert find_chunk_boundary(DATA, cut) == cut
+    assert find_chunk_boundary(DATA, cut - 1) == cut - 1
+
+
+def test_small_and_empty_files_are_single_chunks():
+    assert list(iter_chunks(io.BytesIO(b"abc"))) == [b"abc"]
+    assert not list(iter_chunks(io.BytesIO(b"")))
+
+
+def test_stored_file_can_be_restored(tmp_path):
+    source = tmp_path / "source.db"
+    source.write_bytes(DATA)
+    staging_dir = tmp_path / "staging"
+    writer = PackWriter(str(staging_dir))
+    pack_ids = []
+
+    chunk_ids, added = store_file(
+        str(source), writer, lambda chunk_id: False, lambda: pack_ids.append(writer.flush())
+    )
+    pack_ids.append(writer.flush())
+
+    assert added == len(DATA)
+    assert pack_ids == [pack_ids[0]]
+    locations = load_chunk_locations(str(staging_dir / PACK_INDEXES_DIR))
+    assert set(locations) == set(chunk_ids)
+
+    entry = ChunkTreeEntry(
+        path="volumes/db/source.db", mode=stat.S_IFREG | 0o600, uid=0, gid=0, mtime_ns=0, chunks=chunk_ids
+    )
+    target = tmp_path / "restored.db"
+    with PackReader(str(staging_dir / PACKS_DIR)) as packs:
+        restore_file(entry, str(target), locations, packs)
+    assert target.read_bytes() == DATA
+
+
+def test_stored_chunks_are_not_added_again(tmp_path):
+    source = tmp_path / "source.db"
+    source.write_bytes(DATA + DATA)
+    writer = PackWriter(str(tmp_path / "staging"))
+
+    chunk_ids, added = store_file(str(source), writer, lambda chunk_id: False, lambda: None)
+    _, added_again = store_file(
+        str(source), PackWriter(str(tmp_path / "staging2")), set(chunk_ids).__contains__, lambda: None
+    )
+
+    # The repeated content is stored only once (besides the chunk at the seam)
+    assert len(DATA) <= added < len(DATA) + MAX_CHUNK_SIZE
+    assert writer.size >= added
+    assert added_again == 0
+
+
+def test_chunk_tree_round_trip(tmp_path):
+    entries = [
+        ChunkTreeEntry(path="volumes/b", mode=stat.S_IFLNK | 0o777, uid=1, gid=2, mtime_ns=3, link="a"),
+        ChunkTreeEntry(
+            path="volumes/a", mode=stat.S_IFREG | 0o644, uid=1, gid=2, mtime_ns=3, size=3, chunks=["x"]
+        ),
+    ]
+    path = tmp_path / "chunks.jsonl.gz"
+    path.write_bytes(dump_chunk_tree(entries))
+
+    assert load_chunk_tree(str(path)) == list(reversed(entries))
+
+
+def test_file_cache_detects_changes(tmp_path):
+    source = tmp_path / "file"
+    source.write_bytes(b"abc")
+    cache = FileCache(destination="")
+    cache.set_chunks("volumes/file", os.stat(source), ["x"])
+
+    assert cache.get_chunks("volumes/file", os.stat(source)) == ["x"]
+    source.write_bytes(b"abcd")
+    assert cache.get_chunks("volumes/file", os.stat(source)) is None
+    assert cache.get_chunks("volumes/other", os.stat(source)) is None
+
+
+def test_only_packs_without_used_chunks_are_unused(tmp_path):
+    pack_ids = []
+    for chunks in ([b"a", b"b"], [b"c"], [b"d"]):
+        writer = PackWriter(str(tmp_path))
+        for chunk in chunks:
+            writer.add(get_chunk_id(chunk), chunk)
+        pack_ids.append(writer.flush())
+
+    unused = select_unused_packs(str(tmp_path / PACK_INDEXES_DIR), {get_chunk_id(b"b"), get_chunk_id(b"d")})
+
+    assert unused == [pack_ids[1]]
+    assert not select_unused_packs(str(tmp_path / "missing"), set())
+
+
+def test_pack_reader_keeps_recent_packs_open(tmp_path, monkeypatch):
+    monkeypatch.setattr(PackReader, "MAX_OPEN_PACKS", 2)
+    locations = {}
+    for chunk in (b"a", b"b", b"c"):
+        writer = PackWriter(str(tmp_path))
+        writer.add(get_chunk_id(chunk), chunk)
+        pack_id = writer.flush()
+        assert pack_id is not None
+        locations[chunk] = (
+            pack_id,
+            *load_pack_index(str(tmp_path / PACK_INDEXES_DIR / f"{pack_id}.json"))[get_chunk_id(chunk)],
+        )
+
+    with PackReader(str(tmp_path / PACKS_DIR)) as packs:
+        assert [packs.read_chunk(*locations[chunk]) for chunk in (b"a", b"b", b"a", b"c", b"b")] == [
+            b"a",
+            b"b",
+            b"a",
+            b"c",
+            b"b",
+        ]
@@ -0,0 +1,48 @@
+import os
+
+import src.utils.chunk_store_rich
+from src.utils.chunk_store_rich import _delete_extraneous_files
+from src.utils.restore import RestoreJob
+from src.utils.rsync import RsyncConfig
+
+
+def fake_rsync_list_local(excluded_name: str):
+    """List a local directory like `rsync -r --list-only` with a filter rule excluding `excluded_name`."""
+
+    def run_rsync_list_local(_config, source, *, project_for_filter, **_kwargs):
+        assert project_for_filter == "project"
+        lines = ["drwxr-xr-x          4,096 2024/01/01 00:00:00 ."]
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames[:] = [name for name in dirnames if name != excluded_name]
+            for name in sorted(dirnames):
+                path = os.path.relpath(os.path.join(dirpath, name), source)
+                lines.append(f"drwxr-xr-x          4,096 2024/01/01 00:00:00 {path}")
+            for name in sorted(filenames):
+                if name != excluded_name:
+                    path = os.path.relpath(os.path.join(dirpath, name), source)
+                    lines.append(f"-rw-r--r--              1 2024/01/01 00:00:00 {path}")
+        return [], "\n".join(lines) + "\n"
+
+    return run_rsync_list_local
+
+
+def test_restore_keeps_excluded_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.utils.chunk_store_rich, "run_rsync_list_local", fake_rsync_list_local("cache"))
+    target = tmp_path / "data"
+    (target / "cache").mkdir(parents=True)
+    (target / "cache" / "entry").write_text("excluded")
+    (target / "old").mkdir()
+    (target / "old" / "cache").write_text("excluded")
+    (target / "old" / "file").write_text("not in backup")
+    (target / "removed").mkdir()
+    (target / "removed" / "file").write_text("not in backup")
+    (target / "file").write_text("restored")
+    job = RestoreJob(source_path="volumes/data", target_path="data", project_dir=str(tmp_path), is_dir=True)
+
+    _delete_extraneous_files(RsyncConfig(), "project", [job], {str(target), str(target / "file")})
+
+    assert sorted(
+        os.path.relpath(os.path.join(dirpath, name), target)
+        for dirpath, dirnames, filenames in os.walk(target)
+        for name in dirnames + filenames
+    ) == ["cache", "cache/entry", "file", "old", "old/cache"]
@@ -0,0 +1,99 @@
+import pytest
+
+from src.utils.compose import ComposeConfigError
+from src.utils.compose import get_compose_profiles
+from src.utils.compose import select_compose_config
+
+MODEL = {
+    "name": "app",
+    "services": {
+        "web": {"image": "nginx", "depends_on": {"api": {"condition": "service_started"}}},
+        "api": {"image": "api", "depends_on": {"db": {"condition": "service_healthy"}}},
+        "db": {"image": "postgres"},
+        "debug": {"image": "busybox", "profiles": ["debug"], "depends_on": {"db": {}}},
+        "docs": {"image": "docs", "profiles": ["docs", "debug"]},
+        "admin": {"image": "admin", "profiles": ["admin"], "depends_on": {"docs": {}}},
+    },
+    "volumes": {"data": {}},
+}
+
+
+def when_selecting(services: list[str], profiles: list[str]) -> list[str]:
+    return list(select_compose_config(MODEL, services=services, profiles=profiles)["services"])
+
+
+def test_compose_profiles():
+    assert get_compose_profiles(MODEL) == ["admin", "debug", "docs"]
+    assert not get_compose_profiles({"services": {"web": {"image": "nginx"}}})
+
+
+def test_services_without_profile_are_always_selected():
+    assert when_selecting([], []) == ["web", "api", "db"]
+
+
+def test_profile_gated_services_need_their_profile():
+    assert when_selecting([], ["docs"]) == ["web", "api", "db", "docs"]
+    assert when_selecting([], ["debug"]) == ["web", "api", "db", "debug", "docs"]
+
+
+def test_selected_services_do_not_need_their_profile():
+    assert when_selecting(["debug"], []) == ["db", "debug"]
+    assert when_selecting(["docs"], ["debug"]) == ["docs"]
+
+
+def test_dependencies_need_their_profile():
+    with pytest.raises(ComposeConfigError):
+        when_selecting(["admin"], [])
+    assert when_selecting(["admin"], ["docs"]) == ["docs", "admin"]
+    assert when_selecting(["admin", "docs"], []) == ["docs", "admin"]
+
+
+def test_optional_dependencies_without_their_profile_are_skipped():
+    model = {
+        "services": {
+            "web": {"image": "nginx", "depends_on": {"debug": {"required": False}}},
+            "debug": {"image": "busybox", "profiles": ["debug"]},
+        }
+    }
+    assert list(select_compose_config(model, services=["web"], profiles=[])["services"]) == ["web"]
+
+
+def test_selected_services_pull_in_transitive_dependencies():
+    assert when_selecting(["web"], []) == ["web", "api", "db"]
+    assert when_selecting(["debug"], ["debug"]) == ["db", "debug"]
+
+
+def test_unknown_services_are_ignored():
+    assert not when_selecting(["unknown"], [])
+    assert when_selecting(["unknown", "api"], []) == ["api", "db"]
+
+
+def test_other_keys_are_kept():
+    config = select_compose_config(MODEL, services=["db"], profiles=[])
+    assert config["name"] == "app"
+
+
+def test_unused_networks_and_volumes_are_removed():
+    model = {
+        "services": {
+            "web": {
+                "image": "nginx",
+                "networks": {"front": None},
+                "volumes": ["./html:/html", "cache:/cache"],
+            },
+            "db": {"image": "postgres", "volumes": [{"type": "volume", "source": "data", "target": "/data"}]},
+            "host": {"image": "busybox", "network_mode": "host", "volumes": [{"type": "bind", "source": "/"}]},
+        },
+        "networks": {"default": {}, "front": {}},
+        "volumes": {"cache": {}, "data": {}},
+    }
+
+    config = select_compose_config(model, services=["web"], profiles=[])
+    assert config["networks"] == {"front": {}}
+    assert config["volumes"] == {"cache": {}}
+
+    config = select_compose_config(model, services=["db", "host"], profiles=[])
+    assert config["networks"] == {"default": {}}
+    assert config["volumes"] == {"data": {}}
+
+    assert select_compose_config(model, services=[], profiles=[]) == model
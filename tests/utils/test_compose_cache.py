@@ -0,0 +1,97 @@
+import pathlib
+
+import pytest
+
+import src.utils.compose_cache
+from src.utils.compose_cache import load_cached_compose_model
+
+
+@pytest.fixture(name="compose_calls")
+def fixture_compose_calls(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    calls: list[tuple[str, str]] = []
+
+    def load_compose_model(cwd: str, file: str):
+        calls.append((cwd, file))
+        return {"name": "test-project", "services": {"web": {"image": "nginx"}}}
+
+    monkeypatch.setattr(src.utils.compose_cache, "load_compose_model", load_compose_model)
+    return calls
+
+
+def when_having_project(project_dir: pathlib.Path) -> pathlib.Path:
+    project_dir.mkdir()
+    (project_dir / "compose.yaml").write_text(
+        "include: [base.yaml]\nservices:\n  web:\n    image: nginx:${TAG:-latest}\n    env_file: web.env\n"
+    )
+    (project_dir / "base.yaml").write_text("services:\n  db:\n    extends:\n      file: common.yaml\n")
+    (project_dir / "common.yaml").write_text("services: {}\n")
+    (project_dir / "web.env").write_text("FOO=bar\n")
+    return project_dir
+
+
+def when_loading(project_dir: pathlib.Path, use_cache: bool = True):
+    return load_cached_compose_model(str(project_dir), "compose.yaml", use_cache=use_cache)
+
+
+def test_unchanged_project_is_loaded_from_cache(compose_calls, tmp_path):
+    project_dir = when_having_project(tmp_path / "project")
+
+    first = when_loading(project_dir)
+    second = when_loading(project_dir)
+
+    assert first == second
+    assert len(compose_calls) == 1
+
+
+def test_no_cache_always_calls_compose(compose_calls, tmp_path):
+    project_dir = when_having_project(tmp_path / "project")
+
+    when_loading(project_dir, use_cache=False)
+    when_loading(project_dir, use_cache=False)
+
+    assert len(compose_calls) == 2
+
+
+@pytest.mark.parametrize("changed_file", ["compose.yaml", "base.yaml", "common.yaml", "web.env", ".env"])
+def test_changed_dependency_invalidates_cache(compose_calls, tmp_path, changed_file):
+    project_dir = when_having_project(tmp_path / "project")
+
+    when_loading(project_dir)
+    with open(project_dir / changed_file, "a", encoding="utf-8") as f:
+        f.write("# changed\n")
+    when_loading(project_dir)
+
+    assert len(compose_calls) == 2
+
+
+def test_touched_but_unchanged_file_keeps_cache(compose_calls, tmp_path):
+    project_dir = when_having_project(tmp_path / "project")
+
+    when_loading(project_dir)
+    (project_dir / "web.env").write_text("FOO=bar\n")
+    when_loading(project_dir)
+
+    assert len(compose_calls) == 1
+
+
+def test_changed_referenced_variable_invalidates_cache(compose_calls, tmp_path, monkeypatch):
+    project_dir = when_having_project(tmp_path / "project")
+
+    when_loading(project_dir)
+    monkeypatch.setenv("TAG", "1.0")
+    when_loading(project_dir)
+    monkeypatch.setenv("UNRELATED", "1.0")
+    when_loading(project_dir)
+
+    assert len(compose_calls) == 2
+
+
+def test_cache_size_is_bounded(compose_calls, tmp_path, monkeypatch):
+    monkeypatch.setattr(src.utils.compose_cache, "CACHE_MAX_SIZE", 3000)
+    for i in range(10):
+        when_loading(when_having_project(tmp_path / f"project{i}"))
+
+    cache_dir = tmp_path / "cache" / "doco" / "compose"
+    assert sum(entry.stat().st_size for entry in cache_dir.iterdir()) <= 3000
+    assert len(compose_calls) == 10
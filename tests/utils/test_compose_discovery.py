@@ -0,0 +1,69 @@
+import os
+import pathlib
+
+import pytest
+
+import src.utils.compose_discovery
+from src.utils.compose_discovery import discover_compose_dirs
+
+
+@pytest.fixture(name="scanned_dirs")
+def fixture_scanned_dirs(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    scanned: list[str] = []
+    scan_dir = src.utils.compose_discovery._scan_dir  # pylint: disable=protected-access
+
+    def counting_scan_dir(path: str, mtime_ns: int):
+        scanned.append(path)
+        return scan_dir(path, mtime_ns)
+
+    monkeypatch.setattr(src.utils.compose_discovery, "_scan_dir", counting_scan_dir)
+    return scanned
+
+
+def when_having_project(path: pathlib.Path, file_name: str = "compose.yaml"):
+    path.mkdir(parents=True)
+    (path / file_name).write_text("services: {}\n")
+
+
+@pytest.fixture(name="tree")
+def fixture_tree(tmp_path):
+    root = tmp_path / "srv"
+    when_having_project(root / "app")
+    when_having_project(root / "app" / "data" / "nested")
+    when_having_project(root / "group" / "db", "docker-compose.yml")
+    when_having_project(root / ".git" / "hidden")
+    when_having_project(root / "web" / "node_modules" / "pkg")
+    (root / "empty").mkdir()
+    return root
+
+
+def test_discovery_finds_projects_and_prunes(tree, scanned_dirs):
+    assert discover_compose_dirs(str(tree)) == [str(tree / "app"), str(tree / "group" / "db")]
+    assert str(tree / ".git") not in scanned_dirs
+    assert str(tree / "web" / "node_modules") not in scanned_dirs
+    assert str(tree / "app" / "data") not in scanned_dirs
+
+
+def test_repeated_discovery_uses_index(tree, scanned_dirs):
+    discover_compose_dirs(str(tree))
+    scanned_dirs.clear()
+
+    assert discover_compose_dirs(str(tree)) == [str(tree / "app"), str(tree / "group" / "db")]
+    assert not scanned_dirs
+
+
+def test_changed_directory_is_scanned_again(tree, scanned_dirs):
+    discover_compose_dirs(str(tree))
+    scanned_dirs.clear()
+
+    when_having_project(tree / "group" / "cache")
+    os.utime(tree / "group", ns=(0, 0))
+
+    assert discover_compose_dirs(str(tree)) == [
+        str(tree / "app"),
+        str(tree / "group" / "cache"),
+        str(tree / "group" / "db"),
+    ]
+    assert str(tree / "group") in scanned_dirs
+    assert str(tree) not in scanned_dirs
@@ -0,0 +1,89 @@
+import pytest
+
+from src.utils import deploy_state
+from src.utils.compose_rich import ComposeProject
+from src.utils.deploy_state import get_changed_services
+from src.utils.deploy_state import save_deployed_hashes
+from src.utils.deploy_state import select_changed_services
+
+
+@pytest.fixture(autouse=True)
+def state_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+
+
+@pytest.fixture(name="image_ids")
+def fixture_image_ids(monkeypatch):
+    ids = {"nginx": "sha256:1", "app-api": "sha256:2"}
+    monkeypatch.setattr(deploy_state, "load_image_ids", lambda images: {i: ids[i] for i in images if i in ids})
+    return ids
+
+
+def make_project(tmp_path, volumes=None, **services) -> ComposeProject:
+    return ComposeProject(
+        dir=str(tmp_path),
+        file="compose.yaml",
+        config={"name": "app", "services": services, **({"volumes": volumes} if volumes is not None else {})},
+        selected_services=[],
+        all_profiles=[],
+        selected_profiles=[],
+    )
+
+
+@pytest.mark.usefixtures("image_ids")
+def test_all_services_changed_initially(tmp_path):
+    project = make_project(tmp_path, web={"image": "nginx"}, api={"build": {"context": "."}})
+    assert get_changed_services(project) == ["web", "api"]
+    assert select_changed_services(project) == []
+
+
+def test_changed_config_and_image(tmp_path, image_ids):
+    project = make_project(tmp_path, web={"image": "nginx"}, api={"build": {"context": "."}})
+    save_deployed_hashes(project, [])
+    assert select_changed_services(project) is None
+
+    changed_project = make_project(
+        tmp_path, web={"image": "nginx", "ports": ["80:80"]}, api={"build": {"context": "."}}
+    )
+    assert get_changed_services(changed_project) == ["web"]
+
+    image_ids["app-api"] = "sha256:3"
+    assert select_changed_services(project) == ["api"]
+
+
+@pytest.mark.usefixtures("image_ids")
+def test_save_merges_services(tmp_path):
+    project = make_project(tmp_path, web={"image": "nginx"}, api={"build": {"context": "."}})
+    save_deployed_hashes(project, ["web"])
+    assert get_changed_services(project) == ["api"]
+    save_deployed_hashes(project, ["api"])
+    assert get_changed_services(project) == []
+
+
+@pytest.mark.usefixtures("image_ids")
+def test_save_includes_dependencies(tmp_path):
+    project = make_project(
+        tmp_path,
+        web={"image": "nginx", "depends_on": {"api": {"condition": "service_started"}}},
+        api={"build": {"context": "."}, "depends_on": {"db": {}}},
+        db={"image": "postgres"},
+        worker={"image": "worker"},
+    )
+    save_deployed_hashes(project, ["web"])
+    assert get_changed_services(project) == ["worker"]
+
+
+@pytest.mark.usefixtures("image_ids")
+def test_hashes_depend_only_on_the_volumes_of_the_service(tmp_path):
+    web = {"image": "nginx", "volumes": ["html:/html"]}
+    api = {"build": {"context": "."}, "volumes": ["data:/data"]}
+    project = make_project(tmp_path, volumes={"html": {}, "data": {}}, web=web, api=api)
+    save_deployed_hashes(project, [])
+
+    # Like with `doco up web`, the volumes of not selected services are missing
+    assert not get_changed_services(make_project(tmp_path, volumes={"html": {}}, web=web))
+
+    changed_project = make_project(
+        tmp_path, volumes={"html": {}, "data": {"external": True}}, web=web, api=api
+    )
+    assert get_changed_services(changed_project) == ["api"]
@@ -0,0 +1,105 @@
+import http.server
+import json
+import socketserver
+import threading
+import urllib.parse
+
+import pytest
+
+from src.utils.docker_api import DockerApiError
+from src.utils.docker_api import get_docker_socket_path
+from src.utils.docker_api import load_compose_containers
+
+
+def container(project: str, service: str, state: str, number: int = 1):
+    return {
+        "Id": f"{project}{service}{number}".ljust(64, "0"),
+        "Names": [f"/{project}-{service}-{number}"],
+        "Image": "nginx",
+        "State": state,
+        "Status": "Up 2 minutes" if state == "running" else "Exited (0) 2 minutes ago",
+        "Labels": {
+            "com.docker.compose.project": project,
+            "com.docker.compose.service": service,
+            "com.docker.compose.oneoff": "False",
+        },
+    }
+
+
+class FakeDockerHandler(http.server.BaseHTTPRequestHandler):
+    containers: list = []
+    requests: list = []
+
+    def do_GET(self):  # noqa: N802 (function name should be lowercase) pylint: disable=invalid-name
+        url = urllib.parse.urlparse(self.path)
+        self.requests.append((url.path, urllib.parse.parse_qs(url.query)))
+        if url.path != "/containers/json":
+            self.send_error(404)
+            return
+        body = json.dumps(self.containers).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture(name="fake_docker_socket")
+def fixture_fake_docker_socket(tmp_path):
+    socket_path = str(tmp_path / "docker.sock")
+    FakeDockerHandler.containers = [
+        container("app", "web", "exited", 2),
+        container("app", "web", "running", 1),
+        container("app", "db", "running"),
+        container("proxy", "traefik", "running"),
+    ]
+    FakeDockerHandler.requests = []
+    server = socketserver.ThreadingUnixStreamServer(socket_path, FakeDockerHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+
+
+def test_containers_are_loaded_with_a_single_request(fake_docker_socket):
+    projects = load_compose_containers(socket_path=fake_docker_socket)
+
+    assert len(FakeDockerHandler.requests) == 1
+    path, query = FakeDockerHandler.requests[0]
+    assert path == "/containers/json"
+    assert query["all"] == ["1"]
+    assert json.loads(query["filters"][0]) == {
+        "label": ["com.docker.compose.project", "com.docker.compose.oneoff=False"]
+    }
+    assert sorted(projects.keys()) == ["app", "proxy"]
+    assert [(item["Service"], item["State"], item["Name"]) for item in projects["app"]] == [
+        ("db", "running", "app-db-1"),
+        ("web", "running", "app-web-1"),
+        ("web", "exited", "app-web-2"),
+    ]
+
+
+def test_unreachable_socket_raises(tmp_path):
+    with pytest.raises(DockerApiError):
+        load_compose_containers(socket_path=str(tmp_path / "missing.sock"))
+
+
+def test_socket_path_follows_docker_cli_configuration(monkeypatch, tmp_path):
+    monkeypatch.setenv("DOCKER_CONFIG", str(tmp_path))
+    monkeypatch.delenv("DOCKER_CONTEXT", raising=False)
+    monkeypatch.delenv("DOCKER_HOST", raising=False)
+    assert get_docker_socket_path() == "/var/run/docker.sock"
+
+    monkeypatch.setenv("DOCKER_HOST", "unix:///run/user/1000/docker.sock")
+    assert get_docker_socket_path() == "/run/user/1000/docker.sock"
+
+    monkeypatch.setenv("DOCKER_HOST", "tcp://10.0.0.1:2375")
+    assert get_docker_socket_path() is None
+
+    monkeypatch.delenv("DOCKER_HOST")
+    (tmp_path / "config.json").write_text(json.dumps({"currentContext": "remote"}))
+    assert get_docker_socket_path() is None
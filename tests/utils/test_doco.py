@@ -0,0 +1,34 @@
+import types
+import typing as t
+
+from src.utils.common import PrintCmdData
+from src.utils.doco import _run_project_cmds
+from src.utils.doco import ProjectInfo
+from src.utils.runner import ProcessRunner
+from src.utils.runner import run_coroutine
+
+
+def when_running(tmp_path, cmds: list[list[str]]):
+    calls: list[str] = []
+    info = ProjectInfo(
+        project=t.cast(t.Any, types.SimpleNamespace(dir=str(tmp_path))),
+        cmds=[PrintCmdData(cmd=cmd) for cmd in cmds],
+        on_success=[lambda: calls.append("saved")],
+    )
+    result = run_coroutine(_run_project_cmds(info, ProcessRunner()))
+    return result, calls
+
+
+def test_callbacks_run_after_successful_cmds(tmp_path):
+    result, calls = when_running(tmp_path, [["true"], ["true"]])
+
+    assert result.error is None
+    assert calls == ["saved"]
+
+
+def test_callbacks_do_not_run_after_failed_cmd(tmp_path):
+    result, calls = when_running(tmp_path, [["false"], ["true"]])
+
+    assert result.error is not None
+    assert len(result.outputs) == 1
+    assert not calls
@@ -0,0 +1,30 @@
+from src.utils.doco_config import DocoBackupConfig
+
+
+def test_is_live_service_uses_last_matching_policy():
+    config = DocoBackupConfig.model_validate(
+        {
+            "services": [
+                {"project_pattern": "", "service_pattern": "^(web|worker)$", "live": True},
+                {"project_pattern": "^shop$", "service_pattern": "^worker$", "live": False},
+            ]
+        }
+    )
+    assert config.is_live_service("blog", "web")
+    assert config.is_live_service("blog", "worker")
+    assert not config.is_live_service("shop", "worker")
+    assert not config.is_live_service("blog", "db")
+
+
+def test_get_retention_policy_uses_last_matching_policy():
+    config = DocoBackupConfig.model_validate(
+        {
+            "retention": [
+                {"project_pattern": "", "keep_daily": 7},
+                {"project_pattern": "^shop$", "keep_last": 3},
+            ]
+        }
+    )
+    assert config.get_retention_policy("blog").keep_daily == 7
+    assert config.get_retention_policy("shop").keep_last == 3
+    assert not DocoBackupConfig().get_retention_policy("blog")
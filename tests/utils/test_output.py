@@ -0,0 +1,32 @@
+import sys
+import threading
+
+from src.utils.output import capture_thread_output
+from src.utils.output import run_cmd
+from src.utils.output import run_cmd_tee
+
+
+def test_capture_output_per_thread(capsys):
+    outputs: dict[str, str] = {}
+
+    def task(name: str):
+        with capture_thread_output() as output:
+            print(f"print {name}")
+            run_cmd([sys.executable, "-c", f"print('subprocess {name}', end='\\r')"])
+        outputs[name] = output.getvalue()
+
+    threads = [threading.Thread(target=task, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    print("main")
+    for thread in threads:
+        thread.join()
+
+    assert outputs == {"a": "print a\nsubprocess a\r", "b": "print b\nsubprocess b\r"}
+    assert capsys.readouterr().out == "main\n"
+
+
+def test_run_cmd_tee(capfd):
+    output = run_cmd_tee([sys.executable, "-c", "print('0%', end='\\r'); print('100%')"])
+    assert output == "0%\r100%\n"
+    assert capfd.readouterr().out == "0%\r100%\n"
@@ -0,0 +1,19 @@
+from src.utils.progress_rich import RsyncProgressDisplay
+
+
+def test_progress_display_estimates_totals():
+    display = RsyncProgressDisplay()
+    data = display.output_callback("data/")
+    logs = display.output_callback("logs/", print_output=False)
+
+    data("          1,000  25%    1.00kB/s    0:00:03")
+    logs("            500  50%    1.00kB/s    0:00:01")
+    logs("sent 500 bytes")
+    display.finish("logs/")
+
+    tasks = {task.description: task for task in display.progress.tasks}
+    assert (tasks["data/"].completed, tasks["data/"].total) == (1000, 4000)
+    assert (tasks["logs/"].completed, tasks["logs/"].total) == (500, 500)
+    total = display.progress.tasks[0]
+    assert (total.completed, total.total) == (1500, 4500)
+    assert "1/2 finished" in total.description
@@ -0,0 +1,61 @@
+import typing as t
+
+import pytest
+import typer
+
+from src.utils.compose_rich import ComposeProject
+from src.utils.doco_config import DocoConfig
+from src.utils.project_dependencies import get_project_dependencies
+from src.utils.project_dependencies import get_project_waves
+from src.utils.project_dependencies import reverse_dependencies
+from src.utils.project_dependencies import sort_projects
+
+
+def make_project(name: str, depends_on: t.Optional[list[dict]] = None, **config) -> ComposeProject:
+    project = ComposeProject(
+        dir=name,
+        file="compose.yaml",
+        config={"name": name, "services": {}, **config},
+        selected_services=[],
+        all_profiles=[],
+        selected_profiles=[],
+    )
+    project.doco_config = DocoConfig.model_validate({"projects": {"depends_on": depends_on or []}})
+    return project
+
+
+def test_dependencies_from_external_networks_and_volumes():
+    projects = [
+        make_project("app", networks={"proxy": {"name": "proxy", "external": True}}),
+        make_project("proxy", networks={"default": {"name": "proxy"}}),
+        make_project("backup", volumes={"data": {"name": "db_data", "external": True}}),
+        make_project("db", volumes={"data": {"name": "db_data"}}),
+    ]
+    assert get_project_dependencies(projects) == [{1}, set(), {3}, set()]
+
+
+def test_dependencies_from_doco_config():
+    projects = [
+        make_project("app", depends_on=[{"project": "app", "requires": ["db", "unknown"]}]),
+        make_project("db"),
+    ]
+    assert get_project_dependencies(projects) == [{1}, set()]
+    assert reverse_dependencies(get_project_dependencies(projects)) == [set(), {0}]
+
+
+def test_sort_projects_in_waves():
+    projects = [make_project(name) for name in ("app", "db", "proxy", "monitoring")]
+    dependencies = [{1, 2}, set(), set(), {0}]
+    assert get_project_waves(projects, dependencies) == [[1, 2], [0], [3]]
+    assert [project.config["name"] for project in sort_projects(projects, dependencies)] == [
+        "db",
+        "proxy",
+        "app",
+        "monitoring",
+    ]
+
+
+def test_cyclic_dependencies_fail():
+    projects = [make_project(name) for name in ("a", "b", "c")]
+    with pytest.raises(typer.Exit):
+        get_project_waves(projects, [{1}, {0}, set()])
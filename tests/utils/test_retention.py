@@ -0,0 +1,64 @@
+import datetime
+
+from src.utils.doco_config import DocoBackupRetentionPolicy
+from src.utils.retention import parse_backup_date
+from src.utils.retention import select_backups_to_keep
+
+
+def when_having_backups(*names: str) -> list[tuple[str, datetime.datetime]]:
+    backups = []
+    for name in names:
+        date = parse_backup_date(name)
+        assert date is not None
+        backups.append((name, date))
+    return backups
+
+
+def test_parse_backup_date():
+    assert parse_backup_date("backup-2024-01-02_03.04") == datetime.datetime(2024, 1, 2, 3, 4)
+    assert parse_backup_date("backup-2024-13-02_03.04") is None
+    assert parse_backup_date("backup") is None
+    assert parse_backup_date("before-2024-01-02_03.04") is None
+
+
+def test_keep_last():
+    backups = when_having_backups(
+        "backup-2024-01-01_10.00", "backup-2024-01-03_10.00", "backup-2024-01-02_10.00"
+    )
+
+    keep = select_backups_to_keep(backups, DocoBackupRetentionPolicy(project_pattern=".*", keep_last=2))
+
+    assert keep == {"backup-2024-01-03_10.00": ["last"], "backup-2024-01-02_10.00": ["last"]}
+
+
+def test_grandfather_father_son():
+    backups = when_having_backups(
+        "backup-2023-11-04_10.00",
+        "backup-2023-12-01_10.00",
+        "backup-2023-12-15_10.00",
+        "backup-2024-01-01_10.00",
+        "backup-2024-01-02_10.00",
+        "backup-2024-01-02_12.00",
+        "backup-2024-01-04_10.00",
+    )
+
+    keep = select_backups_to_keep(
+        backups,
+        DocoBackupRetentionPolicy(
+            project_pattern=".*", keep_last=1, keep_daily=2, keep_weekly=2, keep_monthly=3
+        ),
+    )
+
+    assert keep == {
+        "backup-2024-01-04_10.00": ["last", "daily", "weekly", "monthly"],
+        "backup-2024-01-02_12.00": ["daily"],
+        "backup-2023-12-15_10.00": ["weekly", "monthly"],
+        "backup-2023-11-04_10.00": ["monthly"],
+    }
+
+
+def test_policy_without_limits_keeps_nothing():
+    policy = DocoBackupRetentionPolicy(project_pattern=".*")
+
+    assert not policy.keeps_any()
+    assert not select_backups_to_keep(when_having_backups("backup-2024-01-01_10.00"), policy)
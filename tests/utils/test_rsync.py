@@ -0,0 +1,212 @@
+import re
+import subprocess
+
+import pytest
+
+from src.utils.rsync import parse_rsync_progress
+from src.utils.rsync import parse_rsync_stats
+from src.utils.rsync import rsync_backup_relative_cmd
+from src.utils.rsync import rsync_delete_cmd
+from src.utils.rsync import rsync_list_cmd
+from src.utils.rsync import RsyncConfig
+from src.utils.rsync import RsyncFilterRule
+from src.utils.rsync import RsyncStats
+from src.utils.rsync import run_with_retries
+from src.utils.rsync import scope_filter_rule
+from src.utils.rsync import split_bwlimit
+
+
+def test_scope_anchored_filter_rule():
+    assert scope_filter_rule("- /.cache/***", "volumes/web/data/") == ["- /volumes/web/data/.cache/***"]
+    assert scope_filter_rule("include /keep", "project-files") == ["include /project-files/keep"]
+
+
+def test_scope_unanchored_filter_rule():
+    assert scope_filter_rule("-,s *.tmp", "volumes/web/data/") == [
+        "-,s /volumes/web/data/*.tmp",
+        "-,s /volumes/web/data/**/*.tmp",
+    ]
+
+
+def test_unscopable_filter_rules():
+    assert scope_filter_rule(": .rsync-filter", "volumes/web/data/") is None
+    assert scope_filter_rule("-! *.tmp", "volumes/web/data/") is None
+    assert scope_filter_rule("!", "volumes/web/data/") is None
+
+
+def test_relative_cmd_ignores_configured_filters():
+    config = RsyncConfig(
+        host="nas",
+        module="Backup",
+        filter=[RsyncFilterRule(project_pattern=re.compile(""), path_pattern=re.compile(""), filter=["- x"])],
+    )
+    cmd = rsync_backup_relative_cmd(
+        config=config,
+        sources=["/tmp/stage/./volumes/web/data/"],
+        new_backup="project/backup/",
+        old_backup_dirs=["project/old-backup"],
+        filter_rules=["- /volumes/web/data/y"],
+        show_progress=False,
+        verbose=False,
+    )
+    assert "- x" not in cmd
+    assert cmd[-5:] == [
+        "--link-dest",
+        "/project/old-backup",
+        "--",
+        "/tmp/stage/./volumes/web/data/",
+        "nas::Backup/project/backup/",
+    ]
+    assert "--relative" in cmd and "- /volumes/web/data/y" in cmd
+
+
+def test_delete_cmd_protects_other_entries():
+    cmd = rsync_delete_cmd(
+        RsyncConfig(host="nas", module="Backup", multiplex_ssh=False),
+        empty_dir="/tmp/empty",
+        target="project/",
+        names=["backup-2024-01-01_10.00", "file.json"],
+        verbose=False,
+    )
+    assert cmd == [
+        "rsync",
+        "-r",
+        "--delete",
+        "-f",
+        "+ /backup-2024-01-01_10.00",
+        "-f",
+        "+ /backup-2024-01-01_10.00/***",
+        "-f",
+        "+ /file.json",
+        "-f",
+        "+ /file.json/***",
+        "-f",
+        "- *",
+        "--",
+        "/tmp/empty/",
+        "nas::Backup/project/",
+    ]
+
+
+def test_split_bwlimit():
+    assert split_bwlimit("1000", 4) == "250"
+    assert split_bwlimit("10M", 4) == "2560"
+    assert split_bwlimit("1.5g", 1) == "1572864"
+    assert split_bwlimit("3", 4) == "1"
+    with pytest.raises(ValueError):
+        split_bwlimit("10MB/s", 1)
+
+
+def test_nice_rsync_command(monkeypatch):
+    monkeypatch.setattr("src.utils.rsync.shutil.which", lambda cmd: None)
+    cmd = rsync_list_cmd(RsyncConfig(host="nas", module="Backup", nice=True), "", False, False)
+    assert cmd[:4] == ["nice", "-n", "19", "rsync"]
+
+    monkeypatch.setattr("src.utils.rsync.shutil.which", lambda cmd: f"/usr/bin/{cmd}")
+    cmd = rsync_list_cmd(RsyncConfig(host="nas", module="Backup", nice=True), "", False, False)
+    assert cmd[:7] == ["nice", "-n", "19", "ionice", "-c", "3", "rsync"]
+
+
+RSYNC_STATS_OUTPUT = """
+Number of files: 1234 (reg: 1000, dir: 234)
+Number of created files: 2 (reg: 2)
+Number of deleted files: 0
+Number of regular files transferred: 12
+Total file size: 1234567890 bytes
+Total transferred file size: 4567890 bytes
+Literal data: 4500123 bytes
+Matched data: 67767 bytes
+File list size: 0
+File list generation time: 0.001 seconds
+File list transfer time: 0.000 seconds
+Total bytes sent: 1234567
+Total bytes received: 456
+
+sent 1234567 bytes  received 456 bytes  123456.78 bytes/sec
+total size is 1234567890  speedup is 999.64
+"""
+
+
+def test_parse_rsync_stats():
+    assert parse_rsync_stats(RSYNC_STATS_OUTPUT, elapsed_seconds=1.5) == RsyncStats(
+        files=1234,
+        files_transferred=12,
+        total_file_size=1_234_567_890,
+        total_transferred_file_size=4_567_890,
+        literal_data=4_500_123,
+        matched_data=67_767,
+        bytes_sent=1_234_567,
+        bytes_received=456,
+        speedup=999.64,
+        elapsed_seconds=1.5,
+    )
+    assert parse_rsync_stats(RSYNC_STATS_OUTPUT.replace("999.64", "999,64")).speedup == 999.64
+    assert parse_rsync_stats("sent 1 bytes\n") is None
+
+
+def test_add_rsync_stats():
+    stats = RsyncStats(files=10, files_transferred=2, total_file_size=1000, bytes_sent=50, elapsed_seconds=1)
+    summed = stats + RsyncStats(files=11, files_transferred=1, total_file_size=1100, bytes_sent=50)
+    assert summed.files == 11
+    assert summed.files_transferred == 3
+    assert summed.total_file_size == 1100
+    assert summed.speedup == 11.0
+    assert summed.elapsed_seconds == 1
+
+
+def test_parse_rsync_progress():
+    assert parse_rsync_progress("      1,234,567  45%   12.34MB/s    0:00:12 (xfr#3, to-chk=10/100)") == (
+        1234567,
+        45,
+    )
+    assert parse_rsync_progress("          1.23G  45%  12.34MB/s    0:00:12 (xfr#3, ir-chk=1000/2000)") == (
+        1_230_000_000,
+        45,
+    )
+    assert parse_rsync_progress("         32.77K   0%    0.00kB/s    0:00:00") == (32770, 0)
+    assert parse_rsync_progress("sent 1.23M bytes  received 456 bytes  123.45K bytes/sec") is None
+
+
+def test_run_with_retries(monkeypatch):
+    delays: list[float] = []
+    monkeypatch.setattr("src.utils.rsync.time.sleep", delays.append)
+    returncodes = [30, 12, 0]
+
+    def run() -> str:
+        returncode = returncodes.pop(0)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, ["rsync"])
+        return "done"
+
+    messages: list[str] = []
+    config = RsyncConfig(host="nas", retries=3, retry_delay=5)
+
+    assert run_with_retries(config, run, retry_callback=messages.append) == "done"
+    assert delays == [5, 10]
+    assert messages == [
+        "rsync failed with exit code 30, retrying in 5s (1/3)...",
+        "rsync failed with exit code 12, retrying in 10s (2/3)...",
+    ]
+
+
+def test_run_with_retries_gives_up(monkeypatch):
+    monkeypatch.setattr("src.utils.rsync.time.sleep", lambda delay: None)
+    attempts: list[int] = []
+
+    def run(returncode: int) -> None:
+        attempts.append(returncode)
+        raise subprocess.CalledProcessError(returncode, ["rsync"])
+
+    with pytest.raises(subprocess.CalledProcessError):
+        run_with_retries(RsyncConfig(host="nas", retries=2), lambda: run(10))
+    assert attempts == [10, 10, 10]
+
+    attempts.clear()
+    with pytest.raises(subprocess.CalledProcessError):
+        run_with_retries(RsyncConfig(host="nas", retries=2), lambda: run(1))
+    assert attempts == [1]
+
+    attempts.clear()
+    with pytest.raises(subprocess.CalledProcessError):
+        run_with_retries(RsyncConfig(host="nas", retries=2), lambda: run(23))
+    assert attempts == [23]
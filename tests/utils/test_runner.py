@@ -0,0 +1,50 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.utils.runner import ProcessRunner
+from src.utils.runner import run_coroutine
+
+
+def test_run_captures_output():
+    runner = ProcessRunner()
+    result = run_coroutine(runner.run(["sh", "-c", "echo out; echo err >&2"], capture_output=True))
+    assert result.returncode == 0
+    assert result.stdout == "out\n"
+    assert result.stderr == "err\n"
+
+
+def test_run_streams_lines():
+    lines: list[str] = []
+    runner = ProcessRunner()
+    run_coroutine(runner.run(["printf", "a\\rb\\nc"], stdout_callback=lines.append))
+    assert lines == ["a", "b", "c"]
+
+
+def test_run_raises_on_failure():
+    runner = ProcessRunner()
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        run_coroutine(runner.run(["sh", "-c", "echo failed; exit 3"], capture_output=True))
+    assert e.value.returncode == 3
+    assert e.value.stdout == "failed\n"
+
+
+def test_run_kills_process_on_timeout():
+    runner = ProcessRunner(timeout=0.2)
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_coroutine(runner.run([sys.executable, "-c", "import time; time.sleep(10)"]))
+    assert time.monotonic() - start < 5
+
+
+def test_run_limits_concurrency():
+    async def run_all(runner: ProcessRunner):
+        start = time.monotonic()
+        await asyncio.gather(*(runner.run(["sleep", "0.3"]) for _ in range(4)))
+        return time.monotonic() - start
+
+    assert run_coroutine(run_all(ProcessRunner(max_concurrency=4))) < 1.0
+    assert run_coroutine(run_all(ProcessRunner(max_concurrency=2))) >= 0.6
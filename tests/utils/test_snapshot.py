@@ -0,0 +1,60 @@
+import os
+import subprocess
+
+import pytest
+
+from src.utils.snapshot import create_snapshot
+from src.utils.snapshot import delete_snapshot
+from src.utils.snapshot import plan_snapshot
+from src.utils.snapshot import SNAPSHOT_DIR_PREFIX
+from src.utils.snapshot import SnapshotError
+
+
+_run = subprocess.run
+
+
+def _run_without_reflink(cmd, **kwargs):
+    # A failing copy should fail the test instead of being reported by the snapshot functions
+    kwargs.pop("check", None)
+    return _run([arg for arg in cmd if arg != "--reflink=always"], check=True, **kwargs)
+
+
+def test_plan_snapshot_next_to_source(tmp_path):
+    source = tmp_path / "data"
+    source.mkdir()
+    snapshot = plan_snapshot(f"{source}/")
+    assert snapshot.source == str(source)
+    assert os.path.dirname(os.path.dirname(snapshot.path)) == str(tmp_path)
+    assert os.path.basename(snapshot.path) == "data"
+    assert not snapshot.is_btrfs_subvolume
+    assert snapshot.create_cmd[:3] == ["cp", "-a", "--reflink=always"]
+    assert not os.path.exists(os.path.dirname(snapshot.path))
+
+
+def test_create_and_delete_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.utils.snapshot.subprocess.run", _run_without_reflink)
+    source = tmp_path / "data"
+    source.mkdir()
+    (source / "file").write_text("content")
+
+    snapshot = plan_snapshot(str(source))
+    create_snapshot(snapshot)
+    assert os.path.basename(os.path.dirname(snapshot.path)).startswith(SNAPSHOT_DIR_PREFIX)
+    with open(os.path.join(snapshot.path, "file"), encoding="utf-8") as f:
+        assert f.read() == "content"
+
+    delete_snapshot(snapshot)
+    assert os.listdir(tmp_path) == ["data"]
+
+
+def test_failed_snapshot_is_cleaned_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "src.utils.snapshot.subprocess.run",
+        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 1, stdout="", stderr="not supported"),
+    )
+    source = tmp_path / "data"
+    source.mkdir()
+
+    with pytest.raises(SnapshotError, match="not supported"):
+        create_snapshot(plan_snapshot(str(source)))
+    assert os.listdir(tmp_path) == ["data"]
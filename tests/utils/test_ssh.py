@@ -0,0 +1,47 @@
+import os
+import shlex
+
+from src.utils.rsync import RsyncBaseOptions
+from src.utils.rsync import RsyncConfig
+from src.utils.ssh import ssh_multiplexer
+from src.utils.ssh import SshMultiplexer
+
+
+def test_wrap_ssh_command():
+    multiplexer = SshMultiplexer()
+    rsh = multiplexer.wrap_rsh("ssh -p 2222 -i key", "user@nas")
+    assert rsh is not None
+    cmd = shlex.split(rsh)
+    assert cmd[:3] == ["ssh", "-o", "ControlMaster=auto"]
+    assert cmd[-4:] == ["-p", "2222", "-i", "key"]
+    control_dir = os.path.dirname(cmd[4].split("=", 1)[1])
+    assert os.path.isdir(control_dir)
+    assert os.stat(control_dir).st_mode & 0o077 == 0
+
+    multiplexer.close()
+    assert not os.path.exists(control_dir)
+
+
+def test_do_not_wrap_other_commands():
+    assert SshMultiplexer().wrap_rsh("rsh", "nas") is None
+
+
+def test_rsync_options_use_multiplexed_ssh(monkeypatch):
+    monkeypatch.delenv("RSYNC_RSH", raising=False)
+    options = RsyncBaseOptions(RsyncConfig(host="nas", args=["--rsh=ssh -p 22", "-z"]))
+    assert options.args[0] == "-e"
+    assert "ControlMaster=auto" in options.args[1]
+    assert options.args[1].endswith("-p 22")
+    assert options.args[2:] == ["-z"]
+
+    options = RsyncBaseOptions(RsyncConfig(host="nas"))
+    assert options.args[0] == "-e" and shlex.split(options.args[1])[0] == "ssh"
+    ssh_multiplexer.close()
+
+
+def test_rsync_options_without_ssh():
+    assert RsyncBaseOptions(RsyncConfig(host="nas", module="Backup", args=["--port", "8873"])).args == [
+        "--port",
+        "8873",
+    ]
+    assert RsyncBaseOptions(RsyncConfig(host="nas", rsh="ssh", multiplex_ssh=False)).args == ["-e", "ssh"]